@@ -0,0 +1,144 @@
+"""
+Service catalog registry (helper v2 categories and items).
+
+The catalog is read once from `data/catalog.json`, the single source for
+the category/item keyboards, item descriptions, order titles and the DB
+seed. Each item carries its pre-rendered text and prebuilt markup, so a
+lookup is a single dict hit. `reload_catalog()` rebuilds the registry and
+swaps it in atomically (one reference assignment).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram import InlineKeyboardMarkup
+
+from settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# Used unless CATALOG_PATH is set
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog.json")
+
+
+@dataclass(frozen=True)
+class CatalogItem:
+    key: str
+    category_key: str
+    title: str
+    # Title stored on orders (option_title); may differ from the button label
+    order_title: str
+    kind: str
+    text: str
+    markup: InlineKeyboardMarkup
+
+
+@dataclass(frozen=True)
+class CatalogCategory:
+    key: str
+    title: str
+    header: str
+    items: Tuple[CatalogItem, ...]
+    markup: InlineKeyboardMarkup
+
+
+@dataclass(frozen=True)
+class Catalog:
+    categories: Dict[str, CatalogCategory]
+    items: Dict[Tuple[str, str], CatalogItem]
+    main_markup: InlineKeyboardMarkup
+
+    def seed_data(self) -> Dict[str, List[str]]:
+        """{category title: [item titles]} as stored in the categories/items tables."""
+        return {c.title: [it.title for it in c.items] for c in self.categories.values()}
+
+
+def read_catalog_file(path: Optional[str] = None) -> Dict[str, Any]:
+    with open(path or get_settings().catalog_path or DEFAULT_CATALOG_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _item_markup(kind: str, cat_key: str, item_key: str) -> InlineKeyboardMarkup:
+    from keyboards import (
+        helper2_emergency_info_kb,
+        helper2_item_actions_kb,
+        helper2_item_order_kb,
+        helper2_want_request_kb,
+    )
+
+    if kind == "info":
+        return helper2_emergency_info_kb(cat_key)
+    if kind == "request":
+        return helper2_want_request_kb(cat_key)
+    if kind == "order":
+        return helper2_item_order_kb(cat_key, item_key)
+    return helper2_item_actions_kb(cat_key, item_key)
+
+
+def build_catalog(raw: Dict[str, Any]) -> Catalog:
+    from keyboards import helper2_category_buttons_kb, helper2_main_buttons_kb
+
+    categories: Dict[str, CatalogCategory] = {}
+    items: Dict[Tuple[str, str], CatalogItem] = {}
+    for c in raw.get("categories", []):
+        cat_key = c["key"]
+        header = c.get("header") or c["title"]
+        cat_items: List[CatalogItem] = []
+        for it in c.get("items", []):
+            item_key = it["key"]
+            order_title = it.get("order_title") or it["title"]
+            kind = it.get("kind", "confirm")
+            text = it.get("text") or (
+                f"{header}\n\n"
+                f"خدمت انتخابی: {order_title}\n\n"
+                "برای ثبت سفارش و پیگیری توسط تیم ریشه، دکمه زیر را بزن."
+            )
+            item = CatalogItem(
+                key=item_key,
+                category_key=cat_key,
+                title=it["title"],
+                order_title=order_title,
+                kind=kind,
+                text=text,
+                markup=_item_markup(kind, cat_key, item_key),
+            )
+            cat_items.append(item)
+            items[(cat_key, item_key)] = item
+        categories[cat_key] = CatalogCategory(
+            key=cat_key,
+            title=c["title"],
+            header=header,
+            items=tuple(cat_items),
+            markup=helper2_category_buttons_kb(cat_key, [(it.key, it.title) for it in cat_items]),
+        )
+    main_markup = helper2_main_buttons_kb([(c.key, c.title) for c in categories.values()])
+    return Catalog(categories=categories, items=items, main_markup=main_markup)
+
+
+_catalog: Optional[Catalog] = None
+
+
+def get_catalog() -> Catalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = build_catalog(read_catalog_file())
+    return _catalog
+
+
+def reload_catalog(path: Optional[str] = None) -> Catalog:
+    """Rebuild from disk and swap in; the old registry stays live if loading fails."""
+    global _catalog
+    try:
+        fresh = build_catalog(read_catalog_file(path))
+    except Exception as e:
+        logger.warning("Catalog reload failed, keeping current catalog: %s", e)
+        return get_catalog()
+    _catalog = fresh
+    logger.info("Catalog loaded: %s categories, %s items", len(fresh.categories), len(fresh.items))
+    return fresh
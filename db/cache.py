@@ -0,0 +1,92 @@
+"""
+In-process caches that sit in front of hot crud lookups.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, Hashable, Optional, TypeVar
+
+from settings import Settings, subscribe
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Small LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[K, tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        """Resize and change the TTL of new entries (existing ones keep their expiry)."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Detached snapshot of a users row, safe to share across sessions."""
+
+    id: int
+    telegram_id: int
+    username: str | None
+    full_name: str | None
+    phone_number: str | None
+    role_id: int
+
+    @classmethod
+    def from_row(cls, user) -> "CachedUser":
+        return cls(
+            id=int(user.id),
+            telegram_id=int(user.telegram_id),
+            username=user.username,
+            full_name=user.full_name,
+            phone_number=user.phone_number,
+            role_id=int(user.role_id),
+        )
+
+
+# Keyed by telegram_id. Invalidation (role/phone changes) is local to this
+# process: other worker processes keep serving their copy until it expires,
+# so USER_CACHE_TTL is the staleness bound in multi-worker deployments.
+user_cache: TTLCache[int, CachedUser] = TTLCache(maxsize=Settings.user_cache_size, ttl=Settings.user_cache_ttl)
+
+
+@subscribe
+def _configure_user_cache(settings: Settings) -> None:
+    user_cache.configure(settings.user_cache_size, settings.user_cache_ttl)
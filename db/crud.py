@@ -1,31 +1,43 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import Select, insert, select, union_all, update
 from sqlalchemy import func as _func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.models import Order, Category, Item, User, CustomRequest
+from db.models import Order, Category, Item, User, CustomRequest, MediaAsset, TrackingCodeSequence, OrderStatsDaily, UserOrderStats
+from db.cache import CachedUser, user_cache
+from db.database import after_commit, has_writes, mark_written
+from db.stats import apply_order_deltas, order_day
 
 
 async def create_order(
     session: AsyncSession,
     user_id: int,
     tracking_code: str,
-    status: str,
+    status: str = "درحال انجام",
     category_key: str | None = None,
     option_title: str | None = None,
 ) -> None:
-    o = Order(
-        user_id=user_id,
-        tracking_code=tracking_code,
-        status=status,
-        category_key=category_key,
-        option_title=option_title,
+    # The stats day comes from the stored created_at, the same expression
+    # the status updates and the reconciliation key by
+    stmt = (
+        insert(Order)
+        .values(
+            user_id=user_id,
+            tracking_code=tracking_code,
+            status=status,
+            category_key=category_key,
+            option_title=option_title,
+        )
+        .returning(order_day())
     )
-    session.add(o)
-    await session.commit()
+    day = (await session.execute(stmt)).scalar_one()
+    mark_written(session)
+    await apply_order_deltas(session, [((user_id, status, option_title, day), 1)])
 
 
 async def get_orders_by_status(session: AsyncSession, user_id: int, status: str) -> List[Order]:
@@ -34,16 +46,30 @@ async def get_orders_by_status(session: AsyncSession, user_id: int, status: str)
     return list(res.scalars().all())
 
 
+def _in_id_order(arm: Callable[[str], Select], statuses: List[str], descending: bool = True, limit: Optional[int] = None):
+    """The rows of `arm(status)` for every status, ordered by orders.id.
+
+    `status IN (...)` walks the (..., status, id) indexes one status at a
+    time, so SQLite collects and sorts every match in a temp B-tree before
+    ORDER BY/LIMIT apply; one UNION ALL arm per status lets it merge the
+    already ordered index ranges instead. Each arm must select Order.id.
+    """
+    statuses = list(dict.fromkeys(statuses))
+    if len(statuses) == 1:
+        stmt = arm(statuses[0])
+        key = Order.id
+    else:
+        stmt = union_all(*(arm(status) for status in statuses))
+        key = stmt.selected_columns.id
+    stmt = stmt.order_by(key.desc() if descending else key.asc())
+    return stmt.limit(limit) if limit is not None else stmt
+
+
 async def get_orders_by_statuses(session: AsyncSession, user_id: int, statuses: List[str]) -> List[Order]:
     if not statuses:
         return []
-    from sqlalchemy import func
-    stmt = (
-        select(Order)
-        .where(Order.user_id == user_id, Order.status.in_(statuses))
-        .order_by(Order.id.desc())
-    )
-    res = await session.execute(stmt)
+    stmt = _in_id_order(lambda status: select(Order).where(Order.user_id == user_id, Order.status == status), statuses)
+    res = await session.execute(select(Order).from_statement(stmt))
     return list(res.scalars().all())
 
 
@@ -102,7 +128,8 @@ async def get_or_create_user_by_telegram(
             user.role_id = default_role_id
             changed = True
         if changed:
-            await session.commit()
+            await session.flush()
+            after_commit(session, lambda: user_cache.invalidate(telegram_id))
         return user
     user = User(
         telegram_id=telegram_id,
@@ -112,14 +139,51 @@ async def get_or_create_user_by_telegram(
         role_id=default_role_id,
     )
     session.add(user)
-    await session.commit()
+    await session.flush()
     await session.refresh(user)
     return user
 
 
+async def get_cached_user(
+    session: AsyncSession,
+    telegram_id: int,
+    username: Optional[str] = None,
+    full_name: Optional[str] = None,
+    default_role_id: int = 2,
+) -> CachedUser:
+    """Cached variant of get_or_create_user_by_telegram(update_if_exists=False).
+
+    Known users are served from the in-process cache without touching the
+    session; on a miss the row is loaded (or created) and cached.
+    """
+    cached = user_cache.get(telegram_id)
+    if cached is not None:
+        return cached
+    user = await get_or_create_user_by_telegram(
+        session,
+        telegram_id,
+        username=username,
+        full_name=full_name,
+        default_role_id=default_role_id,
+        update_if_exists=False,
+    )
+    cached = CachedUser.from_row(user)
+    if has_writes(session):
+        # Possibly inserted by this transaction: cache it only once committed,
+        # so a rolled back insert does not linger
+        after_commit(session, lambda: user_cache.set(telegram_id, cached))
+    else:
+        # Read from committed data; a read-only block never commits (the
+        # update scope rolls it back), so an after_commit hook would never run
+        user_cache.set(telegram_id, cached)
+    return cached
+
+
 async def update_user_phone(session: AsyncSession, user: User, phone_number: str) -> None:
     user.phone_number = phone_number
-    await session.commit()
+    await session.flush()
+    tid = user.telegram_id
+    after_commit(session, lambda: user_cache.invalidate(tid))
 
 
 async def get_all_orders_by_status(session: AsyncSession, status: str) -> List[Order]:
@@ -134,67 +198,222 @@ async def find_order_by_code(session: AsyncSession, tracking_code: str) -> Optio
     return res.scalars().first()
 
 
-async def update_order_status_by_code(session: AsyncSession, tracking_code: str, new_status: str) -> bool:
-    order = await find_order_by_code(session, tracking_code)
-    if not order:
-        return False
-    order.status = new_status
-    if new_status == "انجام شده":
-        try:
-            order.done_at = _func.now()
-        except Exception:
-            pass
-    else:
-        try:
-            order.done_at = None
-        except Exception:
-            pass
-    await session.commit()
-    return True
+@dataclass(frozen=True)
+class OrderView:
+    """An order plus the owner fields the admin screens and notifications show."""
+
+    tracking_code: str
+    status: str
+    category_key: Optional[str]
+    option_title: Optional[str]
+    created_at: Optional[datetime]
+    done_at: Optional[datetime]
+    user_telegram_id: Optional[int]
+    user_full_name: Optional[str]
+    user_username: Optional[str]
+    user_phone: Optional[str]
+
+
+_ORDER_VIEW_ORDER_COLS = (
+    Order.tracking_code,
+    Order.status,
+    Order.category_key,
+    Order.option_title,
+    Order.created_at,
+    Order.done_at,
+)
+_ORDER_VIEW_USER_COLS = (User.telegram_id, User.full_name, User.username, User.phone_number)
+
+
+def _order_view(row: Any) -> OrderView:
+    return OrderView(*row)
+
+
+async def get_order_view_by_code(session: AsyncSession, tracking_code: str) -> Optional[OrderView]:
+    """Order and its user in one joined query."""
+    stmt = (
+        select(*_ORDER_VIEW_ORDER_COLS, *_ORDER_VIEW_USER_COLS)
+        .outerjoin(User, User.id == Order.user_id)
+        .where(Order.tracking_code == tracking_code)
+    )
+    row = (await session.execute(stmt)).first()
+    return _order_view(row) if row is not None else None
+
+
+def _status_update(new_status: str, *where: Any):
+    # The user's fields come back through correlated subqueries, since
+    # RETURNING can only name the updated table's own columns on SQLite
+    user_cols = [
+        select(col).where(User.id == Order.user_id).scalar_subquery()
+        for col in _ORDER_VIEW_USER_COLS
+    ]
+    return (
+        update(Order)
+        .where(*where)
+        .values(status=new_status, done_at=_func.now() if new_status == "انجام شده" else None)
+        .returning(Order.id, *_ORDER_VIEW_ORDER_COLS, *user_cols)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _transition_orders(session: AsyncSession, new_status: str, where: Any) -> List[OrderView]:
+    """Move the orders matching `where` to `new_status`, keeping the stats rollups in step."""
+    # RETURNING only sees new values, so read the old status (and the
+    # other rollup keys) first; each UPDATE is guarded by the old status,
+    # so an order changed concurrently in between is skipped, not double counted
+    before = (await session.execute(
+        select(Order.id, Order.user_id, Order.status, Order.option_title, order_day()).where(where)
+    )).all()
+    by_status: Dict[str, Dict[int, Any]] = {}
+    for row in before:
+        by_status.setdefault(row[2], {})[row[0]] = row
+    views: List[OrderView] = []
+    deltas = []
+    for old_status, rows in by_status.items():
+        res = await session.execute(_status_update(new_status, Order.id.in_(list(rows)), Order.status == old_status))
+        for updated in res.all():
+            views.append(_order_view(updated[1:]))
+            if old_status != new_status:
+                _, user_id, _, item_title, day = rows[updated[0]]
+                deltas.append(((user_id, old_status, item_title, day), -1))
+                deltas.append(((user_id, new_status, item_title, day), 1))
+    if views:
+        await apply_order_deltas(session, deltas)
+        mark_written(session)
+    return views
+
+
+async def update_order_status_by_code(session: AsyncSession, tracking_code: str, new_status: str) -> Optional[OrderView]:
+    """Set an order's status with UPDATE ... RETURNING; returns the updated view or None."""
+    views = await _transition_orders(session, new_status, Order.tracking_code == tracking_code)
+    return views[0] if views else None
+
+
+# Tracking codes per UPDATE ... IN (...), well under every backend's bound-parameter limit
+BULK_STATUS_CHUNK = 500
+
+
+async def update_orders_status_by_codes(session: AsyncSession, tracking_codes: List[str], new_status: str) -> List[OrderView]:
+    """Bulk status transition: UPDATE ... WHERE tracking_code IN (...) RETURNING, chunked.
+
+    Returns the views of the orders that exist; unknown codes are skipped.
+    """
+    codes = list(dict.fromkeys(tracking_codes))
+    views: List[OrderView] = []
+    for i in range(0, len(codes), BULK_STATUS_CHUNK):
+        chunk = codes[i:i + BULK_STATUS_CHUNK]
+        views.extend(await _transition_orders(session, new_status, Order.tracking_code.in_(chunk)))
+    return views
+
+
+async def get_order_codes_by_statuses(
+    session: AsyncSession, statuses: List[str], item_title: Optional[str] = None
+) -> List[str]:
+    """Tracking codes of every order in `statuses` (optionally for one item), newest first."""
+    if not statuses:
+        return []
+
+    def arm(status: str) -> Select:
+        stmt = select(Order.tracking_code, Order.id).where(Order.status == status)
+        return stmt.where(Order.option_title == item_title) if item_title is not None else stmt
+
+    res = await session.execute(_in_id_order(arm, statuses))
+    return list(res.scalars().all())
 
 
-async def count_orders_by_status(session: AsyncSession, status: str) -> int:
-    from sqlalchemy import func
-    stmt = select(func.count(Order.id)).where(Order.status == status)
+async def get_order_export_chunk(
+    session: AsyncSession,
+    after_id: int,
+    limit: int,
+    statuses: Optional[List[str]] = None,
+    item_title: Optional[str] = None,
+) -> List[tuple]:
+    """Next `limit` orders with id > `after_id` (oldest first), joined with their user.
+
+    Rows are (id, *OrderView fields), so callers can resume from the last id.
+    """
+    def arm(status: Optional[str]) -> Select:
+        # Labelled so a compound ORDER BY id is not ambiguous with users.id
+        stmt = (
+            select(Order.id.label("id"), *_ORDER_VIEW_ORDER_COLS, *_ORDER_VIEW_USER_COLS)
+            .outerjoin(User, User.id == Order.user_id)
+            .where(Order.id > after_id)
+        )
+        if status is not None:
+            stmt = stmt.where(Order.status == status)
+        return stmt.where(Order.option_title == item_title) if item_title is not None else stmt
+
+    if statuses:
+        stmt = _in_id_order(arm, statuses, descending=False, limit=limit)
+    else:
+        stmt = arm(None).order_by(Order.id.asc()).limit(limit)
     res = await session.execute(stmt)
-    return int(res.scalar_one())
+    return [tuple(row) for row in res.all()]
 
 
-async def get_orders_paged_by_status(session: AsyncSession, status: str, offset: int, limit: int) -> List[Order]:
+async def count_orders_by_statuses_per_item(session: AsyncSession, statuses: List[str]) -> Dict[str, int]:
+    """Return {option_title: count} for all orders in the given statuses (from the daily rollup)."""
+    if not statuses:
+        return {}
+    # Grouping by (status, item) follows the primary key under IN (...);
+    # grouping by item alone would sort in a temp B-tree. Statuses are summed here.
     stmt = (
-        select(Order)
-        .where(Order.status == status)
-        .order_by(Order.id.desc())
-        .offset(offset)
-        .limit(limit)
+        select(OrderStatsDaily.item_title, _func.sum(OrderStatsDaily.count))
+        .where(OrderStatsDaily.status.in_(statuses), OrderStatsDaily.item_title != "")
+        .group_by(OrderStatsDaily.status, OrderStatsDaily.item_title)
     )
     res = await session.execute(stmt)
-    return list(res.scalars().all())
+    counts: Dict[str, int] = {}
+    for item_title, count in res.all():
+        counts[item_title] = counts.get(item_title, 0) + int(count or 0)
+    return {item_title: count for item_title, count in counts.items() if count}
 
 
-async def count_orders_by_statuses_and_item(session: AsyncSession, statuses: List[str], item_title: str) -> int:
-    from sqlalchemy import func
-    stmt = select(func.count(Order.id)).where(Order.status.in_(statuses), Order.option_title == item_title)
+async def count_user_orders_by_status(session: AsyncSession, user_id: int) -> Dict[str, int]:
+    """Return {status: count} of one user's orders (from the per-user rollup)."""
+    stmt = select(UserOrderStats.status, UserOrderStats.count).where(
+        UserOrderStats.user_id == user_id, UserOrderStats.count != 0
+    )
     res = await session.execute(stmt)
-    return int(res.scalar_one())
+    return {row[0]: int(row[1]) for row in res.all()}
 
 
-async def get_orders_paged_by_statuses_and_item(
+async def get_orders_keyset_by_statuses(
     session: AsyncSession,
     statuses: List[str],
-    item_title: str,
-    offset: int,
     limit: int,
-) -> List[Order]:
-    stmt = (
-        select(Order)
-        .where(Order.status.in_(statuses), Order.option_title == item_title)
-        .order_by(Order.id.desc())
-        .offset(offset)
-        .limit(limit)
-    )
-    res = await session.execute(stmt)
-    return list(res.scalars().all())
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    item_title: Optional[str] = None,
+) -> tuple[List[Order], bool, bool]:
+    """Keyset page of orders (newest first) in `statuses`, optionally for one item.
+
+    `after_id` continues to older orders, `before_id` goes back to newer ones.
+    Returns (orders, has_prev, has_next) using a limit+1 probe instead of COUNT(*).
+    """
+    if not statuses:
+        return [], False, False
+
+    def arm(status: str) -> Select:
+        stmt = select(Order).where(Order.status == status)
+        if item_title is not None:
+            stmt = stmt.where(Order.option_title == item_title)
+        if before_id is not None:
+            return stmt.where(Order.id > before_id)
+        return stmt.where(Order.id < after_id) if after_id is not None else stmt
+
+    if before_id is not None:
+        stmt = _in_id_order(arm, statuses, descending=False, limit=limit + 1)
+        res = await session.execute(select(Order).from_statement(stmt))
+        rows = list(res.scalars().all())
+        has_prev = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return rows, has_prev, True
+    stmt = _in_id_order(arm, statuses, limit=limit + 1)
+    res = await session.execute(select(Order).from_statement(stmt))
+    rows = list(res.scalars().all())
+    return rows[:limit], after_id is not None, len(rows) > limit
 
 
 async def get_all_items(session: AsyncSession) -> List[Item]:
@@ -212,16 +431,48 @@ async def get_users_by_ids(session: AsyncSession, ids: List[int]) -> List[User]:
 
 
 async def count_users(session: AsyncSession) -> int:
-    from sqlalchemy import func
-    stmt = select(func.count(User.id))
+    stmt = select(_func.count(User.id))
     res = await session.execute(stmt)
     return int(res.scalar_one())
 
 
-async def get_users_paged(session: AsyncSession, offset: int, limit: int) -> List[User]:
-    stmt = select(User).order_by(User.created_at.desc()).offset(offset).limit(limit)
+async def get_users_keyset(
+    session: AsyncSession,
+    limit: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+) -> tuple[List[User], bool, bool]:
+    """Keyset page of users ordered by (created_at, id) desc; cursors are user ids.
+
+    Returns (users, has_prev, has_next).
+    """
+    from sqlalchemy import tuple_
+
+    key = tuple_(User.created_at, User.id)
+
+    def _boundary(uid: int):
+        return tuple_(select(User.created_at).where(User.id == uid).scalar_subquery(), uid)
+
+    if before_id is not None:
+        stmt = (
+            select(User)
+            .where(key > _boundary(before_id))
+            .order_by(User.created_at.asc(), User.id.asc())
+            .limit(limit + 1)
+        )
+        res = await session.execute(stmt)
+        rows = list(res.scalars().all())
+        has_prev = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return rows, has_prev, True
+    stmt = select(User)
+    if after_id is not None:
+        stmt = stmt.where(key < _boundary(after_id))
+    stmt = stmt.order_by(User.created_at.desc(), User.id.desc()).limit(limit + 1)
     res = await session.execute(stmt)
-    return list(res.scalars().all())
+    rows = list(res.scalars().all())
+    return rows[:limit], after_id is not None, len(rows) > limit
 
 
 async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
@@ -236,7 +487,9 @@ async def set_user_admin(session: AsyncSession, user_id: int) -> bool:
         return False
     if user.role_id != 1:
         user.role_id = 1
-        await session.commit()
+        await session.flush()
+        tid = user.telegram_id
+        after_commit(session, lambda: user_cache.invalidate(tid))
     return True
 
 
@@ -248,7 +501,10 @@ async def set_user_role(session: AsyncSession, user_id: int, role_id: int) -> bo
         return False
     if user.role_id != role_id:
         user.role_id = role_id
-        await session.commit()
+        await session.flush()
+        tid = user.telegram_id
+        # Only this process's cache; other workers pick the role up after USER_CACHE_TTL
+        after_commit(session, lambda: user_cache.invalidate(tid))
     return True
 
 
@@ -268,4 +524,73 @@ async def create_custom_request(
 ) -> None:
     cr = CustomRequest(user_id=user_id, content_text=content_text, tracking_code=tracking_code)
     session.add(cr)
+    await session.flush()
+
+
+async def get_orders_by_ids(session: AsyncSession, ids: List[int]) -> List[Order]:
+    if not ids:
+        return []
+    res = await session.execute(select(Order).where(Order.id.in_(ids)))
+    return list(res.scalars().all())
+
+
+async def get_custom_requests_by_ids(session: AsyncSession, ids: List[int]) -> List[CustomRequest]:
+    if not ids:
+        return []
+    res = await session.execute(select(CustomRequest).where(CustomRequest.id.in_(ids)))
+    return list(res.scalars().all())
+
+
+async def get_media_file_id(session: AsyncSession, sha256: str) -> Optional[str]:
+    stmt = select(MediaAsset.file_id).where(MediaAsset.sha256 == sha256)
+    res = await session.execute(stmt)
+    return res.scalar_one_or_none()
+
+
+async def save_media_file_id(session: AsyncSession, sha256: str, name: str, file_id: str) -> None:
+    stmt = select(MediaAsset).where(MediaAsset.sha256 == sha256)
+    res = await session.execute(stmt)
+    asset = res.scalars().first()
+    if asset:
+        asset.file_id = file_id
+        asset.name = name
+    else:
+        session.add(MediaAsset(sha256=sha256, name=name, file_id=file_id))
+    await session.flush()
+
+
+async def reserve_tracking_sequence(session: AsyncSession, size: int) -> tuple[int, str]:
+    """Atomically reserve `size` sequence values; returns (first_value, permutation_key).
+
+    Unlike the other helpers this commits: a reservation must not depend on
+    the caller's transaction, so use it with its own session (new_session).
+    """
+    from sqlalchemy.exc import IntegrityError
+    import secrets
+
+    stmt = (
+        update(TrackingCodeSequence)
+        .where(TrackingCodeSequence.id == 1)
+        .values(next_value=TrackingCodeSequence.next_value + size)
+        .returning(TrackingCodeSequence.next_value, TrackingCodeSequence.key)
+    )
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        session.add(TrackingCodeSequence(id=1, next_value=0, key=secrets.token_hex(16)))
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Another worker created the row first
+            await session.rollback()
+        row = (await session.execute(stmt)).first()
     await session.commit()
+    end, key = int(row[0]), str(row[1])
+    return end - size, key
+
+
+async def existing_tracking_codes(session: AsyncSession, codes: List[str]) -> set[str]:
+    if not codes:
+        return set()
+    stmt = select(Order.tracking_code).where(Order.tracking_code.in_(codes))
+    res = await session.execute(stmt)
+    return {row[0] for row in res.all()}
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
-import os
+import hashlib
+import json
+import logging
 import pathlib
-from typing import Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Optional
 
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy import text
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
-from db.models import Base, Category, Item, User
+from db.migrations import migrate
+from db.models import AppMeta, Category, Item
+from settings import Settings, get_settings
 
 
 _engine: Optional[AsyncEngine] = None
@@ -21,115 +28,251 @@ def _extract_sqlite_path(db_url: str) -> Optional[pathlib.Path]:
     return None
 
 
-async def init_db(db_url: Optional[str] = None) -> None:
+def sqlite_production_pragmas(settings: Settings) -> dict:
+    """SQLite pragmas applied to every new connection under DB_PROFILE=production."""
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "mmap_size": settings.sqlite_mmap_size,
+        # negative value = size in KiB
+        "cache_size": settings.sqlite_cache_size,
+        "temp_store": "MEMORY",
+    }
+
+
+def _engine_kwargs(url: str, settings: Settings) -> dict:
+    kwargs: dict = {"echo": False, "future": True}
+    if settings.db_profile != "production":
+        return kwargs
+    kwargs["pool_size"] = settings.db_pool_size
+    kwargs["max_overflow"] = settings.db_max_overflow
+    kwargs["pool_timeout"] = settings.db_pool_timeout
+    if url.startswith("sqlite"):
+        # Driver-level lock wait; busy_timeout pragma below covers the rest
+        kwargs["connect_args"] = {"timeout": settings.sqlite_busy_timeout_ms / 1000}
+    else:
+        kwargs["pool_pre_ping"] = True
+    return kwargs
+
+
+def _install_sqlite_pragmas(engine: AsyncEngine, pragmas: dict) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_conn, _record) -> None:
+        cur = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cur.execute(f"PRAGMA {name}={value}")
+        finally:
+            cur.close()
+
+
+async def init_db(db_url: Optional[str] = None, settings: Optional[Settings] = None) -> None:
+    """Create the engine and migrate; `settings` defaults to the published ones."""
     global _engine, SessionLocal
-    url = db_url or os.getenv("DB_URL", "sqlite+aiosqlite:///./data/app.db")
+    settings = settings or get_settings()
+    url = db_url or settings.db_url
     p = _extract_sqlite_path(url)
     if p:
         p.parent.mkdir(parents=True, exist_ok=True)
-    _engine = create_async_engine(url, echo=False, future=True)
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = create_async_engine(url, **_engine_kwargs(url, settings))
+    if settings.db_profile == "production" and url.startswith("sqlite") and p is not None:
+        _install_sqlite_pragmas(_engine, sqlite_production_pragmas(settings))
     SessionLocal = async_sessionmaker(_engine, expire_on_commit=False)
-    async with _engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        await conn.execute(text("SELECT 1"))
+    # Warm start: a single schema_version read, no introspection
+    await migrate(_engine)
     await _seed_initial_data()
-    await _ensure_order_columns()
-    await _seed_admin_user()
 
 
-def get_session() -> AsyncSession:
+async def close_db() -> None:
+    """Dispose of the engine (its pooled connections belong to the current loop)."""
+    global _engine, SessionLocal
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    SessionLocal = None
+
+
+def new_session() -> AsyncSession:
+    """A fresh session outside any unit of work; the caller commits/closes it."""
     if SessionLocal is None:
         raise RuntimeError("DB not initialized")
     return SessionLocal()
 
 
-async def _seed_initial_data() -> None:
-    if SessionLocal is None:
+# ---- Unit of work ----
+#
+# crud functions only flush; the transaction is committed by whoever owns
+# the session. While an update is being processed (see update_processor.py)
+# every `async with get_session()` in its handlers shares one lazily opened
+# session. When the outermost such block exits cleanly its writes are
+# committed (read-only blocks commit nothing); if it raises they are rolled
+# back. Committing at the end of the DB block rather than at the end of the
+# update keeps the SQLite write lock from being held across Telegram calls.
+
+class UpdateSession:
+    def __init__(self) -> None:
+        self.session: Optional[AsyncSession] = None
+        self.depth = 0
+
+    async def get(self) -> AsyncSession:
+        if self.session is None:
+            self.session = new_session()
+        return self.session
+
+    async def finish(self) -> None:
+        session, self.session = self.session, None
+        if session is None:
+            return
+        try:
+            await session.rollback()
+        finally:
+            await session.close()
+
+
+_update_session: ContextVar[Optional[UpdateSession]] = ContextVar("update_session", default=None)
+
+
+@asynccontextmanager
+async def update_scope() -> AsyncIterator[UpdateSession]:
+    scope = UpdateSession()
+    token = _update_session.set(scope)
+    try:
+        yield scope
+    finally:
+        _update_session.reset(token)
+        await scope.finish()
+
+
+def has_writes(session: AsyncSession) -> bool:
+    """Whether the session's current transaction has (or is about to flush) uncommitted writes."""
+    return bool(session.info.get("has_writes") or session.new or session.dirty or session.deleted)
+
+
+@asynccontextmanager
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """Session for the current unit of work.
+
+    Inside an update this is the update's shared session; elsewhere it is
+    a new session. Either way the block's writes are committed on clean
+    exit and rolled back if it raises.
+    """
+    scope = _update_session.get()
+    if scope is None:
+        async with new_session() as session:
+            yield session
+            await session.commit()
         return
-    async with SessionLocal() as session:
-        from sqlalchemy import select, delete
-
-        # Clear existing data as per user request (items currently in DB are unused)
-        # This will cascade delete items due to relationship settings
-        await session.execute(delete(Category))
-        await session.flush()
-
-        # Seed data based on "Start Cooperation" (Helper V2) structure
-        seed_data = {
-            "⚜️ سلامت پیشگیرانه": [
-                "🚨 تماس اضطراری",
-                "📋 سنجش سلامت",
-                "🧠 غربالگری آلزایمر",
-                "🏥 چکاپ‌های تخصصی",
-                "🏠 بازطراحی محیط زندگی سالمندان"
-            ],
-            "⚜️ تجربه لحظه‌های به‌یاد ماندنی از راه‌دور": [
-                "🍽️ سور (مهمان‌کردن و ساخت تجربه)",
-                "🎶 سورپرایز (اجرای غافلگیرکننده)",
-                "🌸 خرید هدیه، گل و شیرینی"
-            ],
-            "⚜️ انجام نیازهای روزمره": [
-                "🧺 خرید روزمره",
-                "💻 حل مشکلات دیجیتالی"
-            ],
-            "⚜️ میخوام .....": [
-                "می‌خوام پیگیر وضعیت سلامت خانواده و عزیزان باشم!",
-                "می‌خوام خانواده یا یکی از عزیزانم رو سوپرایز یا خوشحال کنم!",
-                "میخوام برای خانوده یا یکی از عزیزانم هدیه، گل یا شیرینی ارسال کنم!",
-                "نیاز به همیاری دارن و من از راه دور نمی‌تونم انجامش بدم!",
-                "اونی که می‌خوام اینحا نیست!"
-            ]
-        }
-
-        for cat_title, items in seed_data.items():
-            cat = Category(title=cat_title)
-            session.add(cat)
-            await session.flush()  # Need ID for items
-            
-            for item_title in items:
-                session.add(Item(category_id=cat.id, title=item_title))
-        
+    session = await scope.get()
+    scope.depth += 1
+    try:
+        yield session
+    except BaseException:
+        scope.depth -= 1
+        if scope.depth == 0:
+            await session.rollback()
+        raise
+    scope.depth -= 1
+    if scope.depth == 0 and has_writes(session):
         await session.commit()
 
 
-async def _seed_admin_user() -> None:
+def mark_written(session: AsyncSession) -> None:
+    """Record a write the unit of work cannot see (Core/bulk statements skip the flush)."""
+    session.info["has_writes"] = True
+
+
+def after_commit(session: AsyncSession, fn: Callable[[], Any]) -> None:
+    """Run `fn` once the session's current transaction commits (dropped on rollback)."""
+    session.info.setdefault("after_commit", []).append(fn)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_writes(sync_session: Session, _flush_context: Any) -> None:
+    sync_session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(sync_session: Session) -> None:
+    sync_session.info.pop("has_writes", None)
+    for fn in sync_session.info.pop("after_commit", ()):
+        try:
+            fn()
+        except Exception:
+            pass
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(sync_session: Session) -> None:
+    sync_session.info.pop("has_writes", None)
+    sync_session.info.pop("after_commit", None)
+
+
+CATALOG_SEED_HASH_KEY = "catalog_seed_hash"
+
+
+def _catalog_seed_hash(seed_data: dict) -> str:
+    raw = json.dumps(seed_data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _insert_ignore(session: AsyncSession, table):
+    """INSERT ... ON CONFLICT DO NOTHING for the session's dialect."""
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).on_conflict_do_nothing()
+
+
+async def _seed_initial_data() -> None:
+    """Sync categories/items with the catalog, keeping existing row ids.
+
+    Skipped entirely when the catalog hash matches the one stored on the
+    last seed; otherwise rows are upserted by natural key (category title,
+    (category_id, item title)) and rows no longer in the catalog are removed.
+    """
     if SessionLocal is None:
         return
+    # Seed data based on "Start Cooperation" (Helper V2) structure, from the catalog registry
+    from catalog import get_catalog
+    seed_data = get_catalog().seed_data()
+    digest = _catalog_seed_hash(seed_data)
     async with SessionLocal() as session:
-        from sqlalchemy import select
-        res = await session.execute(select(User).where(User.telegram_id == 1030212127))
-        user = res.scalars().first()
-        if user:
+        from sqlalchemy import select, delete, tuple_
+
+        stored = await session.get(AppMeta, CATALOG_SEED_HASH_KEY)
+        if stored is not None and stored.value == digest:
             return
-        admin = User(
-            telegram_id=1030212127,
-            username="Shahram0weisy",
-            full_name="shahram oweisy",
-            role_id=1,
-        )
-        session.add(admin)
-        await session.commit()
 
+        if seed_data:
+            await session.execute(
+                _insert_ignore(session, Category.__table__),
+                [{"title": t} for t in seed_data],
+            )
+        res = await session.execute(select(Category.id, Category.title))
+        cat_ids = {title: cid for cid, title in res.all()}
+        wanted = [
+            {"category_id": cat_ids[cat_title], "title": item_title}
+            for cat_title, items in seed_data.items()
+            for item_title in items
+        ]
+        if wanted:
+            await session.execute(_insert_ignore(session, Item.__table__), wanted)
 
-async def _ensure_order_columns() -> None:
-    if SessionLocal is None:
-        return
-    async with SessionLocal() as session:
-        result = await session.execute(text("PRAGMA table_info('orders')"))
-        cols = {row[1] for row in result.fetchall()}
-        alters: list[str] = []
-        if 'phone_number' not in cols:
-            alters.append("ALTER TABLE orders ADD COLUMN phone_number VARCHAR(32)")
-        if 'full_name' not in cols:
-            alters.append("ALTER TABLE orders ADD COLUMN full_name VARCHAR(128)")
-        if 'username' not in cols:
-            alters.append("ALTER TABLE orders ADD COLUMN username VARCHAR(64)")
-        if 'done_at' not in cols:
-            alters.append("ALTER TABLE orders ADD COLUMN done_at TIMESTAMP NULL")
-        for sql in alters:
-            try:
-                await session.execute(text(sql))
-            except Exception:
-                pass
-        if alters:
-            await session.commit()
+        # Drop rows that are no longer part of the catalog (cascades to their items)
+        await session.execute(delete(Category).where(Category.title.not_in(list(seed_data))))
+        if wanted:
+            await session.execute(
+                delete(Item).where(
+                    tuple_(Item.category_id, Item.title).not_in([(w["category_id"], w["title"]) for w in wanted])
+                )
+            )
+
+        if stored is None:
+            session.add(AppMeta(key=CATALOG_SEED_HASH_KEY, value=digest))
+        else:
+            stored.value = digest
+        await session.commit()
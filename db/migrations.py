@@ -0,0 +1,291 @@
+"""
+Numbered schema migrations tracked in the `schema_version` table.
+
+A warm start reads the stored version once and skips everything else;
+only steps newer than that version run, each in its own transaction
+together with the version bump. Steps use SQLAlchemy DDL and the
+inspector rather than SQLite PRAGMAs so they also run on other backends.
+
+Steps never read db/models.py: the tables they create are frozen below as
+they were when the step was released, so changing a model cannot change
+what an old step does. A model change needs a new step.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    type_coerce,
+    update,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from db.search import create_search_index
+
+
+logger = logging.getLogger(__name__)
+
+
+# ---- frozen schema (never edit a released table; add a step instead) ----
+
+_schema = MetaData()
+
+
+def _created_at() -> Column:
+    return Column("created_at", DateTime(timezone=True), server_default=func.now())
+
+
+_schema_version = Table(
+    "schema_version", _schema,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+# Step 1 (the models as of the first numbered migration)
+_users = Table(
+    "users", _schema,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("telegram_id", Integer, index=True, unique=True, nullable=False),
+    Column("username", String(64), nullable=True),
+    Column("full_name", String(128), nullable=True),
+    Column("phone_number", String(32), nullable=True),
+    Column("role_id", Integer, nullable=False, default=2),
+    _created_at(),
+    Index("ix_users_created_at_id", "created_at", "id"),
+)
+_categories = Table(
+    "categories", _schema,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("title", String(128), unique=True, nullable=False),
+    _created_at(),
+)
+_items = Table(
+    "items", _schema,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("category_id", ForeignKey("categories.id", ondelete="CASCADE"), index=True, nullable=False),
+    Column("title", String(128), nullable=False),
+    _created_at(),
+    Index("uq_items_category_title", "category_id", "title", unique=True),
+)
+_orders = Table(
+    "orders", _schema,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("tracking_code", String(16), index=True, unique=True, nullable=False),
+    Column("status", String(32), nullable=False),
+    Column("category_key", String(32), nullable=True),
+    Column("option_title", String(128), nullable=True),
+    _created_at(),
+    Index("ix_orders_user_status_id", "user_id", "status", "id"),
+    Index("ix_orders_status_id", "status", "id"),
+    Index("ix_orders_status_item_id", "status", "option_title", "id"),
+)
+_v1_tables = [
+    _users,
+    _categories,
+    _items,
+    _orders,
+    Table(
+        "custom_requests", _schema,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("user_id", ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False),
+        Column("content_text", String(2048), nullable=True),
+        Column("tracking_code", String(16), nullable=True),
+        _created_at(),
+    ),
+    Table(
+        "media_assets", _schema,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("sha256", String(64), unique=True, nullable=False),
+        Column("name", String(128), index=True, nullable=False),
+        Column("file_id", String(256), nullable=False),
+        _created_at(),
+    ),
+    Table(
+        "tracking_code_sequence", _schema,
+        Column("id", Integer, primary_key=True),
+        Column("next_value", Integer, nullable=False, default=0),
+        Column("key", String(64), nullable=False),
+    ),
+    Table(
+        "app_meta", _schema,
+        Column("key", String(64), primary_key=True),
+        Column("value", String(256), nullable=False),
+    ),
+]
+
+# Step 5
+_order_stats_daily = Table(
+    "order_stats_daily", _schema,
+    Column("status", String(32), primary_key=True),
+    Column("item_title", String(128), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("count", Integer, nullable=False, default=0),
+)
+_user_order_stats = Table(
+    "user_order_stats", _schema,
+    Column("user_id", ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("status", String(32), primary_key=True),
+    Column("count", Integer, nullable=False, default=0),
+)
+_v5_tables = [_order_stats_daily, _user_order_stats]
+
+
+# ---- steps ----
+
+def _create_tables(conn: Connection) -> None:
+    _schema.create_all(conn, tables=_v1_tables, checkfirst=True)
+
+
+def _add_legacy_order_columns(conn: Connection) -> None:
+    # Columns older deployments added by hand; kept for existing databases
+    cols = {c["name"] for c in inspect(conn).get_columns("orders")}
+    for name, ddl in (
+        ("phone_number", "VARCHAR(32)"),
+        ("full_name", "VARCHAR(128)"),
+        ("username", "VARCHAR(64)"),
+        ("done_at", "TIMESTAMP NULL"),
+    ):
+        if name not in cols:
+            conn.execute(text(f"ALTER TABLE orders ADD COLUMN {name} {ddl}"))
+
+
+def _check_tracking_codes_unique(conn: Connection) -> None:
+    # The allocator relies on the unique index; fail (and retry on the next
+    # start) rather than record a version without it
+    dups = conn.execute(text(
+        "SELECT tracking_code FROM orders GROUP BY tracking_code HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if dups:
+        raise RuntimeError(
+            f"orders.tracking_code has {len(dups)} duplicated legacy code(s), e.g. {', '.join(dups[:5])}; "
+            "give those orders distinct codes and restart to add the unique index"
+        )
+
+
+def _create_unique_tracking_index(conn: Connection) -> None:
+    # Older databases only have a non-unique index on tracking_code
+    for ix in inspect(conn).get_indexes("orders"):
+        if ix.get("unique") and ix.get("column_names") == ["tracking_code"]:
+            return
+    _check_tracking_codes_unique(conn)
+    conn.execute(text("CREATE UNIQUE INDEX uq_orders_tracking_code ON orders (tracking_code)"))
+
+
+def _create_indexes(conn: Connection) -> None:
+    _check_tracking_codes_unique(conn)
+    # create_all skips indexes on tables that already existed
+    for table in (_orders, _users, _items):
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    _create_unique_tracking_index(conn)
+
+
+def _seed_admin_user(conn: Connection) -> None:
+    exists = conn.execute(select(_users.c.id).where(_users.c.telegram_id == 1030212127)).first()
+    if exists:
+        return
+    conn.execute(_users.insert().values(
+        telegram_id=1030212127,
+        username="Shahram0weisy",
+        full_name="shahram oweisy",
+        role_id=1,
+    ))
+
+
+def _create_order_stats(conn: Connection) -> None:
+    # Rollup tables (db/stats.py), backfilled from existing orders
+    for table in _v5_tables:
+        table.create(conn, checkfirst=True)
+    o = _orders.c
+    item = func.coalesce(o.option_title, "")
+    day = type_coerce(func.coalesce(func.date(o.created_at), func.current_date()), Date)
+    conn.execute(_order_stats_daily.delete())
+    conn.execute(insert(_order_stats_daily).from_select(
+        ["status", "item_title", "day", "count"],
+        select(o.status, item, day, func.count()).group_by(o.status, item, day),
+    ))
+    conn.execute(_user_order_stats.delete())
+    conn.execute(insert(_user_order_stats).from_select(
+        ["user_id", "status", "count"],
+        select(o.user_id, o.status, func.count()).group_by(o.user_id, o.status),
+    ))
+
+
+def _create_users_role_index(conn: Connection) -> None:
+    # get_admin_telegram_ids scanned users for role_id = 1
+    if "ix_users_role_telegram" not in {ix["name"] for ix in inspect(conn).get_indexes("users")}:
+        conn.execute(text("CREATE INDEX ix_users_role_telegram ON users (role_id, telegram_id)"))
+
+
+# (version, description, step) in ascending order; never renumber or edit
+# a released step, append a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", _create_tables),
+    (2, "legacy order columns", _add_legacy_order_columns),
+    (3, "composite and unique indexes", _create_indexes),
+    (4, "seed admin user", _seed_admin_user),
+    (5, "order statistics rollups", _create_order_stats),
+    (6, "full-text search index", create_search_index),
+    (7, "users role index", _create_users_role_index),
+    # Step 3 used to record its version without the index on duplicates
+    (8, "unique tracking code index", _create_unique_tracking_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def current_version(engine: AsyncEngine) -> int:
+    try:
+        async with engine.connect() as conn:
+            res = await conn.execute(select(_schema_version.c.version).where(_schema_version.c.id == 1))
+            return int(res.scalar() or 0)
+    except DBAPIError:
+        # schema_version does not exist yet (new or pre-migration database)
+        return 0
+
+
+def _set_version(conn: Connection, version: int) -> None:
+    res = conn.execute(update(_schema_version).where(_schema_version.c.id == 1).values(version=version))
+    if res.rowcount == 0:
+        conn.execute(_schema_version.insert().values(id=1, version=version))
+
+
+async def migrate(engine: AsyncEngine) -> int:
+    """Bring the schema up to LATEST_VERSION; returns the resulting version."""
+    version = await current_version(engine)
+    if version >= LATEST_VERSION:
+        return version
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: _schema_version.create(c, checkfirst=True))
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+
+        def _apply(conn: Connection, step=step, number=number) -> None:
+            step(conn)
+            _set_version(conn, number)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(_apply)
+        logger.info("Applied schema migration %s: %s", number, description)
+        version = number
+    return version
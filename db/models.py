@@ -1,23 +1,43 @@
 from __future__ import annotations
 
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DateTime, func, ForeignKey
+from sqlalchemy import Integer, String, Date, DateTime, func, ForeignKey, Index
 
 
 class Base(DeclarativeBase):
     pass
 
 
+# Composite indexes matching the query shapes in db/crud.py
+ORDER_INDEXES = (
+    # per-user lists: WHERE user_id = ? AND status IN (...) ORDER BY id DESC
+    ("ix_orders_user_status_id", ("user_id", "status", "id")),
+    # admin lists: WHERE status = ? ORDER BY id DESC
+    ("ix_orders_status_id", ("status", "id")),
+    # admin group/item lists and per-item counts: WHERE status IN (...) AND option_title = ? ORDER BY id DESC
+    ("ix_orders_status_item_id", ("status", "option_title", "id")),
+)
+
+USER_INDEXES = (
+    # admin user list: ORDER BY created_at DESC
+    ("ix_users_created_at_id", ("created_at", "id")),
+    # admin fan-out: SELECT telegram_id WHERE role_id = ? (covering)
+    ("ix_users_role_telegram", ("role_id", "telegram_id")),
+)
+
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = tuple(Index(name, *cols) for name, cols in ORDER_INDEXES)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
-    tracking_code: Mapped[str] = mapped_column(String(16), index=True, nullable=False)
-    status: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    tracking_code: Mapped[str] = mapped_column(String(16), index=True, unique=True, nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
     category_key: Mapped[str | None] = mapped_column(String(32), nullable=True)
     option_title: Mapped[str | None] = mapped_column(String(128), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    done_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     user: Mapped["User"] = relationship("User", back_populates="orders")
 
@@ -34,6 +54,8 @@ class Category(Base):
 
 class Item(Base):
     __tablename__ = "items"
+    # Natural key used by the catalog seed upsert
+    __table_args__ = (Index("uq_items_category_title", "category_id", "title", unique=True),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"), index=True, nullable=False)
@@ -45,6 +67,7 @@ class Item(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = tuple(Index(name, *cols) for name, cols in USER_INDEXES)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     telegram_id: Mapped[int] = mapped_column(Integer, index=True, unique=True, nullable=False)
@@ -67,3 +90,63 @@ class CustomRequest(Base):
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     user: Mapped["User"] = relationship("User")
+
+
+class MediaAsset(Base):
+    __tablename__ = "media_assets"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(128), index=True, nullable=False)
+    file_id: Mapped[str] = mapped_column(String(256), nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class TrackingCodeSequence(Base):
+    """Single-row counter (plus permutation key) backing tracking code allocation."""
+
+    __tablename__ = "tracking_code_sequence"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    next_value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    key: Mapped[str] = mapped_column(String(64), nullable=False)
+
+
+class AppMeta(Base):
+    """Small key/value store for bookkeeping (e.g. the catalog seed hash)."""
+
+    __tablename__ = "app_meta"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(String(256), nullable=False)
+
+
+class OrderStatsDaily(Base):
+    """Order counts per (status, item, creation day), kept in step with orders (see db/stats.py)."""
+
+    __tablename__ = "order_stats_daily"
+
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # Order.option_title, "" for orders without one
+    item_title: Mapped[str] = mapped_column(String(128), primary_key=True)
+    day: Mapped[Date] = mapped_column(Date, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class UserOrderStats(Base):
+    """Order counts per (user, status), kept in step with orders (see db/stats.py)."""
+
+    __tablename__ = "user_order_stats"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class SchemaVersion(Base):
+    """Single row holding the last applied migration number (see db/migrations.py)."""
+
+    __tablename__ = "schema_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
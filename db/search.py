@@ -0,0 +1,192 @@
+"""
+Admin full-text search over users, orders and custom requests (SQLite FTS5).
+
+One trigram-tokenized FTS5 table, `search_index`, holds a row per user
+(full name, username, phone), order (tracking code, item title) and custom
+request (text). The row id encodes the source: `id * ROWID_STRIDE + kind`,
+so triggers update or delete a source's row by rowid. Trigrams match
+substrings, so partial phone numbers and tracking codes are found, and
+bm25() ranks the results.
+
+Text is normalized the same way on both sides: the triggers apply the
+nested replace() built by `sql_normalize`, and queries go through
+`normalize_fa`. Both fold Arabic yeh/kaf to Persian, drop ZWNJ, and map
+Persian and Arabic-Indic digits to ASCII. Other backends, and SQLite
+builds without FTS5 or the trigram tokenizer (3.34+), have no index and
+`search` returns None.
+
+Results are paged on a (rank, rowid) keyset like the other admin lists,
+so a deep page does not re-rank and skip every earlier hit.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Connection, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "search_index"
+
+KIND_USER = 1
+KIND_ORDER = 2
+KIND_REQUEST = 3
+ROWID_STRIDE = 4
+
+# Trigram queries need at least three characters per term
+MIN_TERM_LENGTH = 3
+
+_FOLD = {
+    "\u064a": "\u06cc",  # Arabic yeh -> Persian yeh
+    "\u0649": "\u06cc",  # alef maksura -> Persian yeh
+    "\u0643": "\u06a9",  # Arabic kaf -> Persian kaf
+    "\u200c": "",  # ZWNJ
+}
+for _i in range(10):
+    _FOLD[chr(0x06F0 + _i)] = str(_i)  # Persian digits
+    _FOLD[chr(0x0660 + _i)] = str(_i)  # Arabic-Indic digits
+_TRANSLATE = str.maketrans(_FOLD)
+
+
+def normalize_fa(value: str) -> str:
+    return value.translate(_TRANSLATE)
+
+
+def sql_normalize(expr: str) -> str:
+    """SQL expression applying `normalize_fa` to `expr` (char() keeps the DDL ASCII)."""
+    for src, dst in _FOLD.items():
+        replacement = f"char({ord(dst)})" if dst else "''"
+        expr = f"replace({expr}, char({ord(src)}), {replacement})"
+    return expr
+
+
+# (kind, table, indexed columns, indexed text over row alias {r})
+_SOURCES = (
+    (KIND_USER, "users", ("full_name", "username", "phone_number"),
+     "coalesce({r}.full_name, '') || ' ' || coalesce({r}.username, '') || ' ' || coalesce({r}.phone_number, '')"),
+    (KIND_ORDER, "orders", ("tracking_code", "option_title"),
+     "coalesce({r}.tracking_code, '') || ' ' || coalesce({r}.option_title, '')"),
+    (KIND_REQUEST, "custom_requests", ("content_text",),
+     "coalesce({r}.content_text, '')"),
+)
+
+
+def _ddl() -> List[str]:
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(content, tokenize='trigram')",
+    ]
+    for kind, table, columns, content in _SOURCES:
+        def row(alias: str) -> Tuple[str, str]:
+            return (
+                f"{alias}.id * {ROWID_STRIDE} + {kind}",
+                sql_normalize(content.format(r=alias)),
+            )
+
+        new_id, new_content = row("new")
+        old_id, _ = row("old")
+        insert_new = f"INSERT INTO {FTS_TABLE}(rowid, content) VALUES ({new_id}, {new_content});"
+        delete_old = f"DELETE FROM {FTS_TABLE} WHERE rowid = {old_id};"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {', '.join(columns)} ON {table} "
+            f"BEGIN {delete_old} {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        ]
+        t_id, t_content = row(table)
+        statements.append(f"INSERT INTO {FTS_TABLE}(rowid, content) SELECT {t_id}, {t_content} FROM {table}")
+    return statements
+
+
+def trigram_fts_supported(conn: Connection) -> bool:
+    """Whether this SQLite has FTS5 and its trigram tokenizer (SQLite 3.34+)."""
+    version = tuple(int(part) for part in conn.execute(text("SELECT sqlite_version()")).scalar_one().split("."))
+    if version < (3, 34):
+        return False
+    options = conn.execute(text("SELECT compile_options FROM pragma_compile_options")).scalars()
+    return "ENABLE_FTS5" in set(options)
+
+
+def create_search_index(conn: Connection) -> None:
+    """Create the FTS table and its triggers, and index existing rows (SQLite only)."""
+    if conn.dialect.name != "sqlite":
+        logger.info("Full-text search is only available on SQLite; skipping the search index")
+        return
+    if not trigram_fts_supported(conn):
+        logger.warning("This SQLite lacks FTS5 trigram support (needs 3.34+); skipping the search index")
+        return
+    for statement in _ddl():
+        conn.execute(text(statement))
+
+
+def match_expression(query: str) -> Optional[str]:
+    """FTS5 MATCH expression ANDing the query's terms, or None if no term is long enough."""
+    terms = []
+    for term in normalize_fa(query).replace("@", " ").split():
+        if len(term) >= MIN_TERM_LENGTH:
+            terms.append('"' + term.replace('"', '""') + '"')
+    return " AND ".join(terms) if terms else None
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    rowid: int
+    # bm25(); lower ranks better
+    rank: float
+
+    @property
+    def kind(self) -> int:
+        return self.rowid % ROWID_STRIDE
+
+    @property
+    def id(self) -> int:
+        return self.rowid // ROWID_STRIDE
+
+
+async def _index_exists(session: AsyncSession) -> bool:
+    res = await session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    )
+    return res.first() is not None
+
+
+async def search(
+    session: AsyncSession,
+    query: str,
+    limit: int,
+    after: Optional[Tuple[float, int]] = None,
+    before: Optional[Tuple[float, int]] = None,
+) -> Optional[Tuple[List[SearchHit], bool, bool]]:
+    """Keyset page of ranked hits for `query` (see match_expression).
+
+    `after` / `before` are the (rank, rowid) of the last / first hit of the
+    current page. Returns (hits, has_prev, has_next) using a limit+1 probe,
+    or None when search is unavailable.
+    """
+    if session.bind.dialect.name != "sqlite" or not await _index_exists(session):
+        return None
+    expr = match_expression(query)
+    if expr is None:
+        return [], False, False
+    params = {"expr": expr, "limit": limit + 1}
+    ranked = f"SELECT rowid, bm25({FTS_TABLE}) AS r FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expr"
+    if before is not None:
+        params["rank"], params["rowid"] = before
+        sql = f"SELECT rowid, r FROM ({ranked}) WHERE r < :rank OR (r = :rank AND rowid < :rowid) ORDER BY r DESC, rowid DESC"
+    elif after is not None:
+        params["rank"], params["rowid"] = after
+        sql = f"SELECT rowid, r FROM ({ranked}) WHERE r > :rank OR (r = :rank AND rowid > :rowid) ORDER BY r, rowid"
+    else:
+        sql = f"SELECT rowid, r FROM ({ranked}) ORDER BY r, rowid"
+    res = await session.execute(text(sql + " LIMIT :limit"), params)
+    hits = [SearchHit(rowid, rank) for rowid, rank in res.all()]
+    if before is not None:
+        has_prev = len(hits) > limit
+        hits = hits[:limit]
+        hits.reverse()
+        return hits, has_prev, True
+    return hits[:limit], after is not None, len(hits) > limit
@@ -0,0 +1,122 @@
+"""
+Order count rollups: `order_stats_daily` (status, item, day) and
+`user_order_stats` (user, status).
+
+create_order and the status updates in db/crud.py apply +1/-1 deltas here
+in the same transaction as the order write, so dashboards and the orders
+menu read a handful of counter rows instead of running COUNT(*) over
+orders. `rebuild_statements` recomputes both tables from orders; it is the
+backfill migration and the periodic reconciliation job
+(STATS_RECONCILE_INTERVAL seconds, 0 disables), which repairs any drift
+from writes made outside the bot.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import date
+from typing import Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, delete, func, insert, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Order, OrderStatsDaily, UserOrderStats
+from settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# (user_id, status, item_title, day) of one order
+OrderKey = Tuple[int, str, Optional[str], date]
+
+
+def order_day() -> Any:
+    """An order's stats day: the (UTC) date it was created."""
+    return type_coerce(func.coalesce(func.date(Order.created_at), func.current_date()), Date)
+
+
+def _upsert_add(session: AsyncSession, table, keys: List[str]):
+    """INSERT ... ON CONFLICT (keys) DO UPDATE SET count = count + excluded.count."""
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(index_elements=keys, set_={"count": table.c["count"] + stmt.excluded["count"]})
+
+
+async def apply_order_deltas(session: AsyncSession, deltas: Iterable[Tuple[OrderKey, int]]) -> None:
+    """Add each delta to the order's daily and per-user counters (one executemany per table)."""
+    daily: Counter[Tuple[str, str, date]] = Counter()
+    per_user: Counter[Tuple[int, str]] = Counter()
+    for (user_id, status, item_title, day), delta in deltas:
+        daily[(status, item_title or "", day)] += delta
+        per_user[(user_id, status)] += delta
+    daily_rows = [
+        {"status": status, "item_title": item, "day": day, "count": n}
+        for (status, item, day), n in daily.items() if n
+    ]
+    user_rows = [{"user_id": uid, "status": status, "count": n} for (uid, status), n in per_user.items() if n]
+    if daily_rows:
+        await session.execute(_upsert_add(session, OrderStatsDaily.__table__, ["status", "item_title", "day"]), daily_rows)
+    if user_rows:
+        await session.execute(_upsert_add(session, UserOrderStats.__table__, ["user_id", "status"]), user_rows)
+
+
+def rebuild_statements() -> List[Any]:
+    """Statements that recompute both rollup tables from orders (run them in one transaction)."""
+    item = func.coalesce(Order.option_title, "")
+    day = order_day()
+    return [
+        delete(OrderStatsDaily),
+        insert(OrderStatsDaily).from_select(
+            ["status", "item_title", "day", "count"],
+            select(Order.status, item, day, func.count()).group_by(Order.status, item, day),
+        ),
+        delete(UserOrderStats),
+        insert(UserOrderStats).from_select(
+            ["user_id", "status", "count"],
+            select(Order.user_id, Order.status, func.count()).group_by(Order.user_id, Order.status),
+        ),
+    ]
+
+
+async def reconcile_order_stats(session: AsyncSession) -> None:
+    for stmt in rebuild_statements():
+        await session.execute(stmt)
+
+
+# ---- Periodic reconciliation (Application post_init/post_shutdown hooks) ----
+
+BOT_DATA_KEY = "stats_reconciler"
+
+
+async def _reconcile_loop(interval: float) -> None:
+    from db.database import new_session
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with new_session() as session:
+                await reconcile_order_stats(session)
+                await session.commit()
+            logger.debug("Reconciled order statistics")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Order statistics reconciliation failed")
+
+
+async def start_stats_reconciler(app: Any) -> None:
+    interval = get_settings(app).stats_reconcile_interval
+    if interval > 0:
+        app.bot_data[BOT_DATA_KEY] = asyncio.create_task(_reconcile_loop(interval), name="stats-reconciler")
+
+
+async def stop_stats_reconciler(app: Any) -> None:
+    task = app.bot_data.pop(BOT_DATA_KEY, None)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
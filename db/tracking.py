@@ -0,0 +1,92 @@
+"""
+Collision-free 6-digit tracking code allocation.
+
+Codes are produced by running a persistent counter through a keyed
+Feistel permutation of the 900 000-value space [100000, 999999], so
+consecutive orders get unrelated-looking but never repeating codes.
+Each process reserves a block of counter values at a time with a single
+atomic UPDATE, then hands out codes from memory in O(1).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from collections import deque
+from typing import Deque, Optional
+
+from db.database import new_session
+from db.crud import existing_tracking_codes, reserve_tracking_sequence
+from settings import Settings, get_settings
+
+
+CODE_MIN = 100000
+# The permutation works on (a, b) pairs with a in [0, 900) and b in [0, 1000);
+# alternating the two moduli each round keeps it a bijection on exactly
+# 900 * 1000 values without cycle-walking.
+_RADIX_A = 900
+_RADIX_B = 1000
+DOMAIN = _RADIX_A * _RADIX_B
+_ROUNDS = 6
+
+def _round_fn(key: bytes, rnd: int, value: int, mod: int) -> int:
+    h = hashlib.blake2b(value.to_bytes(4, "big") + bytes((rnd,)), key=key, digest_size=8)
+    return int.from_bytes(h.digest(), "big") % mod
+
+
+def permute(n: int, key: bytes) -> int:
+    """Map n in [0, DOMAIN) to a unique value in [0, DOMAIN)."""
+    if not 0 <= n < DOMAIN:
+        raise ValueError("tracking code space exhausted")
+    a, b = divmod(n, _RADIX_B)
+    mod_a, mod_b = _RADIX_A, _RADIX_B
+    for rnd in range(_ROUNDS):
+        a, b = b, (a + _round_fn(key, rnd, b, mod_a)) % mod_a
+        mod_a, mod_b = mod_b, mod_a
+    return a * _RADIX_B + b
+
+
+def code_for(n: int, key: bytes) -> str:
+    return str(CODE_MIN + permute(n, key))
+
+
+class TrackingCodeAllocator:
+    def __init__(self, block_size: int = Settings.tracking_code_block) -> None:
+        self.block_size = block_size
+        self._pool: Deque[str] = deque()
+        self._lock = asyncio.Lock()
+
+    async def _refill(self) -> None:
+        # Independent of the current update's transaction (the reservation commits)
+        async with new_session() as session:
+            start, key = await reserve_tracking_sequence(session, self.block_size)
+            if start >= DOMAIN:
+                raise RuntimeError("tracking code space exhausted")
+            kb = key.encode("utf-8")
+            codes = [code_for(n, kb) for n in range(start, min(start + self.block_size, DOMAIN))]
+            # Skip codes already taken by orders created before the allocator existed
+            taken = await existing_tracking_codes(session, codes)
+        self._pool.extend(c for c in codes if c not in taken)
+
+    async def allocate(self) -> str:
+        while not self._pool:
+            async with self._lock:
+                if not self._pool:
+                    await self._refill()
+        return self._pool.popleft()
+
+
+_allocator: Optional[TrackingCodeAllocator] = None
+
+
+async def allocate_tracking_code() -> str:
+    """Next tracking code.
+
+    A pool refill writes through its own session, so call this before the
+    current update has written anything: on SQLite the update's open write
+    transaction would otherwise block the refill until it times out.
+    """
+    global _allocator
+    if _allocator is None:
+        _allocator = TrackingCodeAllocator(get_settings().tracking_code_block)
+    return await _allocator.allocate()
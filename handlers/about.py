@@ -7,7 +7,7 @@ from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from keyboards import back_to_main_button, support_kb, contact_menu_kb, socials_links_kb, contact_website_kb, trust_kb
-import os
+from settings import get_settings
 
 
 async def open_trust(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -58,13 +58,9 @@ async def open_ask(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return 1
 
 
-def _get_contact_urls():
-    tg = os.getenv("TELEGRAM_CHANNEL_URL", "https://t.me/+wq00h6LuLBsyOWJk")
-    ig = os.getenv("INSTAGRAM_URL", "https://instagram.com/risheh.life")
-    yt = os.getenv("YOUTUBE_URL", "https://youtube.com/@risheh")
-    li = os.getenv("LINKEDIN_URL", "https://www.linkedin.com/company/rishehstory")
-    web = os.getenv("WEBSITE_URL", "https://risheh.net")
-    return tg, ig, yt, li, web
+def _get_contact_urls(context: ContextTypes.DEFAULT_TYPE):
+    s = get_settings(context)
+    return s.telegram_channel_url, s.instagram_url, s.youtube_url, s.linkedin_url, s.website_url
 
 
 async def open_contact_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -88,7 +84,7 @@ async def open_contact_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def open_contact_socials(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    tg, ig, yt, li, _ = _get_contact_urls()
+    tg, ig, yt, li, _ = _get_contact_urls(context)
     text = (
         "<b>🌿 می‌خوای بیشتر با ریشه آشنا شی؟</b>\n\n"
         "توی شبکه‌های اجتماعی ریشه، روایت‌های واقعی از خانواده‌ها 🤍 و اطلاع‌رسانی خدمات جدید رو منتشر می‌کنیم ✨\n"
@@ -101,7 +97,7 @@ async def open_contact_socials(update: Update, context: ContextTypes.DEFAULT_TYP
 async def open_contact_website(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    *_, web = _get_contact_urls()
+    *_, web = _get_contact_urls(context)
     text = (
         "<b>🌐 وبسایت ریشه</b>\n"
         "اگه می‌خوای کامل‌تر با خدمات و ساختار ریشه آشنا شی، پیشنهاد می‌کنیم یه سر به وبسایت بزنی 👀\n"
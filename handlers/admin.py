@@ -4,19 +4,22 @@ Admin-specific handlers: list all orders by status and inspect details.
 
 from __future__ import annotations
 
+import contextvars
+import html
 from typing import List
 
-from telegram import Update
+from telegram import InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from db.database import get_session
 from db.crud import (
+    OrderView,
     get_all_orders_by_status,
-    find_order_by_code,
+    get_order_codes_by_statuses,
+    get_order_view_by_code,
     update_order_status_by_code,
-    count_orders_by_status,
-    get_orders_paged_by_status,
+    update_orders_status_by_codes,
 )
 from keyboards import (
     admin_orders_menu_kb,
@@ -28,19 +31,31 @@ from keyboards import (
     admin_user_actions_kb,
     admin_items_menu_kb,
     admin_named_orders_list_kb,
+    admin_bulk_orders_list_kb,
+    admin_bulk_status_menu_kb,
+    admin_search_results_kb,
 )
 from db.models import User
 from datetime import datetime
+from notifier import notify
 from db.crud import (
     count_users,
-    get_users_paged,
+    get_cached_user,
     get_user_by_id,
     set_user_admin,
     set_user_role,
     get_all_items,
-    count_orders_by_statuses_and_item,
-    get_orders_paged_by_statuses_and_item,
+    count_orders_by_statuses_per_item,
+    get_orders_keyset_by_statuses,
+    get_users_keyset,
+    get_users_by_ids,
+    get_orders_by_ids,
+    get_custom_requests_by_ids,
 )
+from db.search import KIND_ORDER, KIND_REQUEST, KIND_USER, match_expression, search
+from db.cache import TTLCache
+from order_export import FORMATS, send_order_export
+from settings import get_settings
 
 
 STATUS_MAP = {
@@ -62,6 +77,22 @@ def _format_jalali(dt: datetime | None) -> str:
             return str(dt)
 
 
+def _order_details_text(order: OrderView) -> str:
+    return (
+        f"<b>مشخصات کاربر</b>\n"
+        f"نام کامل: {order.user_full_name or '—'}\n"
+        f"نام‌کاربری: {order.user_username or '—'}\n"
+        f"موبایل: {order.user_phone or '—'}\n\n"
+        f"<b>جزئیات سفارش</b>\n"
+        f"کد پیگیری: {order.tracking_code}\n"
+        f"وضعیت: {order.status}\n"
+        f"دسته: {order.category_key or '—'}\n"
+        f"آیتم: {order.option_title or '—'}\n"
+        f"تاریخ ثبت: {_format_jalali(order.created_at)}\n"
+        f"تاریخ انجام: {_format_jalali(order.done_at)}"
+    )
+
+
 async def open_admin_orders_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
@@ -93,18 +124,18 @@ ADMIN_GROUPS = {
 async def admin_orders_group_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, group_key = query.data.split(":", 2)
+    (group_key,) = context.args
     if group_key not in ADMIN_GROUPS:
         await query.edit_message_text("گروه نامعتبر است.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
         return 1
     async with get_session() as session:
         items = await get_all_items(session)
         statuses = ADMIN_GROUPS[group_key]["statuses"]
-        pairs = []
-        for it in items:
-            cnt = await count_orders_by_statuses_and_item(session, statuses, it.title)
-            label = f"{it.title} ({cnt})"
-            pairs.append((it.id, label))
+        counts = await count_orders_by_statuses_per_item(session, statuses)
+    pairs = []
+    for it in items:
+        label = f"{it.title} ({counts.get(it.title, 0)})"
+        pairs.append((it.id, label))
     title = ADMIN_GROUPS[group_key]["name"]
     await query.edit_message_text(f"<b>{title}</b>\n\nیک آیتم را انتخاب کنید:", reply_markup=admin_items_menu_kb(pairs, group_key), parse_mode=ParseMode.HTML)
     return 1
@@ -113,17 +144,28 @@ async def admin_orders_group_selected(update: Update, context: ContextTypes.DEFA
 PAGE_SIZE_GROUP_ITEM = 10
 
 
-async def admin_orders_group_item_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    query = update.callback_query
-    await query.answer()
-    _, _, group_key, item_id_str, page_str = query.data.split(":", 4)
-    item_id = int(item_id_str)
-    page = int(page_str)
-    group = ADMIN_GROUPS.get(group_key)
-    if not group:
-        await query.edit_message_text("گروه نامعتبر است.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
-        return 1
-    statuses = group["statuses"]
+def _parse_cursor(raw: str | None) -> tuple[int | None, int | None]:
+    """Decode a keyset cursor from callback data into (after_id, before_id).
+
+    "a<id>" continues after (older than) id, "b<id>" goes back before (newer
+    than) id; anything else (e.g. "0" or a legacy page number) is the first page.
+    """
+    if raw and raw[0] in ("a", "b") and raw[1:].isdigit():
+        value = int(raw[1:])
+        return (value, None) if raw[0] == "a" else (None, value)
+    return None, None
+
+
+def _nav_cursors(rows, has_prev: bool, has_next: bool) -> tuple[str | None, str | None]:
+    prev_cursor = f"b{rows[0].id}" if rows and has_prev else None
+    next_cursor = f"a{rows[-1].id}" if rows and has_next else None
+    return prev_cursor, next_cursor
+
+
+async def _load_group_item_page(group_key: str, item_id: int, cursor: str):
+    """One keyset page of a group's orders for an item: (item, entries, prev, next), or None."""
+    after_id, before_id = _parse_cursor(cursor)
+    statuses = ADMIN_GROUPS[group_key]["statuses"]
     # Need item title for filtering orders.option_title
     async with get_session() as session:
         from db.models import Item
@@ -131,11 +173,10 @@ async def admin_orders_group_item_page(update: Update, context: ContextTypes.DEF
         res = await session.execute(select(Item).where(Item.id == item_id))
         item = res.scalars().first()
         if not item:
-            await query.edit_message_text("آیتم پیدا نشد.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
-            return 1
-        offset = page * PAGE_SIZE_GROUP_ITEM
-        total = await count_orders_by_statuses_and_item(session, statuses, item.title)
-        orders = await get_orders_paged_by_statuses_and_item(session, statuses, item.title, offset, PAGE_SIZE_GROUP_ITEM)
+            return None
+        orders, has_prev, has_next = await get_orders_keyset_by_statuses(
+            session, statuses, PAGE_SIZE_GROUP_ITEM, after_id=after_id, before_id=before_id, item_title=item.title
+        )
         # Fetch users for label building
         user_ids = list({o.user_id for o in orders})
         users = {}
@@ -155,17 +196,199 @@ async def admin_orders_group_item_page(update: Update, context: ContextTypes.DEF
         else:
             label = o.tracking_code
         entries.append((label, o.tracking_code))
-    has_prev = page > 0
-    has_next = (page * PAGE_SIZE_GROUP_ITEM + len(orders)) < total
+    prev_cursor, next_cursor = _nav_cursors(orders, has_prev, has_next)
+    return item, entries, prev_cursor, next_cursor
+
+
+async def admin_orders_group_item_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    # ORDERS_ADMIN:GROUP_ITEM:<group>:<item_id>:<cursor> (also GROUP_ITEM_PAGE)
+    group_key, item_id, cursor = context.args
+    if group_key not in ADMIN_GROUPS:
+        await query.edit_message_text("گروه نامعتبر است.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
+        return 1
+    page = await _load_group_item_page(group_key, item_id, cursor)
+    if page is None:
+        await query.edit_message_text("آیتم پیدا نشد.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
+        return 1
+    item, entries, prev_cursor, next_cursor = page
     title = ADMIN_GROUPS[group_key]["name"]
     await query.edit_message_text(
         f"{title} → {item.title}\n\nسفارش را انتخاب کنید:",
-        reply_markup=admin_named_orders_list_kb(entries, group_key, item_id, page, has_prev, has_next),
+        reply_markup=admin_named_orders_list_kb(entries, group_key, item_id, prev_cursor, next_cursor, cursor),
+        parse_mode=ParseMode.HTML,
+    )
+    return 1
+
+
+# ---- Bulk status changes ----
+# The selection lives in user_data["admin_bulk"] and is scoped to one
+# (group, item) list; opening another list starts a fresh selection.
+
+def _bulk_selection(context: ContextTypes.DEFAULT_TYPE, group_key: str, item_id: int) -> set[str]:
+    bulk = context.user_data.get("admin_bulk")
+    if not bulk or bulk.get("scope") != (group_key, item_id):
+        bulk = context.user_data["admin_bulk"] = {"scope": (group_key, item_id), "codes": set()}
+    return bulk["codes"]
+
+
+async def _show_bulk_page(query, context: ContextTypes.DEFAULT_TYPE, group_key: str, item_id: int, cursor: str) -> int:
+    if group_key not in ADMIN_GROUPS:
+        await query.edit_message_text("گروه نامعتبر است.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
+        return 1
+    page = await _load_group_item_page(group_key, item_id, cursor)
+    if page is None:
+        await query.edit_message_text("آیتم پیدا نشد.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
+        return 1
+    item, entries, prev_cursor, next_cursor = page
+    selected = _bulk_selection(context, group_key, item_id)
+    context.user_data["admin_bulk_page"] = [code for _, code in entries]
+    title = ADMIN_GROUPS[group_key]["name"]
+    await query.edit_message_text(
+        f"{title} → {item.title}\n\nسفارش‌ها را انتخاب کنید ({len(selected)} انتخاب شده):",
+        reply_markup=admin_bulk_orders_list_kb(entries, selected, group_key, item_id, cursor, prev_cursor, next_cursor),
+        parse_mode=ParseMode.HTML,
+    )
+    return 1
+
+
+async def admin_bulk_open(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    if not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    await query.answer()
+    # ORDERS_ADMIN:BULK:<group>:<item_id>:<cursor>
+    group_key, item_id, cursor = context.args
+    return await _show_bulk_page(query, context, group_key, item_id, cursor)
+
+
+async def admin_bulk_toggle(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    if not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    await query.answer()
+    group_key, item_id, cursor, code = context.args
+    selected = _bulk_selection(context, group_key, item_id)
+    if code in selected:
+        selected.discard(code)
+    else:
+        selected.add(code)
+    return await _show_bulk_page(query, context, group_key, item_id, cursor)
+
+
+async def admin_bulk_select_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    if not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    await query.answer()
+    group_key, item_id, cursor = context.args
+    _bulk_selection(context, group_key, item_id).update(context.user_data.get("admin_bulk_page") or ())
+    return await _show_bulk_page(query, context, group_key, item_id, cursor)
+
+
+async def admin_bulk_select_all(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    if not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    await query.answer()
+    group_key, item_id, cursor = context.args
+    group = ADMIN_GROUPS.get(group_key)
+    if group:
+        async with get_session() as session:
+            from db.models import Item
+            item = await session.get(Item, item_id)
+            codes = await get_order_codes_by_statuses(session, group["statuses"], item.title) if item else []
+        _bulk_selection(context, group_key, item_id).update(codes)
+    return await _show_bulk_page(query, context, group_key, item_id, cursor)
+
+
+async def admin_bulk_clear(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    if not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    await query.answer()
+    group_key, item_id, cursor = context.args
+    _bulk_selection(context, group_key, item_id).clear()
+    return await _show_bulk_page(query, context, group_key, item_id, cursor)
+
+
+async def admin_bulk_status_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    if not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    await query.answer()
+    group_key, item_id, cursor = context.args
+    selected = _bulk_selection(context, group_key, item_id)
+    if not selected:
+        return await _show_bulk_page(query, context, group_key, item_id, cursor)
+    await query.edit_message_text(
+        f"وضعیت جدید برای {len(selected)} سفارش را انتخاب کنید:",
+        reply_markup=admin_bulk_status_menu_kb(group_key, item_id, cursor),
         parse_mode=ParseMode.HTML,
     )
     return 1
 
 
+def _status_change_message(orders: List[OrderView]) -> str:
+    first = orders[0]
+    name = first.user_full_name or (('@' + first.user_username) if first.user_username else '')
+    if len(orders) == 1:
+        return (
+            f"کاربر گرامی {name}\n\n"
+            f"درخواست شما برای «{first.option_title or '—'}» تغییر وضعیت داده شد.\n"
+            f"آخرین وضعیت: {first.status}"
+        )
+    lines = [f"• {o.option_title or '—'} ({o.tracking_code})" for o in orders]
+    return (
+        f"کاربر گرامی {name}\n\n"
+        f"وضعیت {len(orders)} درخواست شما به «{first.status}» تغییر کرد:\n"
+        + "\n".join(lines)
+    )
+
+
+async def _notify_status_changes(context: ContextTypes.DEFAULT_TYPE, orders: List[OrderView]) -> None:
+    """One notice per user, however many of their orders changed."""
+    by_user: dict[int, List[OrderView]] = {}
+    for o in orders:
+        if o.user_telegram_id:
+            by_user.setdefault(o.user_telegram_id, []).append(o)
+    for chat_id, user_orders in by_user.items():
+        msg = _status_change_message(user_orders)
+        try:
+            await notify(context, chat_id, lambda bot, chat_id=chat_id, msg=msg: bot.send_message(chat_id=chat_id, text=msg))
+        except Exception:
+            pass
+
+
+async def admin_bulk_set_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    if not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    group_key, item_id, cursor, key = context.args
+    label = STATUS_LABELS.get(key, key)
+    selected = _bulk_selection(context, group_key, item_id)
+    codes = sorted(selected)
+    async with get_session() as session:
+        orders = await update_orders_status_by_codes(session, codes, label)
+    selected.clear()
+    # Answered only now, so the confirmation can be an alert
+    try:
+        await query.answer(text=f"وضعیت {len(orders)} سفارش به «{label}» تغییر کرد.", show_alert=True)
+    except Exception:
+        pass
+    await _notify_status_changes(context, orders)
+    # Changed orders may have left this group; reopen its first page
+    return await _show_bulk_page(query, context, group_key, item_id, "0")
+
+
 async def open_admin_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
@@ -175,14 +398,20 @@ async def open_admin_users_menu(update: Update, context: ContextTypes.DEFAULT_TY
 
 PAGE_SIZE = 10
 
+# Total user count shown in the list header; refreshed at most every 30s
+_users_count_cache: TTLCache[str, int] = TTLCache(maxsize=1, ttl=30)
+
 
-async def open_users_list(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0) -> int:
+async def open_users_list(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor: str = "0") -> int:
     query = update.callback_query
     await query.answer()
-    offset = page * PAGE_SIZE
+    after_id, before_id = _parse_cursor(cursor)
     async with get_session() as session:
-        total = await count_users(session)
-        users = await get_users_paged(session, offset, PAGE_SIZE)
+        total = _users_count_cache.get("all")
+        if total is None:
+            total = await count_users(session)
+            _users_count_cache.set("all", total)
+        users, has_prev, has_next = await get_users_keyset(session, PAGE_SIZE, after_id=after_id, before_id=before_id)
     btns: List[tuple[int, str]] = []
     for u in users:
         if u.full_name and u.full_name.strip():
@@ -192,30 +421,25 @@ async def open_users_list(update: Update, context: ContextTypes.DEFAULT_TYPE, pa
         else:
             label = "کاربر ناشناس"
         btns.append((u.id, label))
-    has_prev = page > 0
-    has_next = (offset + PAGE_SIZE) < total
+    prev_cursor, next_cursor = _nav_cursors(users, has_prev, has_next)
     header = f"<b>تعداد کل کاربران:</b> {total}\n\nسفارش‌دهندگان ثبت‌شده:" if total else "کاربری یافت نشد."
-    await query.edit_message_text(header, reply_markup=admin_users_list_kb(btns, page, has_prev, has_next), parse_mode=ParseMode.HTML)
+    await query.edit_message_text(header, reply_markup=admin_users_list_kb(btns, cursor, prev_cursor, next_cursor), parse_mode=ParseMode.HTML)
     return 1
 
 
 async def admin_users_open(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    return await open_users_list(update, context, 0)
+    return await open_users_list(update, context, "0")
 
 
 async def admin_users_change_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    query = update.callback_query
-    _, _, page_str = query.data.split(":", 2)
-    page = int(page_str)
-    return await open_users_list(update, context, page)
+    (cursor,) = context.args
+    return await open_users_list(update, context, cursor)
 
 
 async def admin_user_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, user_id_str, page_str = query.data.split(":", 3)
-    user_id = int(user_id_str)
-    page = int(page_str)
+    user_id, page = context.args
     async with get_session() as session:
         user = await get_user_by_id(session, user_id)
     if not user:
@@ -233,10 +457,7 @@ async def admin_user_selected(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def admin_set_user_role(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, user_id_str, role_id_str, page_str = query.data.split(":", 4)
-    user_id = int(user_id_str)
-    role_id = int(role_id_str)
-    page = int(page_str)
+    user_id, role_id, page = context.args
     async with get_session() as session:
         ok = await set_user_role(session, user_id, role_id)
         user = await get_user_by_id(session, user_id)
@@ -259,14 +480,11 @@ PAGE_SIZE_ORDERS = 10
 async def admin_orders_filter_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, filt = query.data.split(":", 2)
+    (filt,) = context.args
     fa_status = STATUS_MAP.get(filt, "")
-    page = 0
-    offset = page * PAGE_SIZE_ORDERS
     async with get_session() as session:
-        total = await count_orders_by_status(session, fa_status)
-        orders = await get_orders_paged_by_status(session, fa_status, offset, PAGE_SIZE_ORDERS)
-    if not orders and total == 0:
+        orders, has_prev, has_next = await get_orders_keyset_by_statuses(session, [fa_status], PAGE_SIZE_ORDERS)
+    if not orders:
         await query.edit_message_text(
             f"هیچ سفارشی با وضعیت «{fa_status or '—'}» یافت نشد.",
             reply_markup=admin_orders_menu_kb(),
@@ -274,60 +492,31 @@ async def admin_orders_filter_selected(update: Update, context: ContextTypes.DEF
         )
         return 1
     codes: List[str] = [o.tracking_code for o in orders]
-    has_prev = False
-    has_next = (offset + PAGE_SIZE_ORDERS) < total
+    prev_cursor, next_cursor = _nav_cursors(orders, has_prev, has_next)
     await query.edit_message_text(
         "سفارش خود را انتخاب کنید:",
-        reply_markup=admin_orders_list_kb(codes, filt, page, has_prev, has_next),
+        reply_markup=admin_orders_list_kb(codes, filt, prev_cursor, next_cursor),
         parse_mode=ParseMode.HTML,
     )
     context.user_data["admin_orders_list_status"] = filt
-    context.user_data["admin_orders_page"] = page
+    context.user_data["admin_orders_page"] = "0"
     return 1
 
 
 async def admin_order_code_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    parts = query.data.split(":")
     # ORDERS_ADMIN:CODE:<code> or ORDERS_ADMIN:CODE:<code>:<page>
-    code = parts[2]
-    page = int(parts[3]) if len(parts) > 3 and parts[3].isdigit() else context.user_data.get("admin_orders_page", 0)
+    code = context.args[0]
     async with get_session() as session:
-        order = await find_order_by_code(session, code)
-        user = None
-        if order:
-            from sqlalchemy import select
-            if getattr(order, "user_id", None) is not None:
-                user_res = await session.execute(select(User).where(User.id == order.user_id))
-                user = user_res.scalars().first()
+        order = await get_order_view_by_code(session, code)
     if not order:
         await query.edit_message_text(
             "سفارش موردنظر پیدا نشد.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML
         )
         return 1
-    full_name = getattr(user, "full_name", "—") if user else "—"
-    username = getattr(user, "username", None) if user else None
-    phone = getattr(user, "phone_number", "—") if user else "—"
-    created = _format_jalali(getattr(order, "created_at", None))
-    done = _format_jalali(getattr(order, "done_at", None))
-    text = (
-        f"<b>مشخصات کاربر</b>\n"
-        f"نام کامل: {full_name}\n"
-        f"نام‌کاربری: {username or '—'}\n"
-        f"موبایل: {phone}\n\n"
-        f"<b>جزئیات سفارش</b>\n"
-        f"کد پیگیری: {order.tracking_code}\n"
-        f"وضعیت: {order.status}\n"
-        f"دسته: {order.category_key or '—'}\n"
-        f"آیتم: {order.option_title or '—'}\n"
-        f"تاریخ ثبت: {created}\n"
-        f"تاریخ انجام: {done}"
-    )
-    # Rebuild last list for back
-    filt = context.user_data.get("admin_orders_list_status")
-    fa_status = STATUS_MAP.get(filt, "")
-    kb = admin_order_actions_kb(username, code)
+    text = _order_details_text(order)
+    kb = admin_order_actions_kb(order.user_username, code)
     await query.edit_message_text(text, reply_markup=kb, parse_mode=ParseMode.HTML)
     return 1
 
@@ -335,30 +524,29 @@ async def admin_order_code_selected(update: Update, context: ContextTypes.DEFAUL
 async def admin_orders_change_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, filt, page_str = query.data.split(":", 3)
-    page = int(page_str)
+    filt, cursor = context.args
+    after_id, before_id = _parse_cursor(cursor)
     fa_status = STATUS_MAP.get(filt, "")
-    offset = page * PAGE_SIZE_ORDERS
     async with get_session() as session:
-        total = await count_orders_by_status(session, fa_status)
-        orders = await get_orders_paged_by_status(session, fa_status, offset, PAGE_SIZE_ORDERS)
+        orders, has_prev, has_next = await get_orders_keyset_by_statuses(
+            session, [fa_status], PAGE_SIZE_ORDERS, after_id=after_id, before_id=before_id
+        )
     codes: List[str] = [o.tracking_code for o in orders]
-    has_prev = page > 0
-    has_next = (offset + PAGE_SIZE_ORDERS) < total
+    prev_cursor, next_cursor = _nav_cursors(orders, has_prev, has_next)
     await query.edit_message_text(
         "سفارش خود را انتخاب کنید:",
-        reply_markup=admin_orders_list_kb(codes, filt, page, has_prev, has_next),
+        reply_markup=admin_orders_list_kb(codes, filt, prev_cursor, next_cursor),
         parse_mode=ParseMode.HTML,
     )
     context.user_data["admin_orders_list_status"] = filt
-    context.user_data["admin_orders_page"] = page
+    context.user_data["admin_orders_page"] = cursor
     return 1
 
 
 async def open_status_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, code = query.data.split(":", 2)
+    (code,) = context.args
     await query.edit_message_text("انتخاب وضعیت جدید:", reply_markup=admin_status_menu_kb(code), parse_mode=ParseMode.HTML)
     return 1
 
@@ -375,19 +563,12 @@ STATUS_LABELS = {
 async def set_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, code, key = query.data.split(":", 3)
+    code, key = context.args
     label = STATUS_LABELS.get(key, key)
     async with get_session() as session:
-        ok = await update_order_status_by_code(session, code, label)
-        # Fetch newest order and its user to display updated details
-        order = await find_order_by_code(session, code)
-        user = None
-        if order and getattr(order, "user_id", None) is not None:
-            from sqlalchemy import select
-            user_res = await session.execute(select(User).where(User.id == order.user_id))
-            user = user_res.scalars().first()
-
-    if not ok or not order:
+        order = await update_order_status_by_code(session, code, label)
+
+    if not order:
         await query.edit_message_text("به‌روزرسانی وضعیت ناموفق بود.", reply_markup=admin_orders_menu_kb(), parse_mode=ParseMode.HTML)
         return 1
 
@@ -397,35 +578,154 @@ async def set_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     except Exception:
         pass
 
-    full_name = getattr(user, "full_name", "—") if user else "—"
-    username = getattr(user, "username", None) if user else None
-    phone = getattr(user, "phone_number", "—") if user else "—"
-    created = _format_jalali(getattr(order, "created_at", None))
-    done = _format_jalali(getattr(order, "done_at", None))
-    text = (
-        f"<b>مشخصات کاربر</b>\n"
-        f"نام کامل: {full_name}\n"
-        f"نام‌کاربری: {username or '—'}\n"
-        f"موبایل: {phone}\n\n"
-        f"<b>جزئیات سفارش</b>\n"
-        f"کد پیگیری: {order.tracking_code}\n"
-        f"وضعیت: {order.status}\n"
-        f"دسته: {order.category_key or '—'}\n"
-        f"آیتم: {order.option_title or '—'}\n"
-        f"تاریخ ثبت: {created}\n"
-        f"تاریخ انجام: {done}"
+    kb = admin_order_actions_kb(order.user_username, code)
+    await query.edit_message_text(_order_details_text(order), reply_markup=kb, parse_mode=ParseMode.HTML)
+    # Notify requester about status change
+    await _notify_status_changes(context, [order])
+    return 1
+
+
+# ---- Order export ----
+
+async def _start_export(update: Update, context: ContextTypes.DEFAULT_TYPE, fmt: str, group_key: str, item_id: int) -> str | None:
+    """Queue an export in the background; returns an error message or None."""
+    statuses = ADMIN_GROUPS[group_key]["statuses"] if group_key in ADMIN_GROUPS else None
+    item_title = None
+    if item_id:
+        async with get_session() as session:
+            from db.models import Item
+            item = await session.get(Item, item_id)
+        if item is None:
+            return "آیتم پیدا نشد."
+        item_title = item.title
+    title = f"orders-{group_key.lower()}" + (f"-{item_id}" if item_id else "")
+    job = send_order_export(context.bot, update.effective_chat.id, fmt, statuses, item_title, title)
+    # Run detached from this update's DB session and metrics (fresh context)
+    contextvars.Context().run(context.application.create_task, job, update=update)
+    return None
+
+
+async def admin_orders_export(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    # ORDERS_ADMIN:EXPORT:<group>:<item_id|0>:<CSV|XLSX>
+    group_key, item_id, fmt = context.args
+    if fmt not in FORMATS or not await _is_admin(update, context):
+        await query.answer()
+        return 1
+    error = await _start_export(update, context, fmt, group_key, item_id)
+    await query.answer(text=error or "فایل خروجی در حال آماده‌سازی است و به‌زودی ارسال می‌شود.")
+    return 1
+
+
+async def _is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    user = update.effective_user
+    if not user:
+        return False
+    async with get_session() as session:
+        db_user = await get_cached_user(session, user.id, username=user.username, full_name=user.full_name)
+    return db_user.role_id == 1 or user.id in get_settings(context).admin_telegram_ids
+
+
+EXPORT_USAGE = (
+    "استفاده: /export [csv|xlsx] [NEW|INREVIEW|DONE|ALL] [شناسه آیتم]\n"
+    "مثال: /export xlsx DONE 3"
+)
+
+
+async def export_orders_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/export [csv|xlsx] [group] [item_id] for admins."""
+    if not update.message or not await _is_admin(update, context):
+        return
+    args = [a.upper() for a in (context.args or [])]
+    fmt = args[0] if args else "CSV"
+    group_key = args[1] if len(args) > 1 else "ALL"
+    item_arg = args[2] if len(args) > 2 else "0"
+    if fmt not in FORMATS or (group_key != "ALL" and group_key not in ADMIN_GROUPS) or not item_arg.isdigit():
+        await update.message.reply_text(EXPORT_USAGE)
+        return
+    error = await _start_export(update, context, fmt, group_key, int(item_arg))
+    await update.message.reply_text(error or "فایل خروجی در حال آماده‌سازی است و به‌زودی ارسال می‌شود.")
+
+
+# ---- Full-text search ----
+
+PAGE_SIZE_FIND = 10
+FIND_USAGE = "استفاده: /find <عبارت>\nنام، نام‌کاربری، موبایل، کد پیگیری یا متن درخواست (هر واژه حداقل ۳ حرف)."
+
+
+def _user_label(user: User) -> str:
+    if user.full_name and user.full_name.strip():
+        label = user.full_name.strip()
+    elif user.username and str(user.username).strip():
+        label = f"@{user.username.strip()}"
+    else:
+        label = "کاربر ناشناس"
+    return f"{label} · {user.phone_number}" if user.phone_number else label
+
+
+async def _find_page(
+    query_text: str, after: tuple[float, int] | None = None, before: tuple[float, int] | None = None
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Message text and keyboard for one keyset page of /find results."""
+    async with get_session() as session:
+        page = await search(session, query_text, PAGE_SIZE_FIND, after=after, before=before)
+        if page is None:
+            return "جستجو در این پایگاه داده در دسترس نیست.", None
+        hits, has_prev, has_next = page
+        ids = {KIND_USER: [], KIND_ORDER: [], KIND_REQUEST: []}
+        for hit in hits:
+            ids[hit.kind].append(hit.id)
+        users = {u.id: u for u in await get_users_by_ids(session, ids[KIND_USER])}
+        orders = {o.id: o for o in await get_orders_by_ids(session, ids[KIND_ORDER])}
+        requests = {r.id: r for r in await get_custom_requests_by_ids(session, ids[KIND_REQUEST])}
+    results: List[tuple[str, str]] = []
+    for hit in hits:
+        kind, entity_id = hit.kind, hit.id
+        if kind == KIND_USER and entity_id in users:
+            results.append((f"👤 {_user_label(users[entity_id])}", f"ADMIN_USERS:USER:{entity_id}:0"))
+        elif kind == KIND_ORDER and entity_id in orders:
+            o = orders[entity_id]
+            results.append((f"📦 {o.tracking_code} · {o.option_title or '-'}", f"ORDERS_ADMIN:CODE:{o.tracking_code}"))
+        elif kind == KIND_REQUEST and entity_id in requests:
+            r = requests[entity_id]
+            snippet = " ".join((r.content_text or "").split())[:30] or "درخواست"
+            results.append((f"📝 {snippet}", f"ADMIN_USERS:USER:{r.user_id}:0"))
+    if not results:
+        return ("نتیجه‌ای یافت نشد." if after is None and before is None else "نتیجه دیگری وجود ندارد."), None
+    # Cursor: a/b + rowid of the last/first hit, then its rank
+    prev_cursor = f"b{hits[0].rowid}:{hits[0].rank!r}" if has_prev else None
+    next_cursor = f"a{hits[-1].rowid}:{hits[-1].rank!r}" if has_next else None
+    text = f"<b>نتایج جستجو برای:</b> {html.escape(query_text)}"
+    return text, admin_search_results_kb(results, prev_cursor, next_cursor)
+
+
+async def find_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/find <query> for admins: ranked users, orders and requests."""
+    if not update.message or not await _is_admin(update, context):
+        return
+    query_text = " ".join(context.args or [])
+    if match_expression(query_text) is None:
+        await update.message.reply_text(FIND_USAGE)
+        return
+    context.user_data["find_query"] = query_text
+    text, kb = await _find_page(query_text)
+    await update.message.reply_text(text, reply_markup=kb, parse_mode=ParseMode.HTML)
+
+
+async def find_change_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    # FIND:PAGE:<a|b><rowid>:<rank>
+    cursor, rank = context.args
+    after_id, before_id = _parse_cursor(cursor)
+    query_text = context.user_data.get("find_query")
+    if not query_text:
+        await query.edit_message_text(FIND_USAGE)
+        return 1
+    text, kb = await _find_page(
+        query_text,
+        after=(rank, after_id) if after_id is not None else None,
+        before=(rank, before_id) if before_id is not None else None,
     )
-    kb = admin_order_actions_kb(username, code)
     await query.edit_message_text(text, reply_markup=kb, parse_mode=ParseMode.HTML)
-    # Notify requester about status change
-    try:
-        if user and getattr(user, "telegram_id", None):
-            msg = (
-                f"کاربر گرامی {user.full_name or (('@'+user.username) if user.username else '')}\n\n"
-                f"درخواست شما برای «{order.option_title or '—'}» تغییر وضعیت داده شد.\n"
-                f"آخرین وضعیت: {order.status}"
-            )
-            await context.bot.send_message(chat_id=user.telegram_id, text=msg)
-    except Exception:
-        pass
     return 1
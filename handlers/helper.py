@@ -4,9 +4,7 @@ Helper (همیار ریشه) section handlers.
 
 from __future__ import annotations
 
-import random
 from typing import Dict, List
-import os
 from datetime import datetime
 
 from telegram import Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
@@ -21,24 +19,18 @@ from keyboards import (
     helper_options_kb,
     helper_confirm_kb,
     after_confirm_kb,
+    force_join_kb,
     helper2_main_kb,
     helper2_category_kb,
     helper2_item_actions_kb,
-    helper2_health_assess_kb,
-    helper2_alzheimer_screen_kb,
-    helper2_hosting_experience_kb,
-    helper2_surprise_kb,
-    helper2_gift_flowers_sweets_kb,
-    helper2_home_redesign_kb,
-    helper2_special_checkups_kb,
-    helper2_daily_shopping_kb,
-    helper2_digital_help_kb,
-    helper2_want_request_kb,
     helper2_force_join_kb,
-    helper2_emergency_info_kb,
 )
-from db.database import get_session
-from db.crud import get_categories, get_items_by_category, get_category_by_id, get_or_create_user_by_telegram, update_user_phone, get_admin_telegram_ids, create_custom_request
+from db.cache import TTLCache
+from db.tracking import allocate_tracking_code
+from catalog import get_catalog
+from notifier import notify
+from settings import Settings, get_settings, subscribe
+from db.crud import get_categories, get_items_by_category, get_category_by_id, get_or_create_user_by_telegram, get_cached_user, update_user_phone, get_admin_telegram_ids, create_custom_request
 
 
 # Category descriptions and numeric options
@@ -89,39 +81,17 @@ async def open_helper_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     return 1
 
 
-def _helper2_titles():
-    cat_titles = {
-        "PREVENTIVE": "⚜️ سلامت پیشگیرانه ⚜️",
-        "MEMORIES": "⚜️ تجربه لحظه‌های به‌یاد ماندنی از راه‌دور ⚜️",
-        "DAILY": "⚜️ انجام نیازهای روزمره ⚜️",
-        "WANT": "⚜️ میخوام ..... ⚜️",
-    }
-    item_titles = {
-        "EMERGENCY_CALL": "🚨 تماس اضطراری",
-        "HEALTH_ASSESS": "سنجش سلامت 📋",
-        "ALZHEIMER_SCREEN": "🧠 غربالگری آلزایمر",
-        "SPECIAL_CHECKUPS": "چکاپ‌های تخصصی 🏥",
-        "HOME_REDESIGN": "🏠 بازطراحی محیط زندگی سالمندان",
-        "HOSTING_EXPERIENCE": "سور (مهمان‌کردن و ساخت تجربه) 🍽️",
-        "SURPRISE": "🎶 سورپرایز (اجرای غافلگیرکننده)",
-        "GIFT_FLOWERS_SWEETS": "خرید هدیه، گل و شیرینی 🌸",
-        "DAILY_SHOPPING": "خرید روزمره 🧺",
-        "DIGITAL_HELP": "💻 حل مشکلات دیجیتالی",
-        "WANT_HEALTH_TRACK": "می‌خوام پیگیر وضعیت سلامت خانواده و عزیزان باشم!",
-        "WANT_SURPRISE": "می‌خوام خانواده یا یکی از عزیزانم رو سوپرایز یا خوشحال کنم!",
-        "WANT_SEND_GIFT": "میخوام برای خانوده یا یکی از عزیزانم هدیه، گل یا شیرینی ارسال کنم!",
-        "WANT_REMOTE_HELP": "نیاز به همیاری دارن و من از راه دور نمی‌تونم انجامش بدم!",
-        "WANT_NOT_FOUND": "اونی که می‌خوام اینحا نیست!",
-    }
-    return cat_titles, item_titles
+def _helper2_item_title(cat_key: str, item_key: str) -> str:
+    item = get_catalog().items.get((cat_key, item_key))
+    return item.order_title if item else item_key
 
 
 async def helper2_open_category(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, cat_key = query.data.split(":", 2)
-    cat_titles, _ = _helper2_titles()
-    header = cat_titles.get(cat_key, "—")
+    (cat_key,) = context.args
+    category = get_catalog().categories.get(cat_key)
+    header = category.header if category else "—"
     await query.edit_message_text(header, reply_markup=helper2_category_kb(cat_key), parse_mode=ParseMode.HTML)
     return 1
 
@@ -129,140 +99,13 @@ async def helper2_open_category(update: Update, context: ContextTypes.DEFAULT_TY
 async def helper2_item_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, cat_key, item_key = query.data.split(":", 3)
-    cat_titles, item_titles = _helper2_titles()
-    cat_title = cat_titles.get(cat_key, "—")
-    item_title = item_titles.get(item_key, "—")
-    if cat_key == "WANT" and item_key == "WANT_NOT_FOUND":
-        text = (
-            "❓ اونی که می‌خوام اینجا نیست!\n\n"
-            "اگه چیزی که مدنظرته داخل گزینه‌ها پیدا نکردی، اینجا بهمون بگو دقیقاً چی نیاز داری ✍️\n"
-            "درخواستت ثبت می‌شه و تیم ریشه بررسیش می‌کنه 🔎 تا ببینیم امکان انجامش وجود داره یا نه.\n"
-            "اگه قابل اجرا باشه، کارشناسانمون باهات تماس می‌گیرن 📞، جزئیات رو هماهنگ می‌کنن و مسیر انجامش رو برات شفاف توضیح می‌دن.\n"
-            "هدف ما اینه که همراهی محدود به چند خدمت ثابت نباشه 🤍\n"
-            "هر جا نیاز واقعی وجود داشته باشه، بررسیش می‌کنیم.\n\n"
-            "درخواستت رو برامون بنویس 📝\n"
-            "کافیه دکمه زیر رو بزنی و بعدش متن، ویس 🎙️ یا ویدیوی مدنظرت رو برامون ارسال کنی 🎥"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_want_request_kb("WANT"), parse_mode=ParseMode.HTML)
-        return 1
-    if cat_key == "PREVENTIVE" and item_key == "EMERGENCY_CALL":
-        text = (
-            "🚨 تماس اضطراری\n"
-            "وقت‌هایی که مسیرهای ارتباطی با ایران دچار اختلال می‌شه 📵 و هیچ راهی برای باخبر شدن از خانواده نداری،\n"
-            "در چنین شرایطی، ریشه تلاش می‌کنه پلی باشه بین تو و عزیزانت 🤍\n"
-            "تا در حد توان، حال خانواده‌ت رو پیگیری کنه و نگذاره بی‌خبر بمونی.\n"
-            "این خدمت کاملاً دلی و رایگانه 🌿\n"
-            "در دوره‌هایی که ارتباطات محدود شد، ریشه با کمک هموطن‌های با‌معرفت در مناطق مرزی 🇮🇷 و با استفاده از رومینگ‌های در دسترس 📡، تلاش کرد صدای خانواده‌ها رو به هم برسونه.\n"
-            "در حال حاضر با پایدار بودن شرایط ارتباطی ✅، این سرویس غیرفعاله؛\n"
-            "اما اگر اختلالی ایجاد بشه، سریع دوباره فعالش می‌کنیم 🔄 تا نذاریم بی‌خبر بمونی.\n"
-            "🤍 همراهی، فقط برای روزهای راحت نیست."
-        )
-        await query.edit_message_text(text, reply_markup=helper2_emergency_info_kb(cat_key), parse_mode=ParseMode.HTML)
-        return 1
-    if cat_key == "PREVENTIVE" and item_key == "HEALTH_ASSESS":
-        text = (
-            "🩺 سنجش سلامت\n\n"
-            "یه ارزیابی جامع و پیشگیرانه برای اینکه تصویر دقیقی از وضعیت سلامت پدر یا مادرت داشته باشی — بدون مراجعه حضوری.\n"
-            "فقط با یک گفتگوی ۲۰ تا ۳۰ دقیقه‌ای با پزشک متخصص 👨🏻‍⚕️، شش حوزه کلیدی سلامت بررسی می‌شه و در پایان، "
-            "یک نقشه روشن از وضعیت سلامت در سه سطح (مطلوب، قابل اصلاح، پرریسک) دریافت می‌کنی.\n"
-            "اقدامی ساده برای آگاهی قبل از بحران ⚠️\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_health_assess_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "PREVENTIVE" and item_key == "ALZHEIMER_SCREEN":
-        text = (
-            "🧠 غربالگری آلزایمر\n\n"
-            "این خدمت برای بررسی اولیه حافظه و عملکرد شناختی طراحی شده.\n"
-            "ریشه هماهنگ می‌کنه تا ارزیابی‌های استاندارد توسط متخصص انجام بشه 👩🏻‍⚕️ و نتیجه به‌صورت گزارش شفاف ارائه بشه.\n"
-            "اگه نیاز به بررسی تخصصی‌تر باشه، مسیر ارجاع هم مشخص می‌شه 📋\n"
-            "این کار کمک می‌کنه آلزایمر زودتر دیده بشه و مدیریت‌ش راحت‌تر باشه.\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_alzheimer_screen_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "MEMORIES" and item_key == "HOSTING_EXPERIENCE":
-        text = (
-            "🍽️ سور (مهمان‌کردن و ساخت تجربه)\n\n"
-            "اگه می‌خوای عزیزت رو مهمون کنی و یه تجربه خوب براش بسازی، این گزینه برای توئه 🎉\n"
-            "ریشه هماهنگی رزرو، طراحی تجربه مناسبتی، اجرای برنامه و گزارش نهایی رو مدیریت می‌کنه.\n"
-            "تو جزئیات رو می‌گی ✍️، ما پیگیری می‌کنیم تا اتفاق درست و دقیق اجرا بشه ✨\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_hosting_experience_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "MEMORIES" and item_key == "SURPRISE":
-        text = (
-            "🎉 سورپرایز (اجرای غافلگیرکننده)\n\n"
-            "برای وقتی که می‌خوای یه لحظه غافلگیرکننده بسازی؛ مثل نوازنده 🎶، برنامه کوتاه هنری، تولد 🎂 یا یه اجرای ویژه در خانه یا لوکیشن مشخص.\n"
-            "ریشه هماهنگی‌ها رو انجام می‌ده، اجرای برنامه رو مدیریت می‌کنه و مستندات/گزارش انجام رو برات می‌فرسته 📸📄\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_surprise_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "MEMORIES" and item_key == "GIFT_FLOWERS_SWEETS":
-        text = (
-            "🎁 خرید هدیه، گل و شیرینی\n\n"
-            "اگه می‌خوای هدیه، گل 🌸 یا شیرینی 🍰 برای عزیزت در ایران ارسال کنی، اینجا ثبت کن.\n"
-            "ریشه از تأمین‌کننده‌های معتبر در شهر مقصد خرید رو هماهنگ می‌کنه و روند انتخاب، پرداخت، تحویل و تأیید انجام رو مدیریت می‌کنه.\n"
-            "تمرکز این خدمته: کیفیت قابل اتکا ✔️، قیمت شفاف 💳، و اطمینان از تحویل 📦\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_gift_flowers_sweets_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "PREVENTIVE" and item_key == "HOME_REDESIGN":
-        text = (
-            "🏠 بازطراحی محیط زندگی سالمند\n\n"
-            "این خدمت برای کم کردن ریسک حادثه در خانه ⚠️ و راحت‌تر شدن زندگی سالمند طراحی شده.\n"
-            "ریشه ارزیابی محیط رو هماهنگ می‌کنه، نقاط پرخطر مشخص می‌شه 🔎 و پیشنهادهای اصلاحی داده می‌شه.\n"
-            "اگه تأیید کنی، اجرای اصلاحات هم هماهنگ می‌شه؛ مثل اصلاح سرویس بهداشتی 🚿، نصب تجهیزات کمکی، بهتر کردن نور 💡 یا اصلاح چیدمان.\n"
-            "در پایان هم گزارش ارزیابی و نتیجه اقدامات برای تو ارسال می‌شه 📄\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_home_redesign_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "PREVENTIVE" and item_key == "SPECIAL_CHECKUPS":
-        text = (
-            "🩺 چکاپ‌های تخصصی\n\n"
-            "آگاهی قبل از بحران. ⚠️\n"
-            "این خدمت برای انجام چکاپ‌های تخصصی دوره‌ای طراحی شده؛\n"
-            "همون بررسی‌هایی که هر فرد در طول زندگی باید انجام بده تا از وضعیت دقیق سلامت خودش باخبر باشه.\n"
-            "از چکاپ‌های مرتبط با سن سالمندی 👵👴 گرفته تا بررسی‌هایی که بهتره در سنین پایین‌تر انجام بشه تا ریسک‌ها زودتر شناسایی بشن.\n"
-            "تو درخواست رو ثبت می‌کنی ✍️، ریشه هماهنگی با مراکز معتبر رو انجام می‌ده\n"
-            "و بعد از انجام چکاپ، گزارش شفاف برای خود فرد و در صورت درخواست برای تو ارسال می‌شه 📄\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_special_checkups_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "DAILY" and item_key == "DAILY_SHOPPING":
-        text = (
-            "🛒 خریدهای روزمره (انجام امور روزانه)\n\n"
-            "اگه والدین یا عزیزت برای انجام خریدهای روزمره به کمک نیاز دارن،\n"
-            "اینجا می‌تونی درخواست ثبت کنی.\n"
-            "ریشه هماهنگ می‌کنه تا فرد معتمد خریدهای موردنیاز رو انجام بده؛\n"
-            "از خریدهای سوپرمارکتی 🏪 و دارویی 💊 گرفته\n"
-            "تا اقلام ضروری روزمره‌ای که انجامش برای سالمند سخت شده.\n"
-            "فرآیند خرید، تحویل 📦 و تأیید انجام مدیریت می‌شه و گزارش برات ارسال می‌شه 📄\n"
-            "این خدمت برای وقت‌هایی طراحی شده که حضور تو لازمه، اما امکانش رو نداری 🤍\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_daily_shopping_kb(cat_key), parse_mode=ParseMode.HTML)
-    elif cat_key == "DAILY" and item_key == "DIGITAL_HELP":
-        text = (
-            "💻 همراهی در خدمات دیجیتال\n\n"
-            "برای خیلی از سالمندان، انجام کارهای دیجیتال ساده نیست.\n"
-            "از خرید اشتراک پلتفرم‌های نمایش خانگی 🎬\n"
-            "گرفته تا خرید اینترنت 🌐، نصب و راه‌اندازی تجهیزات، تنظیم تلویزیون 📺 یا حتی نصب نرم‌افزارهای موردنیاز.\n"
-            "اگه عزیزت در انجام این کارها نیاز به همراهی داره،\n"
-            "ریشه هماهنگ می‌کنه تا فردی متخصص کمکش کنه 👨🏻‍🔧\n"
-            "تو درخواست رو ثبت می‌کنی ✍️،\n"
-            "ما هماهنگی و اجرا رو مدیریت می‌کنیم\n"
-            "و نتیجه انجام کار رو برات گزارش می‌دیم 📄\n"
-            "هدف؛ کم‌کردن وابستگی و ساده‌تر کردن زندگی روزمره 🤍\n"
-            "برای اطلاع از نحوه سفارش و اینکه سنجش سلامت چطور انجام میشه، حتما ویدیو/ فایل بالا رو نگاه کن 🎥📎"
-        )
-        await query.edit_message_text(text, reply_markup=helper2_digital_help_kb(cat_key), parse_mode=ParseMode.HTML)
-    else:
-        text = (
-            f"{cat_title}\n\n"
-            f"خدمت انتخابی: {item_title}\n\n"
-            "برای ثبت سفارش و پیگیری توسط تیم ریشه، دکمه زیر را بزن."
-        )
+    cat_key, item_key = context.args
+    item = get_catalog().items.get((cat_key, item_key))
+    if item is None:
+        text = "—\n\nخدمت انتخابی: —\n\nبرای ثبت سفارش و پیگیری توسط تیم ریشه، دکمه زیر را بزن."
         await query.edit_message_text(text, reply_markup=helper2_item_actions_kb(cat_key, item_key), parse_mode=ParseMode.HTML)
+        return 1
+    await query.edit_message_text(item.text, reply_markup=item.markup, parse_mode=ParseMode.HTML)
     return 1
 
 
@@ -287,15 +130,15 @@ async def handle_custom_request(update: Update, context: ContextTypes.DEFAULT_TY
         return 1
     user = update.effective_user
     full_name = user.full_name if hasattr(user, "full_name") else (f"{user.first_name} {getattr(user, 'last_name', '')}".strip() if user else None)
+    # Allocate before this update writes anything (a block refill needs the write lock)
+    tracking_code = await _generate_tracking_code()
     async with get_session() as session:
-        user_row = await get_or_create_user_by_telegram(
+        user_row = await get_cached_user(
             session,
             int(user.id),
             username=user.username if user else None,
             full_name=full_name,
-            update_if_exists=False,
         )
-        tracking_code = _generate_tracking_code()
         await create_order(
             session,
             int(user_row.id),
@@ -322,21 +165,17 @@ async def handle_custom_request(update: Update, context: ContextTypes.DEFAULT_TY
     )
     await update.message.reply_text(confirm_text, reply_markup=after_confirm_kb(), parse_mode=ParseMode.HTML)
     display_name = (user_row.full_name.strip() if user_row.full_name and user_row.full_name.strip() else (f"@{user_row.username.strip()}" if user_row.username and str(user_row.username).strip() else "کاربر ناشناس"))
-    await _notify_admins_new_order(context, user_row.telegram_id, display_name, tracking_code, "WANT", "درخواست سفارشی", user_row.username)
-    try:
-        async with get_session() as session:
-            admin_ids = await get_admin_telegram_ids(session)
-    except Exception:
-        admin_ids = []
+    admin_ids = await _notify_admins_new_order(context, user_row.telegram_id, display_name, tracking_code, "WANT", "درخواست سفارشی", user_row.username)
+    from_chat_id = update.effective_chat.id
+    message_id = update.message.message_id
+    detail_text = f"جزئیات درخواست ({tracking_code}):\n{update.message.text if update.message.text else 'محتوای غیرمتنی دریافت شد.'}"
     for aid in admin_ids:
-        try:
-            await context.bot.copy_message(chat_id=aid, from_chat_id=update.effective_chat.id, message_id=update.message.message_id)
-        except Exception:
-            try:
-                text = update.message.text if update.message.text else "محتوای غیرمتنی دریافت شد."
-                await context.bot.send_message(chat_id=aid, text=f"جزئیات درخواست ({tracking_code}):\n{text}")
-            except Exception:
-                pass
+        await notify(
+            context,
+            aid,
+            lambda bot, aid=aid: bot.copy_message(chat_id=aid, from_chat_id=from_chat_id, message_id=message_id),
+            fallback=lambda bot, aid=aid: bot.send_message(chat_id=aid, text=detail_text),
+        )
     context.user_data.pop("await_custom_request", None)
     return 1
 
@@ -344,16 +183,15 @@ async def handle_custom_request(update: Update, context: ContextTypes.DEFAULT_TY
 async def helper2_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, cat_key, item_key = query.data.split(":", 3)
-    _, item_titles = _helper2_titles()
+    cat_key, item_key = context.args
     cat_title = cat_key
-    item_title = item_titles.get(item_key, item_key)
+    item_title = _helper2_item_title(cat_key, item_key)
     user = update.effective_user
     full_name = user.full_name if hasattr(user, "full_name") else (f"{user.first_name} {getattr(user, 'last_name', '')}".strip() if user else None)
-    channel_id, join_url = _mandatory_channel()
+    channel_id, join_url = _mandatory_channel(context)
     if channel_id and join_url:
         joined = await _is_user_joined(context.bot, channel_id, user.id)
-        dbg = os.getenv("DEBUG_JOIN_CHECK", "").lower() in ("1", "true", "yes", "on")
+        dbg = get_settings(context).debug_join_check
         if dbg:
             try:
                 norm = _normalize_channel_id(channel_id)
@@ -364,15 +202,15 @@ async def helper2_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             text = "برای ثبت سفارش، عضویت در کانال الزامی است."
             await query.edit_message_text(text, reply_markup=helper2_force_join_kb(cat_key, item_key, str(join_url)), parse_mode=ParseMode.HTML)
             return 1
+    # Allocate before this update writes anything (a block refill needs the write lock)
+    tracking_code = await _generate_tracking_code()
     async with get_session() as session:
-        user_row = await get_or_create_user_by_telegram(
+        user_row = await get_cached_user(
             session,
             int(user.id),
             username=user.username if user else None,
             full_name=full_name,
-            update_if_exists=False,
         )
-        tracking_code = _generate_tracking_code()
         await create_order(
             session,
             int(user_row.id),
@@ -400,12 +238,12 @@ async def helper2_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def helper2_check_channel_and_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, cat_key, item_key = query.data.split(":", 3)
-    channel_id, join_url = _mandatory_channel()
+    cat_key, item_key = context.args
+    channel_id, join_url = _mandatory_channel(context)
     user = update.effective_user
     if channel_id and join_url:
-        joined = await _is_user_joined(context.bot, channel_id, user.id)
-        dbg = os.getenv("DEBUG_JOIN_CHECK", "").lower() in ("1", "true", "yes", "on")
+        joined = await _is_user_joined(context.bot, channel_id, user.id, force=True)
+        dbg = get_settings(context).debug_join_check
         if dbg:
             try:
                 norm = _normalize_channel_id(channel_id)
@@ -417,19 +255,18 @@ async def helper2_check_channel_and_confirm(update: Update, context: ContextType
             await query.edit_message_text(text, reply_markup=helper2_force_join_kb(cat_key, item_key, str(join_url)), parse_mode=ParseMode.HTML)
             return 1
     # If reached here, proceed to confirm like helper2_confirm
-    _, item_titles = _helper2_titles()
-    item_title = item_titles.get(item_key, item_key)
+    item_title = _helper2_item_title(cat_key, item_key)
     cat_title = cat_key
     full_name = user.full_name if hasattr(user, "full_name") else (f"{user.first_name} {getattr(user, 'last_name', '')}".strip() if user else None)
+    # Allocate before this update writes anything (a block refill needs the write lock)
+    tracking_code = await _generate_tracking_code()
     async with get_session() as session:
-        user_row = await get_or_create_user_by_telegram(
+        user_row = await get_cached_user(
             session,
             int(user.id),
             username=user.username if user else None,
             full_name=full_name,
-            update_if_exists=False,
         )
-        tracking_code = _generate_tracking_code()
         await create_order(
             session,
             int(user_row.id),
@@ -472,8 +309,7 @@ async def helper_category_selected(update: Update, context: ContextTypes.DEFAULT
     """Show options for selected category."""
     query = update.callback_query
     await query.answer()
-    _, _, category_id_str = query.data.split(":", 2)
-    category_id = int(category_id_str)
+    (category_id,) = context.args
     context.user_data["helper_category_id"] = category_id
     async with get_session() as session:
         items = await get_items_by_category(session, category_id)
@@ -489,9 +325,7 @@ async def helper_option_selected(update: Update, context: ContextTypes.DEFAULT_T
     """Prepare confirmation for a selected option."""
     query = update.callback_query
     await query.answer()
-    _, _, category_id_str, idx_str = query.data.split(":", 3)
-    category_id = int(category_id_str)
-    idx = int(idx_str)
+    category_id, idx = context.args
     context.user_data["helper_option_idx"] = idx
     context.user_data["helper_category_id"] = category_id
     async with get_session() as session:
@@ -510,8 +344,8 @@ async def helper_option_selected(update: Update, context: ContextTypes.DEFAULT_T
     return 1
 
 
-def _generate_tracking_code() -> str:
-    return f"{random.randint(100000, 999999)}"
+async def _generate_tracking_code() -> str:
+    return await allocate_tracking_code()
 
 
 def _now_jalali_str() -> str:
@@ -522,18 +356,9 @@ def _now_jalali_str() -> str:
         return datetime.now().strftime("%Y/%m/%d %H:%M")
 
 
-def _mandatory_channel() -> tuple[str | None, str | None]:
-    join_url = os.getenv("MANDATORY_CHANNEL_URL")
-    uname = os.getenv("MANDATORY_CHANNEL_USERNAME")
-    chan_id = os.getenv("MANDATORY_CHANNEL_ID")
-    # اگر نام کاربری کانال تنظیم شده باشد، نسبت به ID اولویت دارد (برای کانال عمومی)
-    if uname:
-        if not uname.startswith("@"):
-            uname = f"@{uname}"
-        chan_id = uname
-        if not join_url:
-            join_url = f"https://t.me/{uname.lstrip('@')}"
-    return chan_id, join_url
+def _mandatory_channel(context: ContextTypes.DEFAULT_TYPE) -> tuple[str | None, str | None]:
+    settings = get_settings(context)
+    return settings.mandatory_channel_id, settings.mandatory_channel_url
 
 
 def _normalize_channel_id(cid: str | int) -> str | int:
@@ -548,19 +373,48 @@ def _normalize_channel_id(cid: str | int) -> str | int:
     return s if s.startswith("@") else s
 
 
-async def _is_user_joined(bot, channel_id: str | int, user_id: int) -> bool:
+# Resolved @username -> numeric chat id, kept for the process lifetime
+_channel_id_cache: Dict[str, int] = {}
+# (channel_ref, user_id) -> joined; positives live longer than negatives
+_membership_cache: TTLCache[tuple[str | int, int], bool] = TTLCache(
+    maxsize=Settings.join_cache_size, ttl=Settings.join_cache_ttl
+)
+
+
+@subscribe
+def _configure_membership_cache(settings: Settings) -> None:
+    _membership_cache.configure(settings.join_cache_size, settings.join_cache_ttl)
+
+
+async def _resolve_channel_ref(bot, channel_id: str | int) -> str | int:
+    chat_ref = _normalize_channel_id(channel_id)
+    # Resolve @username to numeric ID for more reliable checks
+    if isinstance(chat_ref, str) and chat_ref.startswith("@"):
+        cached = _channel_id_cache.get(chat_ref)
+        if cached is not None:
+            return cached
+        try:
+            chat = await bot.get_chat(chat_ref)
+            _channel_id_cache[chat_ref] = chat.id
+            return chat.id
+        except Exception:
+            pass
+    return chat_ref
+
+
+async def _is_user_joined(bot, channel_id: str | int, user_id: int, force: bool = False) -> bool:
+    """Check channel membership, served from a short-lived cache unless `force` is set."""
     try:
-        chat_ref = _normalize_channel_id(channel_id)
-        # Resolve @username to numeric ID for more reliable checks
-        if isinstance(chat_ref, str) and chat_ref.startswith("@"):
-            try:
-                chat = await bot.get_chat(chat_ref)
-                chat_ref = chat.id
-            except Exception:
-                pass
+        chat_ref = await _resolve_channel_ref(bot, channel_id)
+        key = (chat_ref, int(user_id))
+        if not force:
+            cached = _membership_cache.get(key)
+            if cached is not None:
+                return cached
         member = await bot.get_chat_member(chat_id=chat_ref, user_id=user_id)
         status = str(getattr(member, "status", "")).lower()
         joined = status in {"member", "administrator", "creator", "restricted"}
+        _membership_cache.set(key, joined, ttl=None if joined else get_settings().join_cache_negative_ttl)
         if not joined:
             try:
                 logging.getLogger(__name__).info(
@@ -579,15 +433,15 @@ async def _is_user_joined(bot, channel_id: str | int, user_id: int) -> bool:
         return False
 
 
-async def _notify_admins_new_order(context: ContextTypes.DEFAULT_TYPE, user_tel_id: int, user_display: str, tracking_code: str, category_title: str | None, item_title: str | None, username: str | None) -> None:
-    # Fetch admins (role_id=1) from DB dynamically
+async def _notify_admins_new_order(context: ContextTypes.DEFAULT_TYPE, user_tel_id: int, user_display: str, tracking_code: str, category_title: str | None, item_title: str | None, username: str | None) -> List[int]:
+    # Fetch admins (role_id=1) from DB dynamically; returned so callers can reuse them
     try:
         async with get_session() as session:
             admin_ids = await get_admin_telegram_ids(session)
     except Exception:
         admin_ids = []
     if not admin_ids:
-        return
+        return admin_ids
     when_str = _now_jalali_str()
     item_text = item_title or "—"
     cat_text = category_title or "—"
@@ -605,25 +459,26 @@ async def _notify_admins_new_order(context: ContextTypes.DEFAULT_TYPE, user_tel_
         [InlineKeyboardButton("ارتباط با کاربر", url=contact_url)],
     ])
     for aid in admin_ids:
-        try:
-            await context.bot.send_message(chat_id=aid, text=text, reply_markup=kb)
-        except Exception:
-            continue
+        await notify(context, aid, lambda bot, aid=aid: bot.send_message(chat_id=aid, text=text, reply_markup=kb))
+    return admin_ids
 
 
 async def helper_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Create order after mandatory channel check and optionally ask for phone."""
     query = update.callback_query
     await query.answer()
-    parts = query.data.split(":")
-    category_id = int(parts[2]) if len(parts) > 2 else context.user_data.get("helper_category_id")
-    idx = int(parts[3]) if len(parts) > 3 else context.user_data.get("helper_option_idx")
+    # HELPER:CONFIRM:<category_id>:<idx>, or bare HELPER:CONFIRM for the last selection
+    if context.args:
+        category_id, idx = context.args
+    else:
+        category_id = context.user_data.get("helper_category_id")
+        idx = context.user_data.get("helper_option_idx")
     user = update.effective_user
 
-    channel_id, join_url = _mandatory_channel()
+    channel_id, join_url = _mandatory_channel(context)
     if channel_id and join_url and user:
         joined = await _is_user_joined(context.bot, channel_id, user.id)
-        dbg = os.getenv("DEBUG_JOIN_CHECK", "").lower() in ("1", "true", "yes", "on")
+        dbg = get_settings(context).debug_join_check
         if dbg:
             try:
                 norm = _normalize_channel_id(channel_id)
@@ -646,15 +501,15 @@ async def helper_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     user = update.effective_user
     full_name = user.full_name if hasattr(user, "full_name") else (f"{user.first_name} {getattr(user, 'last_name', '')}".strip() if user else None)
+    # Allocate before this update writes anything (a block refill needs the write lock)
+    tracking_code = await _generate_tracking_code()
     async with get_session() as session:
-        user_row = await get_or_create_user_by_telegram(
+        user_row = await get_cached_user(
             session,
             int(user.id),
             username=user.username if user else None,
             full_name=full_name,
-            update_if_exists=False,
         )
-        tracking_code = _generate_tracking_code()
         await create_order(
             session,
             int(user_row.id),
@@ -683,15 +538,13 @@ async def helper_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def helper_check_join(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    parts = query.data.split(":")
-    category_id = int(parts[2]) if len(parts) > 2 else context.user_data.get("helper_category_id")
-    idx = int(parts[3]) if len(parts) > 3 else context.user_data.get("helper_option_idx")
+    category_id, idx = context.args
     user = update.effective_user
 
-    channel_id, join_url = _mandatory_channel()
+    channel_id, join_url = _mandatory_channel(context)
     if channel_id and join_url and user:
-        joined = await _is_user_joined(context.bot, channel_id, user.id)
-        dbg = os.getenv("DEBUG_JOIN_CHECK", "").lower() in ("1", "true", "yes", "on")
+        joined = await _is_user_joined(context.bot, channel_id, user.id, force=True)
+        dbg = get_settings(context).debug_join_check
         if dbg:
             try:
                 norm = _normalize_channel_id(channel_id)
@@ -708,8 +561,6 @@ async def helper_check_join(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     context.user_data["helper_category_id"] = category_id
     context.user_data["helper_option_idx"] = idx
-    cb = f"HELPER:CONFIRM:{category_id}:{idx}"
-    update.callback_query.data = cb
     return await helper_confirm(update, context)
 
 
@@ -765,8 +616,7 @@ async def helper_back_to_options(update: Update, context: ContextTypes.DEFAULT_T
     """Back to options of the current category."""
     query = update.callback_query
     await query.answer()
-    parts = query.data.split(":")
-    category_id = int(parts[-1])
+    (category_id,) = context.args
     async with get_session() as session:
         items = await get_items_by_category(session, category_id)
     opts = [it.title for it in items]
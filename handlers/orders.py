@@ -15,7 +15,8 @@ from db.crud import (
     get_orders_by_status as db_get_orders_by_status,
     get_orders_by_statuses as db_get_orders_by_statuses,
     find_order as db_find_order,
-    get_or_create_user_by_telegram,
+    count_user_orders_by_status,
+    get_cached_user,
 )
 from keyboards import orders_menu_kb, orders_list_kb, orders_named_list_kb, orders_done_detail_kb
 from datetime import datetime
@@ -42,12 +43,11 @@ async def open_orders_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     done_count = 0
     try:
         async with get_session() as session:
-            user_row = await get_or_create_user_by_telegram(session, telegram_id, update_if_exists=False)
+            user_row = await get_cached_user(session, telegram_id)
             if user_row:
-                active_orders = await db_get_orders_by_statuses(session, user_row.id, STATUS_GROUPS["ACTIVE"]["statuses"])
-                done_orders = await db_get_orders_by_statuses(session, user_row.id, STATUS_GROUPS["DONE"]["statuses"])
-                active_count = len(active_orders)
-                done_count = len(done_orders)
+                counts = await count_user_orders_by_status(session, user_row.id)
+                active_count = sum(counts.get(s, 0) for s in STATUS_GROUPS["ACTIVE"]["statuses"])
+                done_count = sum(counts.get(s, 0) for s in STATUS_GROUPS["DONE"]["statuses"])
     except Exception:
         pass
 
@@ -80,12 +80,12 @@ async def orders_filter_selected(update: Update, context: ContextTypes.DEFAULT_T
     """List orders for the selected status filter."""
     query = update.callback_query
     await query.answer()
-    _, _, filt = query.data.split(":", 2)
+    (filt,) = context.args
     telegram_id = query.from_user.id
     group = STATUS_GROUPS.get(filt)
     statuses = group["statuses"] if group else []
     async with get_session() as session:
-        user_row = await get_or_create_user_by_telegram(session, telegram_id, update_if_exists=False)
+        user_row = await get_cached_user(session, telegram_id)
         orders = await db_get_orders_by_statuses(session, user_row.id, statuses)
     if not orders:
         await query.edit_message_text(
@@ -120,10 +120,10 @@ async def order_code_selected(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Show status details for the selected tracking code."""
     query = update.callback_query
     await query.answer()
-    _, _, code = query.data.split(":", 2)
+    (code,) = context.args
     telegram_id = query.from_user.id
     async with get_session() as session:
-        user_row = await get_or_create_user_by_telegram(session, telegram_id, update_if_exists=False)
+        user_row = await get_cached_user(session, telegram_id)
         order = await db_find_order(session, user_row.id, code)
     if not order:
         await query.edit_message_text(
@@ -161,17 +161,18 @@ async def order_code_selected(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def orders_reorder(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    _, _, code = query.data.split(":", 2)
+    (code,) = context.args
     telegram_id = query.from_user.id
+    from db.crud import create_order as _create
+    from handlers.helper import _generate_tracking_code
     async with get_session() as session:
-        user_row = await get_or_create_user_by_telegram(session, telegram_id, update_if_exists=False)
+        user_row = await get_cached_user(session, telegram_id)
         old = await db_find_order(session, user_row.id, code)
-        if not old:
-            await query.edit_message_text("سفارش موردنظر پیدا نشد.", reply_markup=orders_menu_kb(), parse_mode=ParseMode.HTML)
-            return 1
-    from db.crud import create_order as _create
-    from random import randint
-    new_code = f"{randint(100000, 999999)}"
+    if not old:
+        await query.edit_message_text("سفارش موردنظر پیدا نشد.", reply_markup=orders_menu_kb(), parse_mode=ParseMode.HTML)
+        return 1
+    # Allocate before this update writes anything (a block refill needs the write lock)
+    new_code = await _generate_tracking_code()
     async with get_session() as session:
         await _create(session, user_row.id, new_code, "درحال انجام", category_key=old.category_key, option_title=old.option_title)
     text = (
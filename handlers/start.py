@@ -7,11 +7,14 @@ from __future__ import annotations
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
-import os
 from db.database import get_session
-from db.crud import get_or_create_user_by_telegram, set_user_role
+from db.crud import get_cached_user, set_user_role
 
 from keyboards import main_menu, admin_main_menu
+from media import reply_video
+from settings import get_settings
+
+WELCOME_VIDEO = "RishehVideo.mp4"
 
 WELCOME_TEXT = (
     "🌿 ریشه؛ جایی برای اینکه حتی از دور هم کنار خانواده‌ت باشی\n\n"
@@ -27,37 +30,29 @@ WELCOME_TEXT = (
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle /start and show the main menu."""
-    # Upsert user on first interaction
+    # Upsert user on first interaction and choose menu based on role
     user = update.effective_user
+    kb = main_menu()
+    is_admin = False
     if user:
         full_name = user.full_name if hasattr(user, "full_name") else (f"{user.first_name} {getattr(user, 'last_name', '')}".strip() if user.first_name else None)
-        admins = {int(x) for x in os.getenv("ADMIN_TELEGRAM_IDS", "").split(",") if x.strip().isdigit()}
+        admins = get_settings(context).admin_telegram_ids
         default_role = 1 if user.id in admins else 2
         async with get_session() as session:
-            await get_or_create_user_by_telegram(
+            db_user = await get_cached_user(
                 session,
                 user.id,
                 username=user.username,
                 full_name=full_name,
                 default_role_id=default_role,
-                update_if_exists=False,
             )
-    # Choose menu based on role
-    kb = main_menu()
-    is_admin = False
-    if user:
-        async with get_session() as session:
-            db_user = await get_or_create_user_by_telegram(session, user.id, update_if_exists=False)
-            try:
-                admins_env = {int(x) for x in os.getenv("ADMIN_TELEGRAM_IDS", "").split(",") if x.strip().isdigit()}
-            except Exception:
-                admins_env = set()
-            if db_user and db_user.role_id != 1 and user.id in admins_env:
+            if db_user.role_id != 1 and user.id in admins:
                 await set_user_role(session, db_user.id, 1)
-                db_user.role_id = 1
-            if db_user and db_user.role_id == 1:
-                kb = admin_main_menu()
                 is_admin = True
+            elif db_user.role_id == 1:
+                is_admin = True
+        if is_admin:
+            kb = admin_main_menu()
     display_name = (f"@{user.username}" if getattr(user, "username", None) else (user.full_name if hasattr(user, "full_name") and user.full_name else "ادمین"))
     admin_text = (
         f"کاربر عزیز : {display_name} خوش آمدید.\n\n"
@@ -65,13 +60,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     )
     if update.message:
         if not is_admin:
-            video_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "files", "RishehVideo.mp4")
-            if os.path.exists(video_path):
-                try:
-                    with open(video_path, "rb") as vf:
-                        await update.message.reply_video(video=vf)
-                except Exception:
-                    pass
+            try:
+                await reply_video(update.message, WELCOME_VIDEO)
+            except Exception:
+                pass
         await update.message.reply_text(admin_text if is_admin else WELCOME_TEXT, reply_markup=kb, parse_mode=ParseMode.HTML)
     elif update.callback_query:
         query = update.callback_query
@@ -87,25 +79,18 @@ async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     # Choose menu based on role
     user = update.effective_user
     kb = main_menu()
-    if user:
-        async with get_session() as session:
-            db_user = await get_or_create_user_by_telegram(session, user.id, update_if_exists=False)
-            try:
-                admins_env = {int(x) for x in os.getenv("ADMIN_TELEGRAM_IDS", "").split(",") if x.strip().isdigit()}
-            except Exception:
-                admins_env = set()
-            if db_user and db_user.role_id != 1 and user.id in admins_env:
-                await set_user_role(session, db_user.id, 1)
-                db_user.role_id = 1
-            if db_user and db_user.role_id == 1:
-                kb = admin_main_menu()
-    # Build admin-specific welcome if needed
     is_admin = False
     if user:
         async with get_session() as session:
-            db_user = await get_or_create_user_by_telegram(session, user.id, update_if_exists=False)
-            if db_user and db_user.role_id == 1:
+            db_user = await get_cached_user(session, user.id)
+            admins_env = get_settings(context).admin_telegram_ids
+            if db_user.role_id != 1 and user.id in admins_env:
+                await set_user_role(session, db_user.id, 1)
+                is_admin = True
+            elif db_user.role_id == 1:
                 is_admin = True
+        if is_admin:
+            kb = admin_main_menu()
     display_name = (f"@{user.username}" if getattr(user, "username", None) else (user.full_name if hasattr(user, "full_name") and user.full_name else "ادمین"))
     admin_text = (
         f"{display_name} عزیز خوش آمدید.\n\n"
@@ -2,15 +2,54 @@
 Inline keyboard builders for the bot.
 
 All keyboards use Persian (RTL-friendly) labels.
+
+Markups are immutable once built, so builders whose output depends only
+on their (hashable) arguments are memoized: argument-free keyboards are
+built once and reused, parameterized ones live in a bounded LRU. Builders
+that take per-request lists (order codes, user pages) are not cached.
 """
 
 from __future__ import annotations
 
-from typing import List
+import functools
+from typing import Any, Callable, List
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from catalog import get_catalog
+from settings import Settings, subscribe
+
+
+# Argument-free keyboards: built on first use, then a shared singleton
+_static = functools.cache
+
+
+class _keyed:
+    """Keyboards keyed by category/item keys, order codes, urls, etc.: a
+    functools.lru_cache per builder, resized from KEYBOARD_CACHE_SIZE."""
+
+    instances: List["_keyed"] = []
+
+    def __init__(self, fn: Callable[..., InlineKeyboardMarkup]) -> None:
+        functools.update_wrapper(self, fn)
+        self._cached = functools.lru_cache(maxsize=Settings.keyboard_cache_size)(fn)
+        _keyed.instances.append(self)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> InlineKeyboardMarkup:
+        return self._cached(*args, **kwargs)
 
+    def resize(self, maxsize: int) -> None:
+        if self._cached.cache_parameters()["maxsize"] != maxsize:
+            self._cached = functools.lru_cache(maxsize=maxsize)(self.__wrapped__)
+
+
+@subscribe
+def _configure_keyboard_cache(settings: Settings) -> None:
+    for builder in _keyed.instances:
+        builder.resize(settings.keyboard_cache_size)
+
+
+@_static
 def main_menu() -> InlineKeyboardMarkup:
     """Main menu with revised actions."""
     buttons = [
@@ -23,6 +62,7 @@ def main_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_static
 def admin_main_menu() -> InlineKeyboardMarkup:
     """Admin main menu with access to global orders list."""
     buttons = [
@@ -32,10 +72,12 @@ def admin_main_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_static
 def back_to_main_button() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ بازگشت", callback_data="BACK:MAIN")]])
 
 
+@_keyed
 def channel_kb(url: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("مشاهده کانال", url=url)],
@@ -44,6 +86,7 @@ def channel_kb(url: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def website_kb(url: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("مشاهده وبسایت", url=url)],
@@ -52,51 +95,35 @@ def website_kb(url: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-# Helper v2 keyboards
+# Helper v2 keyboards (labels and structure come from the catalog registry)
 def helper2_main_kb() -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("⚜️ سلامت پیشگیرانه", callback_data="HELP2:CAT:PREVENTIVE")],
-        [InlineKeyboardButton("⚜️ تجربه لحظه‌های به‌یاد ماندنی از راه‌دور", callback_data="HELP2:CAT:MEMORIES")],
-        [InlineKeyboardButton("⚜️ انجام نیازهای روزمره", callback_data="HELP2:CAT:DAILY")],
-        [InlineKeyboardButton("⚜️ میخوام .....", callback_data="HELP2:CAT:WANT")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data="BACK:MAIN")],
-    ]
+    return get_catalog().main_markup
+
+
+def helper2_main_buttons_kb(categories: List[tuple[str, str]]) -> InlineKeyboardMarkup:
+    """categories: list of (category_key, title)"""
+    buttons = [[InlineKeyboardButton(title, callback_data=f"HELP2:CAT:{key}")] for key, title in categories]
+    buttons.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="BACK:MAIN")])
     return InlineKeyboardMarkup(buttons)
 
 
 def helper2_category_kb(category_key: str) -> InlineKeyboardMarkup:
-    mapping = {
-        "PREVENTIVE": [
-            ("EMERGENCY_CALL", "🚨 تماس اضطراری"),
-            ("HEALTH_ASSESS", "📋 سنجش سلامت"),
-            ("ALZHEIMER_SCREEN", "🧠 غربالگری آلزایمر"),
-            ("SPECIAL_CHECKUPS", "🏥 چکاپ‌های تخصصی"),
-            ("HOME_REDESIGN", "🏠 بازطراحی محیط زندگی سالمندان"),
-        ],
-        "MEMORIES": [
-            ("HOSTING_EXPERIENCE", "🍽️ سور (مهمان‌کردن و ساخت تجربه)"),
-            ("SURPRISE", "🎶 سورپرایز (اجرای غافلگیرکننده)"),
-            ("GIFT_FLOWERS_SWEETS", "🌸 خرید هدیه، گل و شیرینی"),
-        ],
-        "DAILY": [
-            ("DAILY_SHOPPING", "🧺 خرید روزمره"),
-            ("DIGITAL_HELP", "💻 حل مشکلات دیجیتالی"),
-        ],
-        "WANT": [
-            ("WANT_HEALTH_TRACK", "می‌خوام پیگیر وضعیت سلامت خانواده و عزیزان باشم!"),
-            ("WANT_SURPRISE", "می‌خوام خانواده یا یکی از عزیزانم رو سوپرایز یا خوشحال کنم!"),
-            ("WANT_SEND_GIFT", "میخوام برای خانوده یا یکی از عزیزانم هدیه، گل یا شیرینی ارسال کنم!"),
-            ("WANT_REMOTE_HELP", "نیاز به همیاری دارن و من از راه دور نمی‌تونم انجامش بدم!"),
-            ("WANT_NOT_FOUND", "اونی که می‌خوام اینحا نیست!"),
-        ],
-    }
+    category = get_catalog().categories.get(category_key)
+    if category is None:
+        return helper2_category_buttons_kb(category_key, [])
+    return category.markup
+
+
+def helper2_category_buttons_kb(category_key: str, items: List[tuple[str, str]]) -> InlineKeyboardMarkup:
+    """items: list of (item_key, label)"""
     rows = []
-    for key, label in mapping.get(category_key, []):
+    for key, label in items:
         rows.append([InlineKeyboardButton(label, callback_data=f"HELP2:ITEM:{category_key}:{key}")])
     rows.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="HELP2:BACK:MENU")])
     return InlineKeyboardMarkup(rows)
 
 
+@_keyed
 def helper2_item_actions_kb(category_key: str, item_key: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:{item_key}")],
@@ -105,91 +132,23 @@ def helper2_item_actions_kb(category_key: str, item_key: str) -> InlineKeyboardM
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def helper2_emergency_info_kb(category_key: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")]])
 
 
-def helper2_health_assess_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:HEALTH_ASSESS")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_alzheimer_screen_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:ALZHEIMER_SCREEN")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_hosting_experience_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:HOSTING_EXPERIENCE")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_surprise_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:SURPRISE")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_gift_flowers_sweets_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:GIFT_FLOWERS_SWEETS")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_home_redesign_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:HOME_REDESIGN")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_special_checkups_kb(category_key: str) -> InlineKeyboardMarkup:
+@_keyed
+def helper2_item_order_kb(category_key: str, item_key: str) -> InlineKeyboardMarkup:
+    """Order + ask + back, used by items with a full description."""
     buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:SPECIAL_CHECKUPS")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_daily_shopping_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:DAILY_SHOPPING")],
-        [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
-    ]
-    return InlineKeyboardMarkup(buttons)
-
-
-def helper2_digital_help_kb(category_key: str) -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:DIGITAL_HELP")],
+        [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELP2:CONFIRM:{category_key}:{item_key}")],
         [InlineKeyboardButton("💬 اگه سوال داری، از من بپرس!", callback_data="NAV:ASK")],
         [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"HELP2:CAT:{category_key}")],
     ]
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def helper2_want_request_kb(category_key: str = "WANT") -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("📩 ارسال درخواست", callback_data=f"HELP2:REQUEST:START:{category_key}")],
@@ -198,6 +157,7 @@ def helper2_want_request_kb(category_key: str = "WANT") -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def helper2_force_join_kb(category_key: str, item_key: str, join_url: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("📢 عضویت در کانال ریشه", url=join_url)],
@@ -215,6 +175,7 @@ def helper_menu_kb(categories: List[tuple[int, str]]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def helper_options_kb(category_id: int, count: int = 3) -> InlineKeyboardMarkup:
     """Build numeric options (1..count) for a helper category."""
     row: List[InlineKeyboardButton] = []
@@ -226,6 +187,7 @@ def helper_options_kb(category_id: int, count: int = 3) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def helper_confirm_kb(category_id: int, idx: int) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("📝 ثبت سفارش", callback_data=f"HELPER:CONFIRM:{category_id}:{idx}")],
@@ -234,6 +196,7 @@ def helper_confirm_kb(category_id: int, idx: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_static
 def after_confirm_kb() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("📌 پیگیری سفارش‌ها", callback_data="NAV:ORDERS")],
@@ -241,6 +204,7 @@ def after_confirm_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def force_join_kb(channel_url: str, category_id: int, idx: int) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("عضویت در کانال", url=channel_url)],
@@ -250,6 +214,7 @@ def force_join_kb(channel_url: str, category_id: int, idx: int) -> InlineKeyboar
     return InlineKeyboardMarkup(buttons)
 
 
+@_static
 def orders_menu_kb() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("⏳ سفارش‌های درحال انجام", callback_data="ORDERS:FILTER:ACTIVE")],
@@ -280,6 +245,7 @@ def orders_named_list_kb(entries: List[tuple[str, str]]) -> InlineKeyboardMarkup
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def orders_done_detail_kb(code: str) -> InlineKeyboardMarkup:
     buttons: List[List[InlineKeyboardButton]] = []
     buttons.append([InlineKeyboardButton("🔁 ثبت مجدد همین سفارش", callback_data=f"ORDERS:REORDER:{code}")])
@@ -287,6 +253,7 @@ def orders_done_detail_kb(code: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def support_kb(username: str = "rishehsupport") -> InlineKeyboardMarkup:
     url = f"https://t.me/{str(username).lstrip('@')}"
     buttons = [
@@ -296,6 +263,7 @@ def support_kb(username: str = "rishehsupport") -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_static
 def contact_menu_kb() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("📱 سوشال ریشه", callback_data="CONTACT:SOCIALS")],
@@ -306,6 +274,7 @@ def contact_menu_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_keyed
 def socials_links_kb(tg_url: str, ig_url: str, yt_url: str, li_url: str) -> InlineKeyboardMarkup:
     rows: List[List[InlineKeyboardButton]] = []
     if tg_url:
@@ -320,6 +289,7 @@ def socials_links_kb(tg_url: str, ig_url: str, yt_url: str, li_url: str) -> Inli
     return InlineKeyboardMarkup(rows)
 
 
+@_keyed
 def contact_website_kb(url: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("🌍 وبسایت ریشه", url=url)],
@@ -328,6 +298,7 @@ def contact_website_kb(url: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+@_static
 def trust_kb() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("🚀 شروع همراهی", callback_data="NAV:HELPER")],
@@ -336,28 +307,32 @@ def trust_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-def admin_orders_list_kb(tracking_codes: List[str], filt: str, page: int, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
-    """Build a two-column paginated list of tracking code buttons with navigation."""
+def admin_orders_list_kb(tracking_codes: List[str], filt: str, prev_cursor: str | None, next_cursor: str | None) -> InlineKeyboardMarkup:
+    """Build a two-column paginated list of tracking code buttons with navigation.
+
+    prev_cursor/next_cursor are keyset cursors ("a<id>" / "b<id>"); None hides the button.
+    """
     rows: List[List[InlineKeyboardButton]] = []
     row: List[InlineKeyboardButton] = []
     for code in tracking_codes:
-        row.append(InlineKeyboardButton(code, callback_data=f"ORDERS_ADMIN:CODE:{code}:{page}"))
+        row.append(InlineKeyboardButton(code, callback_data=f"ORDERS_ADMIN:CODE:{code}"))
         if len(row) == 2:
             rows.append(row)
             row = []
     if row:
         rows.append(row)
     nav: List[InlineKeyboardButton] = []
-    if has_prev:
-        nav.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"ORDERS_ADMIN:PAGE:{filt}:{page-1}"))
-    if has_next:
-        nav.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"ORDERS_ADMIN:PAGE:{filt}:{page+1}"))
+    if prev_cursor:
+        nav.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"ORDERS_ADMIN:PAGE:{filt}:{prev_cursor}"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"ORDERS_ADMIN:PAGE:{filt}:{next_cursor}"))
     if nav:
         rows.append(nav)
     rows.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="NAV:ADMIN_ORDERS")])
     return InlineKeyboardMarkup(rows)
 
 
+@_static
 def admin_orders_menu_kb() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("سفارشات جدید", callback_data="ORDERS_ADMIN:GROUP:NEW")],
@@ -368,9 +343,7 @@ def admin_orders_menu_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
- 
-
-
+@_keyed
 def admin_order_actions_kb(username: str | None, code: str) -> InlineKeyboardMarkup:
     buttons: List[List[InlineKeyboardButton]] = []
     buttons.append([InlineKeyboardButton("تغییر وضعیت", callback_data=f"ORDERS_ADMIN:STATUSMENU:{code}")])
@@ -383,16 +356,19 @@ def admin_order_actions_kb(username: str | None, code: str) -> InlineKeyboardMar
     return InlineKeyboardMarkup(buttons)
 
 
+# Use compact status codes for callback data; labels are Persian
+ADMIN_STATUS_CHOICES = (
+    ("REVIEWED", "بررسی شده"),
+    ("REJECTED", "رد شده"),
+    ("IN_PROGRESS", "در دست اقدام"),
+    ("DONE", "انجام شده"),
+)
+
+
+@_keyed
 def admin_status_menu_kb(code: str) -> InlineKeyboardMarkup:
-    # Use compact status codes for callback data; labels are Persian
-    items = [
-        ("REVIEWED", "بررسی شده"),
-        ("REJECTED", "رد شده"),
-        ("IN_PROGRESS", "در دست اقدام"),
-        ("DONE", "انجام شده"),
-    ]
     buttons: List[List[InlineKeyboardButton]] = []
-    for key, label in items:
+    for key, label in ADMIN_STATUS_CHOICES:
         buttons.append([InlineKeyboardButton(label, callback_data=f"ORDERS_ADMIN:SETSTATUS:{code}:{key}")])
     buttons.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"ORDERS_ADMIN:CODE:{code}")])
     return InlineKeyboardMarkup(buttons)
@@ -408,32 +384,94 @@ def admin_items_menu_kb(items: List[tuple[int, str]], group_key: str) -> InlineK
             row = []
     if row:
         rows.append(row)
+    rows.append(_export_row(group_key, 0))
     rows.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="NAV:ADMIN_ORDERS")])
     return InlineKeyboardMarkup(rows)
 
 
-def admin_named_orders_list_kb(entries: List[tuple[str, str]], group_key: str, item_id: int, page: int, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
+def _export_row(group_key: str, item_id: int) -> List[InlineKeyboardButton]:
+    # item_id 0 exports every item of the group
+    return [
+        InlineKeyboardButton("📤 خروجی CSV", callback_data=f"ORDERS_ADMIN:EXPORT:{group_key}:{item_id}:CSV"),
+        InlineKeyboardButton("📤 خروجی Excel", callback_data=f"ORDERS_ADMIN:EXPORT:{group_key}:{item_id}:XLSX"),
+    ]
+
+
+def admin_named_orders_list_kb(entries: List[tuple[str, str]], group_key: str, item_id: int, prev_cursor: str | None, next_cursor: str | None, cursor: str = "0") -> InlineKeyboardMarkup:
     # entries: list of (label, tracking_code)
     rows: List[List[InlineKeyboardButton]] = []
     row: List[InlineKeyboardButton] = []
     for label, code in entries:
-        row.append(InlineKeyboardButton(label, callback_data=f"ORDERS_ADMIN:CODE:{code}:{page}"))
+        row.append(InlineKeyboardButton(label, callback_data=f"ORDERS_ADMIN:CODE:{code}"))
         if len(row) == 2:
             rows.append(row)
             row = []
     if row:
         rows.append(row)
     nav: List[InlineKeyboardButton] = []
-    if has_prev:
-        nav.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"ORDERS_ADMIN:GROUP_ITEM_PAGE:{group_key}:{item_id}:{page-1}"))
-    if has_next:
-        nav.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"ORDERS_ADMIN:GROUP_ITEM_PAGE:{group_key}:{item_id}:{page+1}"))
+    if prev_cursor:
+        nav.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"ORDERS_ADMIN:GROUP_ITEM_PAGE:{group_key}:{item_id}:{prev_cursor}"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"ORDERS_ADMIN:GROUP_ITEM_PAGE:{group_key}:{item_id}:{next_cursor}"))
     if nav:
         rows.append(nav)
+    if entries:
+        rows.append([InlineKeyboardButton("☑️ انتخاب گروهی", callback_data=f"ORDERS_ADMIN:BULK:{group_key}:{item_id}:{cursor}")])
+        rows.append(_export_row(group_key, item_id))
     rows.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"ORDERS_ADMIN:GROUP:{group_key}")])
     return InlineKeyboardMarkup(rows)
 
 
+def admin_bulk_orders_list_kb(
+    entries: List[tuple[str, str]],
+    selected: set[str],
+    group_key: str,
+    item_id: int,
+    cursor: str,
+    prev_cursor: str | None,
+    next_cursor: str | None,
+) -> InlineKeyboardMarkup:
+    # Multi-select version of admin_named_orders_list_kb; taps toggle orders
+    base = f"{group_key}:{item_id}:{cursor}"
+    rows: List[List[InlineKeyboardButton]] = []
+    row: List[InlineKeyboardButton] = []
+    for label, code in entries:
+        mark = "✅" if code in selected else "⬜"
+        row.append(InlineKeyboardButton(f"{mark} {label}", callback_data=f"ORDERS_ADMIN:BULK_T:{base}:{code}"))
+        if len(row) == 2:
+            rows.append(row)
+            row = []
+    if row:
+        rows.append(row)
+    nav: List[InlineKeyboardButton] = []
+    if prev_cursor:
+        nav.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"ORDERS_ADMIN:BULK:{group_key}:{item_id}:{prev_cursor}"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"ORDERS_ADMIN:BULK:{group_key}:{item_id}:{next_cursor}"))
+    if nav:
+        rows.append(nav)
+    rows.append([
+        InlineKeyboardButton("این صفحه", callback_data=f"ORDERS_ADMIN:BULK_PAGE:{base}"),
+        InlineKeyboardButton("همه", callback_data=f"ORDERS_ADMIN:BULK_ALL:{base}"),
+        InlineKeyboardButton("پاک کردن", callback_data=f"ORDERS_ADMIN:BULK_CLEAR:{base}"),
+    ])
+    if selected:
+        rows.append([InlineKeyboardButton(f"تغییر وضعیت ({len(selected)})", callback_data=f"ORDERS_ADMIN:BULK_STATUS:{base}")])
+    rows.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"ORDERS_ADMIN:GROUP_ITEM_PAGE:{base}")])
+    return InlineKeyboardMarkup(rows)
+
+
+@_keyed
+def admin_bulk_status_menu_kb(group_key: str, item_id: int, cursor: str) -> InlineKeyboardMarkup:
+    base = f"{group_key}:{item_id}:{cursor}"
+    buttons: List[List[InlineKeyboardButton]] = []
+    for key, label in ADMIN_STATUS_CHOICES:
+        buttons.append([InlineKeyboardButton(label, callback_data=f"ORDERS_ADMIN:BULK_SET:{base}:{key}")])
+    buttons.append([InlineKeyboardButton("⬅️ بازگشت", callback_data=f"ORDERS_ADMIN:BULK:{base}")])
+    return InlineKeyboardMarkup(buttons)
+
+
+@_static
 def admin_users_menu_kb() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton("لیست کاربران", callback_data="ADMIN_USERS:OPEN")],
@@ -442,29 +480,30 @@ def admin_users_menu_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-def admin_users_list_kb(user_buttons: List[tuple[int, str]], page: int, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
-    # Build 2 buttons per row
+def admin_users_list_kb(user_buttons: List[tuple[int, str]], cursor: str, prev_cursor: str | None, next_cursor: str | None) -> InlineKeyboardMarkup:
+    # Build 2 buttons per row; `cursor` reopens the current page from user details
     rows: List[List[InlineKeyboardButton]] = []
     row: List[InlineKeyboardButton] = []
     for uid, label in user_buttons:
-        row.append(InlineKeyboardButton(label, callback_data=f"ADMIN_USERS:USER:{uid}:{page}"))
+        row.append(InlineKeyboardButton(label, callback_data=f"ADMIN_USERS:USER:{uid}:{cursor}"))
         if len(row) == 2:
             rows.append(row)
             row = []
     if row:
         rows.append(row)
     nav_row: List[InlineKeyboardButton] = []
-    if has_prev:
-        nav_row.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"ADMIN_USERS:PAGE:{page-1}"))
-    if has_next:
-        nav_row.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"ADMIN_USERS:PAGE:{page+1}"))
+    if prev_cursor:
+        nav_row.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"ADMIN_USERS:PAGE:{prev_cursor}"))
+    if next_cursor:
+        nav_row.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"ADMIN_USERS:PAGE:{next_cursor}"))
     if nav_row:
         rows.append(nav_row)
     rows.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="NAV:ADMIN_USERS")])
     return InlineKeyboardMarkup(rows)
 
 
-def admin_user_actions_kb(user_id: int, return_page: int, current_role: int) -> InlineKeyboardMarkup:
+@_keyed
+def admin_user_actions_kb(user_id: int, return_page: str, current_role: int) -> InlineKeyboardMarkup:
     if current_role == 1:
         label = "تغییر به کاربر عادی"
         cb = f"ADMIN_USERS:SET_ROLE:{user_id}:2:{return_page}"
@@ -476,3 +515,19 @@ def admin_user_actions_kb(user_id: int, return_page: int, current_role: int) ->
         [InlineKeyboardButton("⬅️ بازگشت", callback_data=f"ADMIN_USERS:PAGE:{return_page}")],
     ]
     return InlineKeyboardMarkup(buttons)
+
+
+def admin_search_results_kb(results: List[tuple[str, str]], prev_cursor: str | None, next_cursor: str | None) -> InlineKeyboardMarkup:
+    # results: (label, callback_data), one per row in rank order
+    rows: List[List[InlineKeyboardButton]] = [
+        [InlineKeyboardButton(label, callback_data=cb)] for label, cb in results
+    ]
+    nav_row: List[InlineKeyboardButton] = []
+    if prev_cursor:
+        nav_row.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"FIND:PAGE:{prev_cursor}"))
+    if next_cursor:
+        nav_row.append(InlineKeyboardButton("➡️ ادامه", callback_data=f"FIND:PAGE:{next_cursor}"))
+    if nav_row:
+        rows.append(nav_row)
+    rows.append([InlineKeyboardButton("⬅️ بازگشت", callback_data="BACK:MAIN")])
+    return InlineKeyboardMarkup(rows)
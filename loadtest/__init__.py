@@ -0,0 +1,6 @@
+"""
+Offline load testing: a fake Bot API server plus a journey-driven load generator.
+
+Run with `python -m loadtest --users 50` (see loadtest/__main__.py). Focused
+per-change benchmarks live in loadtest/bench.py (`python -m loadtest.bench --list`).
+"""
@@ -0,0 +1,282 @@
+"""
+Load generator: runs the real application (main.build_app) against the
+fake Bot API and drives scripted user journeys with N virtual users.
+
+    python -m loadtest --users 50 --iterations 2 --latency-ms 40 --rate-limit 0.01
+
+Each journey is start -> helper -> category -> item -> confirm -> orders ->
+active orders, then the user's admin changes the new order's status. A
+step's latency is the time from queueing the update until the bot's
+answer for that chat reaches the fake API. Steps are labelled by command
+or callback prefix, so they map to handlers. `--query-budget N` fails (and
+reports) any update that runs more than N DB queries. The fake API shares the
+bot's process and event loop, so absolute throughput is a lower bound.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Tuple
+
+import metrics
+from catalog import get_catalog
+from db.database import init_db
+from loadtest.fake_bot_api import ApiServer, FakeApiConfig, FakeBotApi, Outgoing
+from main import build_app
+from settings import Settings, publish
+
+
+USER_ID_BASE = 7_000_000
+ADMIN_ID_BASE = 8_000_000
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+
+    def add(self, label: str, seconds: float) -> None:
+        self.samples[label].append(seconds)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _tg_user(uid: int) -> Dict[str, Any]:
+    return {"id": uid, "is_bot": False, "first_name": f"vu{uid}", "username": f"vu{uid}"}
+
+
+def _chat(uid: int) -> Dict[str, Any]:
+    return {"id": uid, "type": "private"}
+
+
+def text_update(api: FakeBotApi, uid: int, text: str) -> Dict[str, Any]:
+    message: Dict[str, Any] = {
+        "message_id": api.next_message_id(),
+        "date": int(time.time()),
+        "chat": _chat(uid),
+        "from": _tg_user(uid),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"message": message}
+
+
+def callback_update(api: FakeBotApi, uid: int, data: str) -> Dict[str, Any]:
+    return {
+        "callback_query": {
+            "id": str(api.next_message_id()),
+            "from": _tg_user(uid),
+            "chat_instance": str(uid),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": _chat(uid),
+                "from": {"id": 999000, "is_bot": True, "first_name": "Risheh"},
+                "text": "…",
+            },
+        }
+    }
+
+
+def has(prefix: str) -> Callable[[Outgoing], bool]:
+    return lambda out: any(c.startswith(prefix) for c in out.callbacks)
+
+
+class Runner:
+    def __init__(self, api: FakeBotApi, stats: Stats, timeout: float) -> None:
+        self.api = api
+        self.stats = stats
+        self.timeout = timeout
+        self.updates_sent = 0
+
+    async def step(self, label: str, uid: int, update: Dict[str, Any], predicate: Callable[[Outgoing], bool]) -> Outgoing:
+        since = time.perf_counter()
+        self.api.push_update(update)
+        self.updates_sent += 1
+        try:
+            out = await self.api.wait_for(uid, since, predicate, self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.errors[label] += 1
+            raise
+        self.stats.add(label, time.perf_counter() - since)
+        return out
+
+    async def journey(self, uid: int, admin_uid: int, cat: str, item: str) -> None:
+        api = self.api
+        await self.step("/start", uid, text_update(api, uid, "/start"), has("NAV:HELPER"))
+        await self.step("NAV:HELPER", uid, callback_update(api, uid, "NAV:HELPER"), has("HELP2:CAT:"))
+        await self.step("HELP2:CAT", uid, callback_update(api, uid, f"HELP2:CAT:{cat}"), has(f"HELP2:ITEM:{cat}:{item}"))
+        await self.step("HELP2:ITEM", uid, callback_update(api, uid, f"HELP2:ITEM:{cat}:{item}"), has(f"HELP2:CONFIRM:{cat}:{item}"))
+        await self.step("HELP2:CONFIRM", uid, callback_update(api, uid, f"HELP2:CONFIRM:{cat}:{item}"), has("NAV:ORDERS"))
+        await self.step("NAV:ORDERS", uid, callback_update(api, uid, "NAV:ORDERS"), has("ORDERS:FILTER:ACTIVE"))
+        out = await self.step("ORDERS:FILTER", uid, callback_update(api, uid, "ORDERS:FILTER:ACTIVE"), has("ORDERS:CODE:"))
+        code = next(c for c in out.callbacks if c.startswith("ORDERS:CODE:")).rsplit(":", 1)[-1]
+        await self.step(
+            "ORDERS_ADMIN:STATUSMENU", admin_uid,
+            callback_update(api, admin_uid, f"ORDERS_ADMIN:STATUSMENU:{code}"),
+            has(f"ORDERS_ADMIN:SETSTATUS:{code}:"),
+        )
+        await self.step(
+            "ORDERS_ADMIN:SETSTATUS", admin_uid,
+            callback_update(api, admin_uid, f"ORDERS_ADMIN:SETSTATUS:{code}:DONE"),
+            lambda o: o.method == "editMessageText" and f"ORDERS_ADMIN:STATUSMENU:{code}" in o.callbacks,
+        )
+
+
+def _orderable_items() -> List[Tuple[str, str]]:
+    return [
+        (it.category_key, it.key)
+        for it in get_catalog().items.values()
+        if it.kind in ("confirm", "order")
+    ]
+
+
+@dataclasses.dataclass
+class Result:
+    stats: Stats
+    api: FakeBotApi
+    ok: int
+    failed: int
+    updates: int
+    elapsed: float
+
+
+async def run(args: argparse.Namespace) -> Result:
+    api = FakeBotApi(FakeApiConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_ratio=args.rate_limit,
+    ))
+    server = ApiServer(api, port=args.port)
+    await server.start()
+
+    db_url = args.db_url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(prefix='risheh-load-'), 'app.db')}"
+    await init_db(db_url)
+
+    admin_ids = [ADMIN_ID_BASE + i for i in range(max(1, args.admins))]
+    settings = dataclasses.replace(
+        Settings.from_env({}),
+        db_url=db_url,
+        admin_telegram_ids=frozenset(admin_ids),
+        mandatory_channel_id="@risheh_loadtest",
+        mandatory_channel_url="https://t.me/risheh_loadtest",
+        bot_api_url=server.base_url,
+        query_warn_threshold=args.query_budget or Settings.query_warn_threshold,
+        query_budget_strict=bool(args.query_budget),
+    )
+    app = build_app(
+        "123456:loadtest",
+        update_queue_size=settings.update_queue_size,
+        max_concurrent_updates=args.concurrency,
+        base_url=server.base_url,
+    )
+    publish(app.bot_data, settings)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    await app.start()
+
+    stats = Stats()
+    runner = Runner(api, stats, args.step_timeout)
+    for aid in admin_ids:
+        await runner.step("/start (admin)", aid, text_update(api, aid, "/start"), has("NAV:ADMIN_ORDERS"))
+
+    rng = random.Random(args.seed)
+    items = _orderable_items()
+    ok = failed = 0
+
+    async def virtual_user(n: int) -> None:
+        nonlocal ok, failed
+        uid = USER_ID_BASE + n
+        for _ in range(args.iterations):
+            cat, item = rng.choice(items)
+            try:
+                await runner.journey(uid, admin_ids[n % len(admin_ids)], cat, item)
+                ok += 1
+            except asyncio.TimeoutError:
+                failed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(n) for n in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    await app.updater.stop()
+    await app.stop()
+    if app.post_stop:
+        await app.post_stop(app)
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+    await server.stop()
+    return Result(stats, api, ok, failed, runner.updates_sent, elapsed)
+
+
+def _report(args: argparse.Namespace, result: Result) -> None:
+    stats, api, ok, failed, updates, elapsed = (
+        result.stats, result.api, result.ok, result.failed, result.updates, result.elapsed
+    )
+    print(
+        f"users={args.users} iterations={args.iterations} concurrency={args.concurrency} "
+        f"api latency={args.latency_ms:g}ms+{args.jitter_ms:g}ms 429 ratio={args.rate_limit:g}"
+    )
+    print(
+        f"journeys: {ok} ok, {failed} failed in {elapsed:.2f}s "
+        f"({ok / elapsed:.2f} journeys/s, {updates / elapsed:.1f} updates/s)"
+    )
+    print(f"{'step':<26}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for label, values in stats.samples.items():
+        print(
+            f"{label:<26}{len(values):>6}"
+            f"{_percentile(values, 0.50) * 1000:>9.1f}{_percentile(values, 0.95) * 1000:>9.1f}"
+            f"{_percentile(values, 0.99) * 1000:>9.1f}{max(values) * 1000:>9.1f}"
+        )
+    if metrics.BUDGET_EXCEEDED:
+        print(f"over the {args.query_budget}-query budget: " + ", ".join(f"{k}={v}" for k, v in metrics.BUDGET_EXCEEDED.most_common()))
+    if stats.errors:
+        print("timeouts: " + ", ".join(f"{k}={v}" for k, v in stats.errors.most_common()))
+    print("bot api calls: " + ", ".join(f"{k}={v}" for k, v in api.calls.most_common()))
+    if api.rate_limited:
+        print("answered 429: " + ", ".join(f"{k}={v}" for k, v in api.rate_limited.most_common()))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20, help="virtual users")
+    parser.add_argument("--iterations", type=int, default=1, help="journeys per virtual user")
+    parser.add_argument("--admins", type=int, default=2, help="admin accounts sharing the status changes")
+    parser.add_argument("--concurrency", type=int, default=Settings.max_concurrent_updates, help="max concurrent updates")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake Bot API latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random latency per call")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of send/edit calls answered with 429")
+    parser.add_argument("--step-timeout", type=float, default=30.0, help="seconds to wait for each answer")
+    parser.add_argument("--port", type=int, default=8089, help="fake Bot API port")
+    parser.add_argument("--db-url", default=None, help="database URL (default: a fresh temp SQLite file)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--query-budget", type=int, default=0, help="fail any update running more DB queries than this (0 = off)")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    _report(args, asyncio.run(run(args)))
+    if metrics.BUDGET_EXCEEDED:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Focused benchmarks for individual changes, each against a freshly seeded
+temp database (or an in-process setup) rather than the full bot.
+
+    python -m loadtest.bench --list
+    python -m loadtest.bench group-counts --orders 50000
+
+Every benchmark prints a small table comparing the old and new code paths,
+with the DB query count where it matters (counted with a cursor event on
+the engine, like metrics.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.engine import Engine
+
+
+# name -> (description, argument specs, coroutine taking the parsed args)
+BENCHMARKS: Dict[str, Tuple[str, List[Tuple[str, Dict[str, Any]]], Callable[[argparse.Namespace], Awaitable[None]]]] = {}
+
+STATUSES = ("درحال انجام", "بررسی شده", "در دست اقدام", "انجام شده", "رد شده")
+
+
+def benchmark(name: str, description: str, *arguments: Tuple[str, Dict[str, Any]]):
+    def register(fn: Callable[[argparse.Namespace], Awaitable[None]]):
+        BENCHMARKS[name] = (description, list(arguments), fn)
+        return fn
+
+    return register
+
+
+# ---- helpers ----
+
+def temp_db_url(name: str = "bench.db") -> str:
+    return f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(prefix='risheh-bench-'), name)}"
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *_args: Any) -> None:
+        self.count += 1
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    event.listen(Engine, "after_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, "after_cursor_execute", counter)
+
+
+async def timed(fn: Callable[[], Awaitable[Any]], repeat: int) -> Tuple[float, int]:
+    """Median wall time (seconds) of `repeat` runs and the queries of one run."""
+    samples: List[float] = []
+    queries = 0
+    for i in range(repeat):
+        with count_queries() as counter:
+            started = time.perf_counter()
+            await fn()
+            samples.append(time.perf_counter() - started)
+        if i == 0:
+            queries = counter.count
+    return statistics.median(samples), queries
+
+
+def print_table(rows: List[Tuple[str, float, Optional[int]]]) -> None:
+    print(f"{'variant':<40}{'median ms':>12}{'queries':>10}")
+    for label, seconds, queries in rows:
+        print(f"{label:<40}{seconds * 1000:>12.2f}{'' if queries is None else queries:>10}")
+
+
+async def seed_orders(count: int, users: int = 1000, chunk: int = 20000) -> None:
+    """Insert `users` users and `count` orders spread over the catalog items and statuses."""
+    from db.crud import get_all_items
+    from db.database import new_session
+    from db.models import Order, User
+    from db.stats import reconcile_order_stats
+
+    async with new_session() as session:
+        items = [it.title for it in await get_all_items(session)]
+        await session.execute(insert(User), [
+            {"telegram_id": 5_000_000_000 + i, "username": f"bench{i}", "full_name": f"Bench {i}", "role_id": 2}
+            for i in range(users)
+        ])
+        user_ids = list((await session.execute(select(User.id).where(User.telegram_id >= 5_000_000_000))).scalars())
+        for start in range(0, count, chunk):
+            await session.execute(insert(Order), [
+                {
+                    "user_id": user_ids[n % len(user_ids)],
+                    "tracking_code": str(10_000_000 + n),
+                    "status": STATUSES[n % len(STATUSES)],
+                    "category_key": "BENCH",
+                    "option_title": items[(n // len(STATUSES)) % len(items)],
+                }
+                for n in range(start, min(start + chunk, count))
+            ])
+        await reconcile_order_stats(session)
+        await session.commit()
+
+
+# ---- benchmarks ----
+
+@benchmark(
+    "group-counts",
+    "per-item order counts for an admin group: N+1 COUNTs vs one GROUP BY vs the rollup (user-001, user-024)",
+    ("--orders", {"type": int, "default": 50_000}),
+    ("--repeat", {"type": int, "default": 20}),
+)
+async def bench_group_counts(args: argparse.Namespace) -> None:
+    from db.crud import count_orders_by_statuses_per_item, get_all_items
+    from db.database import init_db, new_session
+    from db.models import Order
+
+    await init_db(temp_db_url())
+    await seed_orders(args.orders)
+    statuses = ["انجام شده", "رد شده"]
+
+    async def n_plus_one() -> None:
+        async with new_session() as session:
+            for it in await get_all_items(session):
+                await session.execute(
+                    select(func.count(Order.id)).where(Order.status.in_(statuses), Order.option_title == it.title)
+                )
+
+    async def group_by() -> None:
+        async with new_session() as session:
+            await get_all_items(session)
+            await session.execute(
+                select(Order.option_title, func.count(Order.id))
+                .where(Order.status.in_(statuses), Order.option_title.is_not(None))
+                .group_by(Order.option_title)
+            )
+
+    async def rollup() -> None:
+        async with new_session() as session:
+            await get_all_items(session)
+            await count_orders_by_statuses_per_item(session, statuses)
+
+    print(f"{args.orders} orders, group statuses {statuses}")
+    rows = []
+    for label, fn in (
+        ("per-item COUNT over orders (before)", n_plus_one),
+        ("single GROUP BY over orders", group_by),
+        ("GROUP BY over order_stats_daily (now)", rollup),
+    ):
+        seconds, queries = await timed(fn, args.repeat)
+        rows.append((label, seconds, queries))
+    print_table(rows)
+
+
+@benchmark(
+    "sqlite-profile",
+    "concurrent order confirms under DB_PROFILE=default vs production (WAL, pragmas, sized pool) (user-010)",
+    ("--confirms", {"type": int, "default": 2000}),
+    ("--concurrency", {"type": int, "default": 32}),
+)
+async def bench_sqlite_profile(args: argparse.Namespace) -> None:
+    import dataclasses
+
+    import db.tracking
+    from db.cache import user_cache
+    from db.crud import create_order, get_cached_user
+    from db.database import close_db, get_session, init_db, update_scope
+    from db.tracking import allocate_tracking_code
+    from settings import Settings, publish
+
+    async def confirm(n: int) -> None:
+        # The helper2_confirm write path: code first, then user + order in the update's session
+        async with update_scope():
+            code = await allocate_tracking_code()
+            async with get_session() as session:
+                user = await get_cached_user(session, 6_000_000_000 + n, username=f"c{n}", full_name=f"Confirm {n}")
+                await create_order(session, int(user.id), code, "درحال انجام", category_key="BENCH", option_title="item")
+
+    print(f"{args.confirms} confirms (new user + order each), {args.concurrency} concurrent")
+    print(f"{'profile':<14}{'orders/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for profile in ("default", "production"):
+        settings = dataclasses.replace(Settings.from_env({}), db_url=temp_db_url(), db_profile=profile)
+        publish({}, settings)
+        db.tracking._allocator = None
+        user_cache.clear()
+        await init_db(settings.db_url, settings)
+        latencies: List[float] = []
+        errors = 0
+        pending = iter(range(args.confirms))
+        started = time.perf_counter()
+
+        async def worker() -> None:
+            nonlocal errors
+            for n in pending:
+                t0 = time.perf_counter()
+                try:
+                    await confirm(n)
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        await close_db()
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{profile:<14}{(args.confirms - errors) / elapsed:>10.0f}"
+              f"{statistics.median(latencies) * 1000:>10.1f}{p99 * 1000:>10.1f}{errors:>8}")
+
+
+# Sample argument per router argument type, for generating callback data
+_ROUTER_SAMPLES = {"key": "DONE", "int": "3", "code": "123456", "cursor": "a42", "role": "1", "str": "x", "*": "7:2"}
+
+
+@benchmark(
+    "router",
+    "callback dispatch: ordered regex CallbackQueryHandler scan vs the prefix-trie router (user-011)",
+    ("--repeat", {"type": int, "default": 2000}),
+)
+async def bench_router(args: argparse.Namespace) -> None:
+    import re
+
+    from telegram import Update
+    from telegram.ext import CallbackQueryHandler
+
+    from main import build_router
+    from router import ARG_TYPES, REST
+
+    router = build_router()
+    # The pre-router setup: one regex handler per route, checked in registration order
+    handlers = []
+    samples = []
+    for route in router.routes:
+        literals = [seg for seg in route.template.split(":") if not seg.startswith("{")]
+        parts = [re.escape(seg) for seg in literals]
+        parts += [".*" if t == REST else ARG_TYPES[t][0].pattern for t in route.arg_types]
+        handlers.append(CallbackQueryHandler(route.handler, pattern=f"^{':'.join(parts)}$"))
+        samples.append(":".join(literals + [_ROUTER_SAMPLES[t] for t in route.arg_types]))
+    updates = [
+        Update.de_json({"update_id": i, "callback_query": {
+            "id": str(i), "from": {"id": 1, "is_bot": False, "first_name": "B"},
+            "chat_instance": "1", "data": data,
+        }}, None)
+        for i, data in enumerate(samples)
+    ]
+
+    def regex_scan(update: Update) -> None:
+        for handler in handlers:
+            if handler.check_update(update):
+                return
+        raise AssertionError(update.callback_query.data)
+
+    def trie(update: Update) -> None:
+        if router.resolve(update.callback_query.data) is None:
+            raise AssertionError(update.callback_query.data)
+
+    print(f"{len(handlers)} routes, every route's callback data dispatched {args.repeat} times")
+    print(f"{'variant':<40}{'mean us':>10}{'last route us':>16}")
+    for label, fn in (("regex CallbackQueryHandler scan (before)", regex_scan), ("prefix-trie router (now)", trie)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for update in updates:
+                fn(update)
+        mean = (time.perf_counter() - started) / (args.repeat * len(updates))
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            fn(updates[-1])
+        last = (time.perf_counter() - started) / args.repeat
+        print(f"{label:<40}{mean * 1e6:>10.2f}{last * 1e6:>16.2f}")
+
+
+@benchmark(
+    "keyboards",
+    "keyboard building per navigation tap: memoized markups vs rebuilding them (user-013)",
+    ("--repeat", {"type": int, "default": 2000}),
+)
+async def bench_keyboards(args: argparse.Namespace) -> None:
+    import tracemalloc
+
+    import keyboards as kb
+    from catalog import get_catalog
+
+    catalog = get_catalog()
+    category = next(iter(catalog.categories.values()))
+    item = category.items[0]
+    main_buttons = [(c.key, c.title) for c in catalog.categories.values()]
+    category_buttons = [(it.key, it.title) for it in category.items]
+
+    def plain(fn: Callable[..., Any]) -> Callable[..., Any]:
+        return getattr(fn, "__wrapped__", fn)
+
+    # One keyboard per screen of a typical user and admin session
+    taps: List[Tuple[Callable[[], Any], Callable[[], Any]]] = [
+        (kb.main_menu, plain(kb.main_menu)),
+        (kb.helper2_main_kb, lambda: kb.helper2_main_buttons_kb(main_buttons)),
+        (lambda: kb.helper2_category_kb(category.key), lambda: kb.helper2_category_buttons_kb(category.key, category_buttons)),
+        (lambda: kb.helper2_item_order_kb(category.key, item.key), lambda: plain(kb.helper2_item_order_kb)(category.key, item.key)),
+        (kb.orders_menu_kb, plain(kb.orders_menu_kb)),
+        (kb.contact_menu_kb, plain(kb.contact_menu_kb)),
+        (kb.trust_kb, plain(kb.trust_kb)),
+        (lambda: kb.helper_confirm_kb(1, 2), lambda: plain(kb.helper_confirm_kb)(1, 2)),
+        (lambda: kb.admin_status_menu_kb("123456"), lambda: plain(kb.admin_status_menu_kb)("123456")),
+        (lambda: kb.admin_order_actions_kb("user", "123456"), lambda: plain(kb.admin_order_actions_kb)("user", "123456")),
+    ]
+
+    def measure(fns: List[Callable[[], Any]]) -> Tuple[float, float, float]:
+        """(us per tap, allocated blocks per tap, bytes per tap); results are kept
+        alive while tracing so every object a tap creates is counted."""
+        for fn in fns:
+            fn()
+        n = args.repeat * len(fns)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for fn in fns:
+                fn()
+        seconds = (time.perf_counter() - started) / n
+        kept: List[Any] = [None] * n
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        i = 0
+        for _ in range(args.repeat):
+            for fn in fns:
+                kept[i] = fn()
+                i += 1
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        diff = after.compare_to(before, "filename")
+        blocks = sum(stat.count_diff for stat in diff)
+        size = sum(stat.size_diff for stat in diff)
+        return seconds * 1e6, blocks / n, size / n
+
+    print(f"{len(taps)} keyboards (one per navigation tap), {args.repeat} rounds")
+    print(f"{'variant':<28}{'us/tap':>10}{'allocs/tap':>12}{'bytes/tap':>12}")
+    for label, fns in (
+        ("rebuilt each tap (before)", [uncached for _cached, uncached in taps]),
+        ("memoized (now)", [cached for cached, _uncached in taps]),
+    ):
+        us, blocks, size = measure(fns)
+        print(f"{label:<28}{us:>10.2f}{blocks:>12.1f}{size:>12.0f}")
+
+
+@benchmark(
+    "startup",
+    "init_db on a large database: schema checks on every start vs the recorded schema version (user-015)",
+    ("--orders", {"type": int, "default": 1_000_000}),
+    ("--repeat", {"type": int, "default": 5}),
+)
+async def bench_startup(args: argparse.Namespace) -> None:
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from db.database import close_db, init_db
+    from db.migrations import MIGRATIONS
+
+    url = temp_db_url()
+    await init_db(url)
+    await seed_orders(args.orders, users=10_000, chunk=50_000)
+    await close_db()
+
+    async def warm() -> None:
+        await init_db(url)
+        await close_db()
+
+    async def every_step() -> None:
+        # init_db before the schema version was recorded: the table, column,
+        # index and admin seed checks (steps 1-4) ran on every start
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda c: [step(c) for number, _d, step in MIGRATIONS if number <= 4])
+        await engine.dispose()
+        await warm()
+
+    print(f"{args.orders} orders")
+    rows = []
+    for label, fn in (("checks on every start (before)", every_step), ("warm start, schema version read (now)", warm)):
+        seconds, queries = await timed(fn, args.repeat)
+        rows.append((label, seconds, queries))
+    print_table(rows)
+
+
+@benchmark(
+    "concurrency",
+    "p50/p99 step latency of the full loadtest journey, sequential vs concurrent updates (user-017)",
+    ("--users", {"type": int, "default": 200}),
+    ("--latency-ms", {"type": float, "default": 40.0}),
+    ("--concurrency", {"type": int, "default": 32}),
+)
+async def bench_concurrency(args: argparse.Namespace) -> None:
+    from loadtest.__main__ import _percentile, build_parser, run
+
+    logging.getLogger().setLevel(logging.WARNING)  # main's basicConfig ran on import
+    print(f"{args.users} virtual users, one journey each, fake Bot API latency {args.latency_ms:g}ms")
+    print(f"{'concurrency':<14}{'journeys/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for concurrency in (1, args.concurrency):
+        load_args = build_parser().parse_args([
+            "--users", str(args.users),
+            "--latency-ms", str(args.latency_ms),
+            "--concurrency", str(concurrency),
+            "--step-timeout", "120",
+        ])
+        result = await run(load_args)
+        samples = [s for label, values in result.stats.samples.items() if label != "/start (admin)" for s in values]
+        print(
+            f"{concurrency:<14}{result.ok / result.elapsed:>12.2f}"
+            f"{_percentile(samples, 0.50) * 1000:>10.1f}{_percentile(samples, 0.99) * 1000:>10.1f}{result.failed:>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m loadtest.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    sub = parser.add_subparsers(dest="name")
+    for name, (description, arguments, _fn) in BENCHMARKS.items():
+        p = sub.add_parser(name, help=description, description=description)
+        for flag, spec in arguments:
+            p.add_argument(flag, **spec)
+    args = parser.parse_args()
+    if args.list or not args.name:
+        for name, (description, _a, _f) in BENCHMARKS.items():
+            print(f"{name:<18}{description}")
+        return
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(BENCHMARKS[args.name][2](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Local stand-in for the Telegram Bot API.
+
+Serves `<prefix><token>/<method>` as an ASGI app, so the bot can be pointed
+at it with `build_app(..., base_url=...)`. Incoming updates are queued with
+`push_update()` and handed out through long-polled getUpdates; everything
+the bot sends (messages, edits, videos) is recorded per chat so virtual
+users can wait for the bot's answer. Latency and a 429 rate can be
+injected to see how the bot behaves against a slow or throttling API.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import default as _email_policy
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+
+BOT_ID = 999000
+BOT_USERNAME = "risheh_loadtest_bot"
+
+
+@dataclass
+class Outgoing:
+    """A message the bot sent or edited in a chat."""
+
+    at: float
+    method: str
+    chat_id: int
+    text: str
+    callbacks: List[str]
+
+
+@dataclass
+class FakeApiConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Probability that a send/edit call is answered with 429 Too Many Requests
+    rate_limit_ratio: float = 0.0
+    retry_after: int = 1
+    member_status: str = "member"
+
+
+def _callbacks(markup: Any) -> List[str]:
+    if isinstance(markup, str):
+        try:
+            markup = json.loads(markup)
+        except ValueError:
+            return []
+    rows = (markup or {}).get("inline_keyboard") or []
+    return [b["callback_data"] for row in rows for b in row if b.get("callback_data")]
+
+
+def _parse_params(content_type: bytes, body: bytes) -> Dict[str, str]:
+    if content_type.startswith(b"multipart/form-data"):
+        msg = BytesParser(policy=_email_policy).parsebytes(b"Content-Type: " + content_type + b"\r\n\r\n" + body)
+        params: Dict[str, str] = {}
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name and not part.get_filename():
+                params[name] = part.get_content()
+        return params
+    if content_type.startswith(b"application/json"):
+        return {k: v if isinstance(v, str) else json.dumps(v) for k, v in json.loads(body or b"{}").items()}
+    return {k: v[-1] for k, v in parse_qs(body.decode("utf-8")).items()}
+
+
+class FakeBotApi:
+    SEND_METHODS = {"sendMessage", "editMessageText", "sendVideo", "sendDocument", "copyMessage", "editMessageReplyMarkup"}
+
+    def __init__(self, config: Optional[FakeApiConfig] = None) -> None:
+        self.config = config or FakeApiConfig()
+        self.calls: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self.outgoing: Dict[int, List[Outgoing]] = defaultdict(list)
+        self._updates: List[Dict[str, Any]] = []
+        self._update_id = 0
+        self._message_id = 0
+        self._new_update = asyncio.Event()
+        self._new_outgoing = asyncio.Condition()
+
+    # ---- driving side ----
+
+    def push_update(self, update: Dict[str, Any]) -> int:
+        self._update_id += 1
+        update["update_id"] = self._update_id
+        self._updates.append(update)
+        self._new_update.set()
+        return self._update_id
+
+    def next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    async def wait_for(self, chat_id: int, since: float, predicate: Callable[[Outgoing], bool], timeout: float) -> Outgoing:
+        """Wait until the bot sends something to `chat_id` after `since` that matches."""
+        deadline = time.perf_counter() + timeout
+
+        def _match() -> Optional[Outgoing]:
+            for out in reversed(self.outgoing.get(chat_id, ())):
+                if out.at < since:
+                    break
+                if predicate(out):
+                    return out
+            return None
+
+        async with self._new_outgoing:
+            while True:
+                found = _match()
+                if found is not None:
+                    return found
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"no matching reply in chat {chat_id}")
+                try:
+                    await asyncio.wait_for(self._new_outgoing.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+    # ---- Bot API side ----
+
+    async def _get_updates(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self._updates[:limit]
+
+    async def _record(self, method: str, params: Dict[str, str]) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id") or 0)
+        out = Outgoing(
+            at=time.perf_counter(),
+            method=method,
+            chat_id=chat_id,
+            text=params.get("text", ""),
+            callbacks=_callbacks(params.get("reply_markup")),
+        )
+        async with self._new_outgoing:
+            self.outgoing[chat_id].append(out)
+            self._new_outgoing.notify_all()
+        message: Dict[str, Any] = {
+            "message_id": int(params.get("message_id") or self.next_message_id()),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "Risheh", "username": BOT_USERNAME},
+        }
+        if method == "sendVideo":
+            message["video"] = {
+                "file_id": "loadtest-video", "file_unique_id": "loadtest-video",
+                "width": 640, "height": 360, "duration": 10,
+            }
+        elif method == "sendDocument":
+            message["document"] = {"file_id": "loadtest-document", "file_unique_id": "loadtest-document"}
+        elif out.text:
+            message["text"] = out.text
+        if method == "copyMessage":
+            return {"message_id": message["message_id"]}
+        return message
+
+    async def call(self, method: str, params: Dict[str, str]) -> tuple[int, Dict[str, Any]]:
+        self.calls[method] += 1
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": await self._get_updates(params)}
+        cfg = self.config
+        if cfg.latency_ms or cfg.jitter_ms:
+            await asyncio.sleep((cfg.latency_ms + random.uniform(0, cfg.jitter_ms)) / 1000)
+        if method in self.SEND_METHODS and cfg.rate_limit_ratio and random.random() < cfg.rate_limit_ratio:
+            self.rate_limited[method] += 1
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {cfg.retry_after}",
+                "parameters": {"retry_after": cfg.retry_after},
+            }
+        if method == "getMe":
+            result: Any = {
+                "id": BOT_ID, "is_bot": True, "first_name": "Risheh", "username": BOT_USERNAME,
+                "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False,
+            }
+        elif method == "getChatMember":
+            result = {
+                "status": cfg.member_status,
+                "user": {"id": int(params.get("user_id") or 0), "is_bot": False, "first_name": "user"},
+            }
+        elif method == "getChat":
+            result = {"id": -100123, "type": "channel", "title": "risheh"}
+        elif method in self.SEND_METHODS:
+            result = await self._record(method, params)
+        else:
+            # answerCallbackQuery, deleteWebhook, setWebhook, ...
+            result = True
+        return 200, {"ok": True, "result": result}
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        method = scope["path"].rsplit("/", 1)[-1]
+        content_type = dict(scope.get("headers") or ()).get(b"content-type", b"")
+        status, payload = await self.call(method, _parse_params(content_type, body))
+        raw = json.dumps(payload).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(raw)).encode())],
+        })
+        await send({"type": "http.response.body", "body": raw})
+
+
+@dataclass
+class ApiServer:
+    """Runs a FakeBotApi on a local port inside the current event loop."""
+
+    api: FakeBotApi
+    host: str = "127.0.0.1"
+    port: int = 8089
+    _server: Any = field(default=None, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self) -> None:
+        import uvicorn
+
+        config = uvicorn.Config(self.api, host=self.host, port=self.port, log_level="warning", access_log=False, lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._task is not None:
+            await self._task
@@ -7,12 +7,9 @@ Uses python-telegram-bot async API to provide a clean, modular flow.
 from __future__ import annotations
 
 import logging
-import os
-import os as _os
 
 from telegram.ext import (
     Application,
-    CallbackQueryHandler,
     CommandHandler,
     ConversationHandler,
     MessageHandler,
@@ -46,6 +43,17 @@ from handlers.admin import (
     admin_orders_change_page,
     admin_orders_group_selected,
     admin_orders_group_item_page,
+    admin_bulk_open,
+    admin_bulk_toggle,
+    admin_bulk_select_page,
+    admin_bulk_select_all,
+    admin_bulk_clear,
+    admin_bulk_status_menu,
+    admin_bulk_set_status,
+    admin_orders_export,
+    export_orders_command,
+    find_command,
+    find_change_page,
     open_status_menu,
     set_status,
     open_admin_users_menu,
@@ -58,6 +66,14 @@ from handlers.admin import (
 
 import asyncio
 from db.database import init_db
+from db.stats import start_stats_reconciler, stop_stats_reconciler
+from catalog import reload_catalog
+from metrics import InstrumentedRequest, instrumented, start_metrics_server, stop_metrics_server
+from notifier import start_notifier, stop_notifier
+from router import CallbackRouter
+from settings import Settings, load_env_file, publish, install_sighup_reload, remove_sighup_reload
+from update_processor import PerChatUpdateProcessor, UpdateQueue
+from webhook import run_webhook
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -84,103 +100,160 @@ async def unexpected_text(update, context):
     return MENU
 
 
-def build_app(token: str) -> Application:
-    app = Application.builder().token(token).build()
+def build_router() -> CallbackRouter:
+    """Callback routes for the MENU state, dispatched through one handler."""
+    router = CallbackRouter(fallback=invalid_callback)
+    # Main / Back
+    router.add("BACK:MAIN", back_to_main)
+    # Info section
+    router.add("NAV:TRUST", open_trust)
+    router.add("NAV:CONTACT", open_contact_menu)
+    router.add("CONTACT:SOCIALS", open_contact_socials)
+    router.add("CONTACT:WEBSITE", open_contact_website)
+    router.add("CONTACT:SUPPORT", open_contact_support)
+    router.add("NAV:ASK", open_ask)
+    # Helper section (v2)
+    router.add("NAV:HELPER", open_helper_menu)
+    router.add("HELP2:CAT:{key}", helper2_open_category)
+    router.add("HELP2:ITEM:{key}:{key}", helper2_item_selected)
+    router.add("HELP2:CONFIRM:{key}:{key}", helper2_confirm)
+    router.add("HELP2:CHECK_CHANNEL:{key}:{key}", helper2_check_channel_and_confirm)
+    router.add("HELP2:BACK:MENU", helper2_back_to_menu)
+    router.add("HELP2:REQUEST:START:WANT", helper2_request_start)
+    router.add("HELPER:CATEGORY:{int}", helper_category_selected)
+    router.add("HELPER:CATEGORY_ID:{int}", helper_category_selected)
+    router.add("HELPER:OPTION:{int}:{int}", helper_option_selected)
+    router.add("HELPER:CHECK_JOIN:{int}:{int}", helper_check_join)
+    router.add("HELPER:CONFIRM", helper_confirm)
+    router.add("HELPER:CONFIRM:{int}:{int}", helper_confirm)
+    router.add("HELPER:BACK:MENU", helper_back_to_menu)
+    router.add("HELPER:BACK:OPTIONS:{int}", helper_back_to_options)
+    # Orders section
+    router.add("NAV:ORDERS", open_orders_menu)
+    router.add("ORDERS:FILTER:{key}", orders_filter_selected)
+    router.add("ORDERS:CODE:{code}", order_code_selected)
+    router.add("ORDERS:REORDER:{code}", orders_reorder)
+    # Admin orders section
+    router.add("NAV:ADMIN_ORDERS", open_admin_orders_menu)
+    router.add("ORDERS_ADMIN:FILTER:{key}", admin_orders_filter_selected)
+    router.add("ORDERS_ADMIN:GROUP:{key}", admin_orders_group_selected)
+    router.add("ORDERS_ADMIN:GROUP_ITEM:{key}:{int}:{cursor}", admin_orders_group_item_page)
+    router.add("ORDERS_ADMIN:GROUP_ITEM_PAGE:{key}:{int}:{cursor}", admin_orders_group_item_page)
+    router.add("ORDERS_ADMIN:PAGE:{key}:{cursor}", admin_orders_change_page)
+    router.add("ORDERS_ADMIN:CODE:{code}", admin_order_code_selected)
+    router.add("ORDERS_ADMIN:CODE:{code}:{cursor}", admin_order_code_selected)
+    router.add("ORDERS_ADMIN:STATUSMENU:{code}", open_status_menu)
+    router.add("ORDERS_ADMIN:SETSTATUS:{code}:{key}", set_status)
+    # Admin bulk status changes (multi-select over a group item list)
+    router.add("ORDERS_ADMIN:BULK:{key}:{int}:{cursor}", admin_bulk_open)
+    router.add("ORDERS_ADMIN:BULK_T:{key}:{int}:{cursor}:{code}", admin_bulk_toggle)
+    router.add("ORDERS_ADMIN:BULK_PAGE:{key}:{int}:{cursor}", admin_bulk_select_page)
+    router.add("ORDERS_ADMIN:BULK_ALL:{key}:{int}:{cursor}", admin_bulk_select_all)
+    router.add("ORDERS_ADMIN:BULK_CLEAR:{key}:{int}:{cursor}", admin_bulk_clear)
+    router.add("ORDERS_ADMIN:BULK_STATUS:{key}:{int}:{cursor}", admin_bulk_status_menu)
+    router.add("ORDERS_ADMIN:BULK_SET:{key}:{int}:{cursor}:{key}", admin_bulk_set_status)
+    router.add("ORDERS_ADMIN:EXPORT:{key}:{int}:{key}", admin_orders_export)
+    router.add("FIND:PAGE:{cursor}:{float}", find_change_page)
+    # Admin users section
+    router.add("NAV:ADMIN_USERS", open_admin_users_menu)
+    router.add("ADMIN_USERS:OPEN", admin_users_open)
+    router.add("ADMIN_USERS:PAGE:{cursor}", admin_users_change_page)
+    router.add("ADMIN_USERS:USER:{int}:{cursor}", admin_user_selected)
+    router.add("ADMIN_USERS:SET_ROLE:{int}:{role}:{cursor}", admin_set_user_role)
+    return router
+
+
+async def _post_init(app: Application) -> None:
+    await start_notifier(app)
+    await start_metrics_server(app)
+    await start_stats_reconciler(app)
+    # Registered on the running loop, so reloads never interrupt a handler mid-step
+    install_sighup_reload(app.bot_data, reload_catalog)
+
+
+async def _post_stop(app: Application) -> None:
+    # Drain notifications while the bot can still send (post_shutdown runs after Bot.shutdown)
+    await stop_notifier(app)
+
+
+async def _post_shutdown(app: Application) -> None:
+    remove_sighup_reload()
+    await stop_stats_reconciler(app)
+    await stop_metrics_server(app)
+    # No-op unless post_stop was skipped (the app never started)
+    await stop_notifier(app)
+
+
+def build_app(
+    token: str,
+    webhook: bool = False,
+    update_queue_size: int = Settings.update_queue_size,
+    max_concurrent_updates: int = Settings.max_concurrent_updates,
+    base_url: str | None = None,
+) -> Application:
+    """Build the application; `webhook` drops the polling updater (see webhook.py)."""
+    builder = (
+        Application.builder()
+        .token(token)
+        .post_init(_post_init)
+        .post_stop(_post_stop)
+        .post_shutdown(_post_shutdown)
+        # Times Telegram API calls per update (metrics.py)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .update_queue(UpdateQueue(maxsize=update_queue_size))
+        # Parallel across chats, ordered within a chat
+        .concurrent_updates(PerChatUpdateProcessor(max_concurrent_updates))
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if webhook:
+        builder = builder.updater(None)
+    app = builder.build()
 
     conv = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+        entry_points=[CommandHandler("start", instrumented("/start", start))],
         states={
             MENU: [
-                # Main / Back
-                CallbackQueryHandler(back_to_main, pattern=r"^BACK:MAIN$"),
-                # Info section
-                CallbackQueryHandler(open_trust, pattern=r"^NAV:TRUST$"),
-                CallbackQueryHandler(open_contact_menu, pattern=r"^NAV:CONTACT$"),
-                CallbackQueryHandler(open_contact_socials, pattern=r"^CONTACT:SOCIALS$"),
-                CallbackQueryHandler(open_contact_website, pattern=r"^CONTACT:WEBSITE$"),
-                CallbackQueryHandler(open_contact_support, pattern=r"^CONTACT:SUPPORT$"),
-                CallbackQueryHandler(open_ask, pattern=r"^NAV:ASK$"),
-                # Helper section (v2)
-                CallbackQueryHandler(open_helper_menu, pattern=r"^NAV:HELPER$"),
-                CallbackQueryHandler(helper2_open_category, pattern=r"^HELP2:CAT:[A-Z_]+$"),
-                CallbackQueryHandler(helper2_item_selected, pattern=r"^HELP2:ITEM:[A-Z_]+:[A-Z_]+$"),
-                CallbackQueryHandler(helper2_confirm, pattern=r"^HELP2:CONFIRM:[A-Z_]+:[A-Z_]+$"),
-                CallbackQueryHandler(helper2_check_channel_and_confirm, pattern=r"^HELP2:CHECK_CHANNEL:[A-Z_]+:[A-Z_]+$"),
-                CallbackQueryHandler(helper2_back_to_menu, pattern=r"^HELP2:BACK:MENU$"),
-                CallbackQueryHandler(helper2_request_start, pattern=r"^HELP2:REQUEST:START:WANT$"),
-                CallbackQueryHandler(helper_category_selected, pattern=r"^(HELPER:CATEGORY|HELPER:CATEGORY_ID):.*"),
-                CallbackQueryHandler(helper_option_selected, pattern=r"^HELPER:OPTION:.*"),
-                CallbackQueryHandler(helper_check_join, pattern=r"^HELPER:CHECK_JOIN:\d+:\d+$"),
-                CallbackQueryHandler(helper_confirm, pattern=r"^HELPER:CONFIRM:.*"),
-                CallbackQueryHandler(helper_back_to_menu, pattern=r"^HELPER:BACK:MENU$"),
-                CallbackQueryHandler(helper_back_to_options, pattern=r"^HELPER:BACK:OPTIONS:.*"),
+                # All callback buttons (unknown data falls back to invalid_callback)
+                build_router().handler(),
                 # Capture custom free-form requests first (text/voice/video)
-                MessageHandler((filters.TEXT & ~filters.COMMAND) | filters.VOICE | filters.VIDEO, handle_custom_request),
+                MessageHandler((filters.TEXT & ~filters.COMMAND) | filters.VOICE | filters.VIDEO, instrumented("custom_request", handle_custom_request)),
                 # Optional phone capture by text when requested
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_phone_text),
-                # Orders section
-                CallbackQueryHandler(open_orders_menu, pattern=r"^NAV:ORDERS$"),
-                CallbackQueryHandler(orders_filter_selected, pattern=r"^ORDERS:FILTER:.*"),
-                CallbackQueryHandler(order_code_selected, pattern=r"^ORDERS:CODE:\d{6}$"),
-                CallbackQueryHandler(orders_reorder, pattern=r"^ORDERS:REORDER:\d{6}$"),
-                # Admin orders section
-                CallbackQueryHandler(open_admin_orders_menu, pattern=r"^NAV:ADMIN_ORDERS$"),
-                CallbackQueryHandler(admin_orders_filter_selected, pattern=r"^ORDERS_ADMIN:FILTER:.*"),
-                # New grouped admin flows
-                CallbackQueryHandler(admin_orders_group_selected, pattern=r"^ORDERS_ADMIN:GROUP:[A-Z_]+$"),
-                CallbackQueryHandler(admin_orders_group_item_page, pattern=r"^ORDERS_ADMIN:GROUP_ITEM:[A-Z_]+:\d+:\d+$"),
-                CallbackQueryHandler(admin_orders_change_page, pattern=r"^ORDERS_ADMIN:GROUP_ITEM_PAGE:[A-Z_]+:\d+:\d+$"),
-                CallbackQueryHandler(admin_orders_change_page, pattern=r"^ORDERS_ADMIN:PAGE:[A-Z_]+:\d+$"),
-                CallbackQueryHandler(admin_order_code_selected, pattern=r"^ORDERS_ADMIN:CODE:\d{6}$"),
-                CallbackQueryHandler(open_status_menu, pattern=r"^ORDERS_ADMIN:STATUSMENU:\d{6}$"),
-                CallbackQueryHandler(set_status, pattern=r"^ORDERS_ADMIN:SETSTATUS:\d{6}:[A-Z_]+$"),
-                CallbackQueryHandler(admin_order_code_selected, pattern=r"^ORDERS_ADMIN:CODE:\d{6}:\d+$"),
-                # Admin users section
-                CallbackQueryHandler(open_admin_users_menu, pattern=r"^NAV:ADMIN_USERS$"),
-                CallbackQueryHandler(admin_users_open, pattern=r"^ADMIN_USERS:OPEN$"),
-                CallbackQueryHandler(admin_users_change_page, pattern=r"^ADMIN_USERS:PAGE:\d+$"),
-                CallbackQueryHandler(admin_user_selected, pattern=r"^ADMIN_USERS:USER:\d+:\d+$"),
-                CallbackQueryHandler(admin_set_user_role, pattern=r"^ADMIN_USERS:SET_ROLE:\d+:(1|2):\d+$"),
-                # Fallback last
-                CallbackQueryHandler(invalid_callback),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, instrumented("phone_text", handle_phone_text)),
             ]
         },
-        fallbacks=[MessageHandler(filters.TEXT & ~filters.COMMAND, unexpected_text)],
+        fallbacks=[MessageHandler(filters.TEXT & ~filters.COMMAND, instrumented("unexpected_text", unexpected_text))],
         allow_reentry=True,
     )
 
     app.add_handler(conv)
+    # Admin order export and search; work from any conversation state
+    app.add_handler(CommandHandler("export", instrumented("/export", export_orders_command)))
+    app.add_handler(CommandHandler("find", instrumented("/find", find_command)))
     return app
 
 
 def main() -> None:
-    def _load_env_file():
-        p = _os.path.join(_os.getcwd(), ".env")
-        if _os.path.isfile(p):
-            try:
-                with open(p, "r", encoding="utf-8") as f:
-                    for line in f:
-                        s = line.strip()
-                        if not s or s.startswith("#") or "=" not in s:
-                            continue
-                        k, v = s.split("=", 1)
-                        k = k.strip()
-                        v = v.strip().strip('"').strip("'")
-                        if k:
-                            _os.environ[k] = v
-            except Exception:
-                pass
-
-    _load_env_file()
-    token = os.getenv("BOT_TOKEN")
-    if not token:
+    load_env_file()
+    settings = Settings.from_env()
+    if not settings.bot_token:
         raise RuntimeError("BOT_TOKEN env variable is required")
-    db_url = os.getenv("DB_URL", "sqlite+aiosqlite:///./data/app.db")
-    asyncio.run(init_db(db_url))
-    app = build_app(token)
-    logger.info("Bot is starting...")
-    app.run_polling()
-
+    reload_catalog()
+    asyncio.run(init_db(settings.db_url, settings))
+    webhook = settings.bot_mode == "webhook"
+    app = build_app(
+        settings.bot_token,
+        webhook=webhook,
+        update_queue_size=settings.update_queue_size,
+        max_concurrent_updates=settings.max_concurrent_updates,
+        base_url=settings.bot_api_url,
+    )
+    publish(app.bot_data, settings)
+    logger.info("Bot is starting (%s)...", settings.bot_mode)
+    if webhook:
+        run_webhook(app, settings)
+    else:
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
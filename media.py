@@ -0,0 +1,113 @@
+"""
+Registry of static media assets in `files/`.
+
+Each asset is uploaded to Telegram once; the returned file_id is stored
+in the `media_assets` table keyed by the file's SHA-256, and later sends
+reuse it. Editing a file changes its hash, which triggers a re-upload.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.error import BadRequest
+
+from db.database import get_session, new_session
+from db.crud import get_media_file_id, save_media_file_id
+
+
+logger = logging.getLogger(__name__)
+
+FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files")
+
+# name -> ((mtime_ns, size), sha256)
+_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+# sha256 -> file_id
+_file_ids: Dict[str, str] = {}
+_upload_locks: Dict[str, asyncio.Lock] = {}
+
+
+def asset_path(name: str) -> str:
+    return os.path.join(FILES_DIR, name)
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+async def _asset_hash(name: str) -> Optional[str]:
+    path = asset_path(name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _hashes.get(name)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    digest = await asyncio.to_thread(_hash_file, path)
+    _hashes[name] = (stamp, digest)
+    return digest
+
+
+async def _lookup_file_id(sha: str) -> Optional[str]:
+    file_id = _file_ids.get(sha)
+    if file_id:
+        return file_id
+    try:
+        async with get_session() as session:
+            file_id = await get_media_file_id(session, sha)
+    except Exception:
+        file_id = None
+    if file_id:
+        _file_ids[sha] = file_id
+    return file_id
+
+
+async def _remember(sha: str, name: str, file_id: str) -> None:
+    _file_ids[sha] = file_id
+    try:
+        # Own transaction: the upload happened even if the update later fails
+        async with new_session() as session:
+            await save_media_file_id(session, sha, name, file_id)
+            await session.commit()
+    except Exception as e:
+        logger.warning("Could not persist file_id for %s: %s", name, e)
+
+
+async def reply_video(message: Any, name: str, **kwargs: Any) -> bool:
+    """Reply with the video asset `name`, uploading it only if no file_id is known."""
+    sha = await _asset_hash(name)
+    if sha is None:
+        return False
+    file_id = await _lookup_file_id(sha)
+    if file_id:
+        try:
+            await message.reply_video(video=file_id, **kwargs)
+            return True
+        except BadRequest as e:
+            # file_id no longer valid (e.g. bot token changed): drop it and re-upload
+            logger.info("Stale file_id for %s (%s), re-uploading", name, e)
+            if _file_ids.get(sha) == file_id:
+                _file_ids.pop(sha, None)
+    # Only one concurrent upload per asset; others wait and reuse its file_id
+    lock = _upload_locks.setdefault(sha, asyncio.Lock())
+    async with lock:
+        fresh = _file_ids.get(sha)
+        if fresh and fresh != file_id:
+            await message.reply_video(video=fresh, **kwargs)
+            return True
+        with open(asset_path(name), "rb") as vf:
+            sent = await message.reply_video(video=vf, **kwargs)
+        video = getattr(sent, "video", None) or getattr(sent, "animation", None) or getattr(sent, "document", None)
+        if video is not None and getattr(video, "file_id", None):
+            await _remember(sha, name, video.file_id)
+        return True
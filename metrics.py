@@ -0,0 +1,237 @@
+"""
+Per-update latency and query instrumentation with a Prometheus endpoint.
+
+Every update is timed by the update processor (`track_update`). While it
+runs, SQLAlchemy cursor events add to its DB time and query count and the
+bot's HTTP requests (`InstrumentedRequest`) add to its Telegram API time.
+Updates are labelled by the callback route template (set by the router)
+or by the message handler that took them. Histograms are served in the
+Prometheus text format on METRICS_LISTEN:METRICS_PORT (disabled when the
+port is 0). Updates that run more than QUERY_WARN_THRESHOLD queries are
+logged, which is how N+1 patterns show up; with QUERY_BUDGET_STRICT (used
+by the load test) the query past the threshold raises QueryBudgetExceeded
+instead, failing the handler.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from telegram.request import HTTPXRequest
+
+from settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        # label -> [per-bucket counts..., sum, count]
+        self._series: Dict[str, List[float]] = {}
+
+    def observe(self, label: str, value: float) -> None:
+        series = self._series.get(label)
+        if series is None:
+            series = self._series[label] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, series in sorted(self._series.items()):
+            lv = _escape(label)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{handler="{lv}",le="{bound:g}"}} {count:g}')
+            lines.append(f'{self.name}_bucket{{handler="{lv}",le="+Inf"}} {series[-1]:g}')
+            lines.append(f'{self.name}_sum{{handler="{lv}"}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{handler="{lv}"}} {series[-1]:g}')
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+UPDATE_SECONDS = Histogram("bot_update_duration_seconds", "Wall time per update.", TIME_BUCKETS)
+DB_SECONDS = Histogram("bot_update_db_seconds", "Time spent in DB queries per update.", TIME_BUCKETS)
+API_SECONDS = Histogram("bot_update_api_seconds", "Time spent in Telegram API calls per update.", TIME_BUCKETS)
+QUERIES = Histogram("bot_update_queries", "DB queries per update.", QUERY_BUCKETS)
+HISTOGRAMS = (UPDATE_SECONDS, DB_SECONDS, API_SECONDS, QUERIES)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class UpdateMetrics:
+    label: str = "other"
+    db_seconds: float = 0.0
+    api_seconds: float = 0.0
+    queries: int = 0
+    # Raise instead of warning once `queries` would pass this (0 = off)
+    query_budget: int = 0
+
+
+# Updates that exceeded the strict query budget, by label
+BUDGET_EXCEEDED: Counter[str] = Counter()
+
+
+_current: ContextVar[Optional[UpdateMetrics]] = ContextVar("update_metrics", default=None)
+
+
+def set_update_label(label: str) -> None:
+    m = _current.get()
+    if m is not None:
+        m.label = label
+
+
+def _default_label(update: Any) -> str:
+    if getattr(update, "callback_query", None) is not None:
+        return "callback"
+    if getattr(update, "message", None) is not None:
+        return "message"
+    return "other"
+
+
+@asynccontextmanager
+async def track_update(update: Any) -> AsyncIterator[UpdateMetrics]:
+    settings = get_settings()
+    m = UpdateMetrics(
+        label=_default_label(update),
+        query_budget=settings.query_warn_threshold if settings.query_budget_strict else 0,
+    )
+    token = _current.set(m)
+    started = time.perf_counter()
+    try:
+        yield m
+    finally:
+        _current.reset(token)
+        elapsed = time.perf_counter() - started
+        UPDATE_SECONDS.observe(m.label, elapsed)
+        DB_SECONDS.observe(m.label, m.db_seconds)
+        API_SECONDS.observe(m.label, m.api_seconds)
+        QUERIES.observe(m.label, m.queries)
+        threshold = settings.query_warn_threshold
+        if threshold and m.queries > threshold:
+            logger.warning(
+                "Update %s ran %s queries (threshold %s) in %.0f ms (db %.0f ms, api %.0f ms)",
+                m.label, m.queries, threshold, elapsed * 1000, m.db_seconds * 1000, m.api_seconds * 1000,
+            )
+
+
+def instrumented(label: str, handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Wrap a message/command handler so its updates are labelled `label`."""
+
+    @functools.wraps(handler)
+    async def _wrapped(update: Any, context: Any) -> Any:
+        set_update_label(label)
+        return await handler(update, context)
+
+    return _wrapped
+
+
+# ---- DB time: cursor events on every engine ----
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    m = _current.get()
+    if m is not None:
+        if m.query_budget and m.queries >= m.query_budget:
+            BUDGET_EXCEEDED[m.label] += 1
+            raise QueryBudgetExceeded(f"{m.label} exceeded its budget of {m.query_budget} queries")
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    m = _current.get()
+    stack = conn.info.get("metrics_started")
+    if m is None or not stack:
+        return
+    m.db_seconds += time.perf_counter() - stack.pop()
+    m.queries += 1
+
+
+# ---- Telegram API time ----
+
+class InstrumentedRequest(HTTPXRequest):
+    async def do_request(self, *args: Any, **kwargs: Any) -> Tuple[int, bytes]:
+        m = _current.get()
+        if m is None:
+            return await super().do_request(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().do_request(*args, **kwargs)
+        finally:
+            m.api_seconds += time.perf_counter() - started
+
+
+# ---- /metrics endpoint ----
+
+def render() -> bytes:
+    lines: List[str] = []
+    for h in HISTOGRAMS:
+        lines.extend(h.render())
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Drain headers; the body (if any) is ignored
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, ctype, body = "200 OK", "text/plain; version=0.0.4", render()
+        else:
+            status, ctype, body = "404 Not Found", "text/plain", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+
+_server_key = "metrics_server"
+
+
+async def start_metrics_server(app: Any) -> None:
+    settings = get_settings(app)
+    if not settings.metrics_port:
+        return
+    server = await asyncio.start_server(_serve, settings.metrics_listen, settings.metrics_port)
+    app.bot_data[_server_key] = server
+    logger.info("Metrics on http://%s:%s/metrics", settings.metrics_listen, settings.metrics_port)
+
+
+async def stop_metrics_server(app: Any) -> None:
+    server = app.bot_data.pop(_server_key, None)
+    if server is not None:
+        server.close()
+        await server.wait_closed()
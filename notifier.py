@@ -0,0 +1,245 @@
+"""
+Background, rate-limited fan-out of outgoing Telegram messages.
+
+Handlers enqueue sends (admin alerts, status-change notices, copied
+custom requests) and return immediately; a small pool of worker tasks
+delivers them concurrently while respecting Telegram's flood limits
+(~30 msgs/s overall, ~1 msg/s per chat) and retrying 429 RetryAfter.
+On shutdown the queue is drained for as long as those limits need to
+deliver what is pending (capped by NOTIFY_DRAIN_TIMEOUT); anything still
+undelivered is logged with its chat ids.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from settings import Settings, get_settings
+
+
+logger = logging.getLogger(__name__)
+
+BOT_DATA_KEY = "notifier"
+
+SendFactory = Callable[[Any], Awaitable[Any]]
+
+
+class _TokenBucket:
+    """Global limiter: at most `rate` acquisitions per second, bursting to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class _Job:
+    chat_id: int
+    send: SendFactory
+    fallback: Optional[SendFactory] = None
+    attempt: int = 0
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        bot: Any,
+        workers: int = 8,
+        global_rate: float = 30.0,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 5,
+        max_queue: int = 10000,
+        max_drain: float = 60.0,
+    ) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.global_rate = global_rate
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.max_drain = max_drain
+        self._bucket = _TokenBucket(global_rate)
+        self._queue: asyncio.Queue[_Job] = asyncio.Queue(maxsize=max_queue)
+        self._next_slot: Dict[int, float] = {}
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._tasks: list[asyncio.Task] = []
+        # chat id -> queued or in-flight sends
+        self._pending: Counter[int] = Counter()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"notifier-{i}"))
+
+    def drain_estimate(self) -> float:
+        """Seconds the rate limits need to deliver everything pending (ignoring 429s)."""
+        total = sum(self._pending.values())
+        if not total:
+            return 0.0
+        now = time.monotonic()
+        per_chat = max(
+            max(0.0, self._next_slot.get(chat_id, 0.0) - now) + (n - 1) * self.per_chat_interval
+            for chat_id, n in self._pending.items()
+        )
+        return max(per_chat, total / self.global_rate)
+
+    async def stop(self, drain_timeout: float | None = None) -> None:
+        """Deliver what is queued, then stop the workers.
+
+        By default waits as long as the per-chat and global limits need
+        (plus a second of slack), at most `max_drain` seconds.
+        """
+        if drain_timeout is None:
+            drain_timeout = min(self.max_drain, self.drain_estimate() + 1.0)
+        if self._pending:
+            logger.info("Draining %s pending notifications (up to %.1fs)", sum(self._pending.values()), drain_timeout)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            dropped = sorted(c for c, n in self._pending.items() if n > 0)
+            logger.warning(
+                "Notifier stopped with %s pending sends; dropped for chats: %s",
+                sum(self._pending.values()), ", ".join(map(str, dropped)),
+            )
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, chat_id: int, send: SendFactory, fallback: Optional[SendFactory] = None) -> bool:
+        """Queue a send; `send`/`fallback` receive the bot and return the API coroutine."""
+        try:
+            self._queue.put_nowait(_Job(int(chat_id), send, fallback))
+            self._pending[int(chat_id)] += 1
+            return True
+        except asyncio.QueueFull:
+            logger.warning("Notifier queue full, dropping send to chat=%s", chat_id)
+            return False
+
+    def send_message(self, chat_id: int, text: str, **kwargs: Any) -> bool:
+        return self.submit(chat_id, lambda bot: bot.send_message(chat_id=chat_id, text=text, **kwargs))
+
+    async def _wait_chat_slot(self, chat_id: int) -> None:
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            slot = self._next_slot.get(chat_id, 0.0)
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            self._next_slot[chat_id] = max(slot, now) + self.per_chat_interval
+        if len(self._next_slot) > 4096:
+            cutoff = time.monotonic()
+            for cid in [c for c, t in self._next_slot.items() if t < cutoff]:
+                self._next_slot.pop(cid, None)
+                lk = self._chat_locks.get(cid)
+                if lk is not None and not lk.locked():
+                    self._chat_locks.pop(cid, None)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._deliver(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Notifier send to chat=%s failed: %s", job.chat_id, e)
+            finally:
+                self._pending[job.chat_id] -= 1
+                if self._pending[job.chat_id] <= 0:
+                    del self._pending[job.chat_id]
+                self._queue.task_done()
+
+    async def _deliver(self, job: _Job) -> None:
+        send = job.send
+        while True:
+            await self._bucket.acquire()
+            await self._wait_chat_slot(job.chat_id)
+            try:
+                await send(self.bot)
+                return
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+            except (TimedOut, NetworkError):
+                delay = min(30.0, 0.5 * (2 ** job.attempt))
+            except Exception:
+                if send is not job.fallback and job.fallback is not None:
+                    send = job.fallback
+                    continue
+                raise
+            job.attempt += 1
+            if job.attempt > self.max_retries:
+                logger.warning("Notifier giving up on chat=%s after %s attempts", job.chat_id, job.attempt)
+                return
+            self._next_slot[job.chat_id] = time.monotonic() + delay
+            await asyncio.sleep(delay)
+
+
+def from_settings(bot: Any, settings: Settings) -> NotificationDispatcher:
+    return NotificationDispatcher(
+        bot,
+        workers=settings.notify_workers,
+        global_rate=settings.notify_global_rate,
+        per_chat_interval=settings.notify_per_chat_interval,
+        max_drain=settings.notify_drain_timeout,
+    )
+
+
+def get_notifier(context: Any) -> Optional[NotificationDispatcher]:
+    bot_data = getattr(context, "bot_data", None)
+    if bot_data is None:
+        return None
+    return bot_data.get(BOT_DATA_KEY)
+
+
+async def start_notifier(app: Any) -> None:
+    """Application.post_init hook."""
+    dispatcher = from_settings(app.bot, get_settings(app))
+    dispatcher.start()
+    app.bot_data[BOT_DATA_KEY] = dispatcher
+
+
+async def stop_notifier(app: Any) -> None:
+    """Application.post_stop hook; the drain needs the bot, which post_shutdown has already closed."""
+    dispatcher = app.bot_data.pop(BOT_DATA_KEY, None)
+    if dispatcher is not None:
+        await dispatcher.stop()
+
+
+async def notify(context: Any, chat_id: int, send: SendFactory, fallback: Optional[SendFactory] = None) -> None:
+    """Queue a send through the dispatcher, or send inline when none is running."""
+    dispatcher = get_notifier(context)
+    if dispatcher is not None:
+        dispatcher.submit(chat_id, send, fallback)
+        return
+    try:
+        await send(context.bot)
+    except Exception:
+        if fallback is None:
+            return
+        try:
+            await fallback(context.bot)
+        except Exception:
+            pass
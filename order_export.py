@@ -0,0 +1,175 @@
+"""
+Streaming order export (CSV or XLSX) sent to admins as a Telegram document.
+
+Orders are read in keyset chunks of EXPORT_CHUNK rows, each in its own
+short transaction, so an export never holds a long read lock (SQLite
+writers keep going) and memory stays at about two chunks whatever the
+table size. Rows are formatted and written to a temp file in a worker
+thread while the next chunk is fetched. CSV larger than Telegram's
+document limit is gzipped; XLSX needs openpyxl (write-only mode).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from db.crud import get_order_export_chunk
+from db.database import new_session
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK = 2000
+# Bots may upload documents up to 50 MB
+TELEGRAM_DOCUMENT_LIMIT = 50 * 1024 * 1024
+XLSX_MAX_ROWS = 1_048_576
+FORMATS = ("CSV", "XLSX")
+
+HEADERS = ("کد پیگیری", "وضعیت", "دسته", "آیتم", "تاریخ ثبت", "تاریخ انجام", "نام کامل", "نام‌کاربری", "موبایل")
+
+# Exports are I/O and CPU heavy; run them one at a time
+_export_slot = asyncio.Semaphore(1)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return "" if value is None else value
+
+
+class _CsvSink:
+    suffix = ".csv"
+
+    def __init__(self, path: str) -> None:
+        # BOM so spreadsheet apps detect UTF-8 (Persian text)
+        self._f = open(path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._f)
+        self._writer.writerow(HEADERS)
+
+    def write(self, rows: Sequence[tuple]) -> None:
+        self._writer.writerows([_csv_value(v) for v in row[1:]] for row in rows)
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class _XlsxSink:
+    suffix = ".xlsx"
+
+    def __init__(self, path: str) -> None:
+        try:
+            from openpyxl import Workbook
+        except ImportError as e:
+            raise RuntimeError("XLSX export requires openpyxl (pip install openpyxl)") from e
+        self._path = path
+        # write_only streams rows to disk instead of building the sheet in memory
+        self._wb = Workbook(write_only=True)
+        self._sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self) -> None:
+        self._sheets += 1
+        self._ws = self._wb.create_sheet(f"orders{self._sheets if self._sheets > 1 else ''}")
+        self._ws.append(HEADERS)
+        self._rows = 1
+
+    def write(self, rows: Sequence[tuple]) -> None:
+        for row in rows:
+            if self._rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            self._ws.append(list(row[1:]))
+            self._rows += 1
+
+    def close(self) -> None:
+        self._wb.save(self._path)
+
+
+_SINKS = {"CSV": _CsvSink, "XLSX": _XlsxSink}
+
+
+async def write_export(
+    path: str, fmt: str, statuses: Optional[List[str]] = None, item_title: Optional[str] = None
+) -> int:
+    """Write every matching order to `path`; returns the number of rows."""
+    sink = await asyncio.to_thread(_SINKS[fmt], path)
+    total = 0
+    after_id = 0
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            async with new_session() as session:
+                rows = await get_order_export_chunk(session, after_id, EXPORT_CHUNK, statuses, item_title)
+            # Overlap: the previous chunk is written while this one was fetched
+            if pending is not None:
+                await pending
+                pending = None
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            total += len(rows)
+            pending = asyncio.ensure_future(asyncio.to_thread(sink.write, rows))
+            if len(rows) < EXPORT_CHUNK:
+                break
+        if pending is not None:
+            await pending
+            pending = None
+    finally:
+        if pending is not None:
+            # A chunk fetch failed mid-write: let the write finish before closing
+            await asyncio.gather(pending, return_exceptions=True)
+        await asyncio.to_thread(sink.close)
+    return total
+
+
+def _gzip_file(src: str, dst: str) -> None:
+    with open(src, "rb") as fin, gzip.open(dst, "wb") as fout:
+        shutil.copyfileobj(fin, fout, 1 << 20)
+
+
+async def send_order_export(
+    bot: Any,
+    chat_id: int,
+    fmt: str,
+    statuses: Optional[List[str]] = None,
+    item_title: Optional[str] = None,
+    title: str = "orders",
+) -> None:
+    """Build the export in a temp dir and send it to `chat_id` (meant to run as a background task)."""
+    fmt = fmt.upper()
+    async with _export_slot:
+        with tempfile.TemporaryDirectory(prefix="risheh-export-") as tmp:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M")
+            filename = f"{title}-{stamp}{_SINKS[fmt].suffix}"
+            path = os.path.join(tmp, filename)
+            try:
+                count = await write_export(path, fmt, statuses, item_title)
+            except Exception:
+                logger.exception("Order export failed")
+                await bot.send_message(chat_id=chat_id, text="ساخت فایل خروجی ناموفق بود. لطفاً دوباره تلاش کنید.")
+                return
+            if count == 0:
+                await bot.send_message(chat_id=chat_id, text="سفارشی برای خروجی وجود ندارد.")
+                return
+            if fmt == "CSV" and os.path.getsize(path) > TELEGRAM_DOCUMENT_LIMIT:
+                await asyncio.to_thread(_gzip_file, path, path + ".gz")
+                path, filename = path + ".gz", filename + ".gz"
+            if os.path.getsize(path) > TELEGRAM_DOCUMENT_LIMIT:
+                await bot.send_message(chat_id=chat_id, text="فایل خروجی از حد مجاز تلگرام (۵۰ مگابایت) بزرگ‌تر است؛ فیلتر محدودتری انتخاب کنید.")
+                return
+            with open(path, "rb") as f:
+                await bot.send_document(
+                    chat_id=chat_id,
+                    document=f,
+                    filename=filename,
+                    caption=f"خروجی {count} سفارش",
+                    read_timeout=120,
+                    write_timeout=120,
+                )
@@ -0,0 +1,144 @@
+"""
+Prefix-trie dispatcher for colon-delimited callback data.
+
+Instead of registering one regex CallbackQueryHandler per button and
+letting PTB test them in order, routes are declared as templates such as
+"HELP2:ITEM:{key}:{key}" and stored in a trie keyed by their literal
+segments. An update is split on ':' once, walked down the trie and its
+remaining segments are validated/converted by the route's argument
+types. The typed arguments are exposed to handlers as `context.args`.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+
+from metrics import set_update_label
+
+
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[Any]]
+
+# Argument types usable in route templates: name -> (regex, converter)
+ARG_TYPES: Dict[str, Tuple[re.Pattern, Callable[[str], Any]]] = {
+    "key": (re.compile(r"[A-Z_]+"), str),
+    "int": (re.compile(r"\d+"), int),
+    "code": (re.compile(r"\d{6}"), str),
+    "cursor": (re.compile(r"[ab]?\d+"), str),
+    "float": (re.compile(r"-?\d+(?:\.\d+)?(?:e[-+]?\d+)?"), float),
+    "role": (re.compile(r"[12]"), int),
+    "str": (re.compile(r".*"), str),
+}
+# "{*}" swallows everything after the prefix (like a trailing ".*" regex)
+REST = "*"
+
+
+@dataclass
+class Route:
+    template: str
+    handler: Handler
+    arg_types: List[str]
+
+    def parse(self, args: List[str]) -> Optional[List[Any]]:
+        if self.arg_types and self.arg_types[-1] == REST:
+            fixed = self.arg_types[:-1]
+            if len(args) <= len(fixed):
+                return None
+            head, tail = args[: len(fixed)], args[len(fixed):]
+            parsed = self._parse_fixed(fixed, head)
+            if parsed is None:
+                return None
+            return parsed + [":".join(tail)]
+        if len(args) != len(self.arg_types):
+            return None
+        return self._parse_fixed(self.arg_types, args)
+
+    @staticmethod
+    def _parse_fixed(types: List[str], args: List[str]) -> Optional[List[Any]]:
+        out: List[Any] = []
+        for t, raw in zip(types, args):
+            regex, conv = ARG_TYPES[t]
+            if not regex.fullmatch(raw):
+                return None
+            out.append(conv(raw))
+        return out
+
+
+@dataclass
+class _Node:
+    children: Dict[str, "_Node"] = field(default_factory=dict)
+    routes: List[Route] = field(default_factory=list)
+
+
+class CallbackRouter:
+    def __init__(self, fallback: Optional[Handler] = None) -> None:
+        self._root = _Node()
+        self.fallback = fallback
+        # In registration order (for introspection; dispatch uses the trie)
+        self.routes: List[Route] = []
+
+    def add(self, template: str, handler: Handler) -> "CallbackRouter":
+        literals: List[str] = []
+        arg_types: List[str] = []
+        for seg in template.split(":"):
+            if seg.startswith("{") and seg.endswith("}"):
+                name = seg[1:-1]
+                if name != REST and name not in ARG_TYPES:
+                    raise ValueError(f"Unknown argument type {seg!r} in route {template!r}")
+                if arg_types and arg_types[-1] == REST:
+                    raise ValueError(f"{{*}} must be last in route {template!r}")
+                arg_types.append(name)
+            elif arg_types:
+                raise ValueError(f"Literal segment after arguments in route {template!r}")
+            else:
+                literals.append(seg)
+        node = self._root
+        for lit in literals:
+            node = node.children.setdefault(lit, _Node())
+        route = Route(template, handler, arg_types)
+        node.routes.append(route)
+        self.routes.append(route)
+        return self
+
+    def resolve(self, data: str) -> Optional[Tuple[Route, List[Any]]]:
+        parts = data.split(":")
+        node = self._root
+        # Track the deepest matching nodes so shorter prefixes can still match
+        candidates: List[Tuple[_Node, int]] = []
+        for i, seg in enumerate(parts):
+            if node.routes:
+                candidates.append((node, i))
+            child = node.children.get(seg)
+            if child is None:
+                break
+            node = child
+        else:
+            candidates.append((node, len(parts)))
+        for cand, depth in reversed(candidates):
+            rest = parts[depth:]
+            for route in cand.routes:
+                args = route.parse(rest)
+                if args is not None:
+                    return route, args
+        return None
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Any:
+        query = update.callback_query
+        data = (query.data if query else None) or ""
+        match = self.resolve(data)
+        if match is None:
+            set_update_label("callback:unknown")
+            if self.fallback is None:
+                return None
+            return await self.fallback(update, context)
+        route, args = match
+        set_update_label(route.template)
+        context.args = args
+        return await route.handler(update, context)
+
+    def handler(self) -> CallbackQueryHandler:
+        return CallbackQueryHandler(self.dispatch)
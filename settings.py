@@ -0,0 +1,250 @@
+"""
+Typed, immutable runtime settings.
+
+Built once in main.py from `.env` and the process environment and shared
+with handlers through `Application.bot_data["settings"]`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Mapping, Optional
+
+
+logger = logging.getLogger(__name__)
+
+BOT_DATA_KEY = "settings"
+
+
+def load_env_file(path: Optional[str] = None) -> None:
+    """Load KEY=VALUE pairs from a .env file into os.environ (if present)."""
+    p = path or os.path.join(os.getcwd(), ".env")
+    if not os.path.isfile(p):
+        return
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                s = line.strip()
+                if not s or s.startswith("#") or "=" not in s:
+                    continue
+                k, v = s.split("=", 1)
+                k = k.strip()
+                v = v.strip().strip('"').strip("'")
+                if k:
+                    os.environ[k] = v
+    except Exception:
+        pass
+
+
+def _parse_ids(raw: str) -> frozenset[int]:
+    return frozenset(int(x) for x in raw.split(",") if x.strip().isdigit())
+
+
+def _parse_bool(raw: str | None) -> bool:
+    return (raw or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    bot_token: str | None = None
+    db_url: str = "sqlite+aiosqlite:///./data/app.db"
+    admin_telegram_ids: frozenset[int] = field(default_factory=frozenset)
+    # Resolved channel reference (@username takes priority over numeric id)
+    mandatory_channel_id: str | None = None
+    mandatory_channel_url: str | None = None
+    debug_join_check: bool = False
+    telegram_channel_url: str = "https://t.me/+wq00h6LuLBsyOWJk"
+    instagram_url: str = "https://instagram.com/risheh.life"
+    youtube_url: str = "https://youtube.com/@risheh"
+    linkedin_url: str = "https://www.linkedin.com/company/rishehstory"
+    website_url: str = "https://risheh.net"
+    # Bot API endpoint prefix (self-hosted Bot API server, or loadtest's fake one)
+    bot_api_url: str | None = None
+    # "polling" (default) or "webhook"; see webhook.py
+    bot_mode: str = "polling"
+    webhook_url: str | None = None
+    webhook_listen: str = "127.0.0.1"
+    webhook_port: int = 8080
+    webhook_path: str = "/telegram"
+    webhook_secret: str | None = None
+    # Cap on pending updates, queued or in flight (backpressure for polling,
+    # 503 for webhook), and the worker pool
+    update_queue_size: int = 1000
+    max_concurrent_updates: int = 32
+    # Prometheus /metrics endpoint (0 disables it) and the per-update query count worth a warning
+    metrics_listen: str = "127.0.0.1"
+    metrics_port: int = 0
+    query_warn_threshold: int = 20
+    # Fail (raise) instead of warn past the threshold; meant for test runs
+    query_budget_strict: bool = False
+    # Per-process user/role cache (db/cache.py). Each worker process has its
+    # own copy and only sees role changes made through it, so with several
+    # workers keep the TTL short: it bounds how long a stale role is served.
+    user_cache_size: int = 10000
+    user_cache_ttl: float = 300.0
+    # Database: "production" enables the SQLite WAL/pragma profile and a sized pool (db/database.py)
+    db_profile: str = "default"
+    db_pool_size: int = 8
+    db_max_overflow: int = 4
+    db_pool_timeout: float = 10.0
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    # Negative = size in KiB
+    sqlite_cache_size: int = -65536
+    # Tracking codes reserved per allocator refill (db/tracking.py)
+    tracking_code_block: int = 64
+    # Seconds between rebuilds of the order count rollups (0 disables; db/stats.py)
+    stats_reconcile_interval: float = 3600.0
+    # Channel membership cache (handlers/helper.py); negatives expire sooner
+    join_cache_size: int = 20000
+    join_cache_ttl: float = 600.0
+    join_cache_negative_ttl: float = 20.0
+    # Bounded LRU per parameterized keyboard builder (keyboards.py)
+    keyboard_cache_size: int = 1024
+    # Notification dispatcher (notifier.py)
+    notify_workers: int = 8
+    notify_global_rate: float = 30.0
+    notify_per_chat_interval: float = 1.0
+    # Upper bound on the shutdown drain of queued notifications (seconds)
+    notify_drain_timeout: float = 60.0
+    # Service catalog file; None = data/catalog.json (catalog.py)
+    catalog_path: str | None = None
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] | None = None) -> "Settings":
+        env = os.environ if env is None else env
+        join_url = env.get("MANDATORY_CHANNEL_URL") or None
+        uname = env.get("MANDATORY_CHANNEL_USERNAME") or None
+        chan_id = env.get("MANDATORY_CHANNEL_ID") or None
+        # اگر نام کاربری کانال تنظیم شده باشد، نسبت به ID اولویت دارد (برای کانال عمومی)
+        if uname:
+            if not uname.startswith("@"):
+                uname = f"@{uname}"
+            chan_id = uname
+            if not join_url:
+                join_url = f"https://t.me/{uname.lstrip('@')}"
+        return cls(
+            bot_token=env.get("BOT_TOKEN") or None,
+            db_url=env.get("DB_URL", cls.db_url),
+            admin_telegram_ids=_parse_ids(env.get("ADMIN_TELEGRAM_IDS", "")),
+            mandatory_channel_id=chan_id,
+            mandatory_channel_url=join_url,
+            debug_join_check=_parse_bool(env.get("DEBUG_JOIN_CHECK")),
+            telegram_channel_url=env.get("TELEGRAM_CHANNEL_URL", cls.telegram_channel_url),
+            instagram_url=env.get("INSTAGRAM_URL", cls.instagram_url),
+            youtube_url=env.get("YOUTUBE_URL", cls.youtube_url),
+            linkedin_url=env.get("LINKEDIN_URL", cls.linkedin_url),
+            website_url=env.get("WEBSITE_URL", cls.website_url),
+            bot_api_url=env.get("BOT_API_URL") or None,
+            bot_mode=(env.get("BOT_MODE") or cls.bot_mode).strip().lower(),
+            webhook_url=env.get("WEBHOOK_URL") or None,
+            webhook_listen=env.get("WEBHOOK_LISTEN", cls.webhook_listen),
+            webhook_port=int(env.get("WEBHOOK_PORT", cls.webhook_port)),
+            webhook_path="/" + env.get("WEBHOOK_PATH", cls.webhook_path).lstrip("/"),
+            webhook_secret=env.get("WEBHOOK_SECRET") or None,
+            update_queue_size=int(env.get("UPDATE_QUEUE_SIZE") or env.get("WEBHOOK_QUEUE_SIZE") or cls.update_queue_size),
+            max_concurrent_updates=max(1, int(env.get("MAX_CONCURRENT_UPDATES", cls.max_concurrent_updates))),
+            metrics_listen=env.get("METRICS_LISTEN", cls.metrics_listen),
+            metrics_port=int(env.get("METRICS_PORT") or cls.metrics_port),
+            query_warn_threshold=int(env.get("QUERY_WARN_THRESHOLD") or cls.query_warn_threshold),
+            query_budget_strict=_parse_bool(env.get("QUERY_BUDGET_STRICT")),
+            user_cache_size=int(env.get("USER_CACHE_SIZE") or cls.user_cache_size),
+            user_cache_ttl=float(env.get("USER_CACHE_TTL") or cls.user_cache_ttl),
+            db_profile=(env.get("DB_PROFILE") or cls.db_profile).strip().lower(),
+            db_pool_size=int(env.get("DB_POOL_SIZE") or cls.db_pool_size),
+            db_max_overflow=int(env.get("DB_MAX_OVERFLOW") or cls.db_max_overflow),
+            db_pool_timeout=float(env.get("DB_POOL_TIMEOUT") or cls.db_pool_timeout),
+            sqlite_busy_timeout_ms=int(env.get("SQLITE_BUSY_TIMEOUT_MS") or cls.sqlite_busy_timeout_ms),
+            sqlite_mmap_size=int(env.get("SQLITE_MMAP_SIZE") or cls.sqlite_mmap_size),
+            sqlite_cache_size=int(env.get("SQLITE_CACHE_SIZE") or cls.sqlite_cache_size),
+            tracking_code_block=max(1, int(env.get("TRACKING_CODE_BLOCK") or cls.tracking_code_block)),
+            stats_reconcile_interval=float(env.get("STATS_RECONCILE_INTERVAL") or cls.stats_reconcile_interval),
+            join_cache_size=int(env.get("JOIN_CACHE_SIZE") or cls.join_cache_size),
+            join_cache_ttl=float(env.get("JOIN_CACHE_TTL") or cls.join_cache_ttl),
+            join_cache_negative_ttl=float(env.get("JOIN_CACHE_NEGATIVE_TTL") or cls.join_cache_negative_ttl),
+            keyboard_cache_size=int(env.get("KEYBOARD_CACHE_SIZE") or cls.keyboard_cache_size),
+            notify_workers=max(1, int(env.get("NOTIFY_WORKERS") or cls.notify_workers)),
+            notify_global_rate=float(env.get("NOTIFY_GLOBAL_RATE") or cls.notify_global_rate),
+            notify_per_chat_interval=float(env.get("NOTIFY_PER_CHAT_INTERVAL") or cls.notify_per_chat_interval),
+            notify_drain_timeout=float(env.get("NOTIFY_DRAIN_TIMEOUT") or cls.notify_drain_timeout),
+            catalog_path=env.get("CATALOG_PATH") or None,
+        )
+
+
+_fallback: Optional[Settings] = None
+# Called with the new settings on every publish (startup and SIGHUP reload)
+_subscribers: List[Callable[[Settings], Any]] = []
+
+
+def get_settings(context: Any = None) -> Settings:
+    """Return the settings published in bot_data, or a process-wide fallback."""
+    global _fallback
+    bot_data = getattr(context, "bot_data", None)
+    if bot_data is not None:
+        s = bot_data.get(BOT_DATA_KEY)
+        if s is not None:
+            return s
+    if _fallback is None:
+        _fallback = Settings.from_env()
+    return _fallback
+
+
+def subscribe(fn: Callable[[Settings], Any]) -> Callable[[Settings], Any]:
+    """Register `fn` to apply settings to module state (cache sizes etc.) on each publish."""
+    _subscribers.append(fn)
+    return fn
+
+
+def publish(bot_data: dict, settings: Settings) -> None:
+    global _fallback
+    _fallback = settings
+    bot_data[BOT_DATA_KEY] = settings
+    for fn in _subscribers:
+        try:
+            fn(settings)
+        except Exception as e:
+            logger.warning("Applying settings in %s failed: %s", getattr(fn, "__qualname__", fn), e)
+
+
+def install_sighup_reload(bot_data: dict, *extra: Callable[[], Any]) -> bool:
+    """Re-read .env and the environment on SIGHUP and publish a new settings object.
+
+    Call from inside the running loop (Application.post_init): the handler
+    is registered with loop.add_signal_handler, so the reload runs as a
+    normal callback on the loop instead of interrupting it mid-step.
+    `extra` callables (e.g. catalog reload) run after the settings swap.
+    """
+    if not hasattr(signal, "SIGHUP"):
+        return False
+
+    def _reload() -> None:
+        try:
+            load_env_file()
+            publish(bot_data, Settings.from_env())
+            logger.info("Settings reloaded on SIGHUP")
+        except Exception as e:
+            logger.warning("Settings reload failed: %s", e)
+        for fn in extra:
+            try:
+                fn()
+            except Exception as e:
+                logger.warning("SIGHUP reload hook %s failed: %s", getattr(fn, "__name__", fn), e)
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload)
+    except (NotImplementedError, RuntimeError) as e:
+        logger.warning("SIGHUP reload unavailable: %s", e)
+        return False
+    return True
+
+
+def remove_sighup_reload() -> None:
+    if hasattr(signal, "SIGHUP"):
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        except (NotImplementedError, RuntimeError):
+            pass
@@ -0,0 +1,7 @@
+"""
+Checks that back specific changes (query plans, query budgets, allocator
+uniqueness, unit-of-work caching). Run with `python -m pytest tests`.
+
+Tests are plain functions that drive coroutines through `conftest.run`,
+each against a fresh temp SQLite database.
+"""
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import pytest
+
+from db.cache import user_cache
+from db.database import close_db, init_db
+from settings import Settings, publish
+
+
+T = TypeVar("T")
+
+
+def run(coro: Awaitable[T]) -> T:
+    """Run `coro` on a fresh loop and dispose of the DB engine on that same loop."""
+
+    async def _main() -> T:
+        try:
+            return await coro
+        finally:
+            await close_db()
+
+    return asyncio.run(_main())
+
+
+def test_settings(db_url: str, **overrides: Any) -> Settings:
+    """Settings independent of the process environment and .env."""
+    return dataclasses.replace(Settings.from_env({}), db_url=db_url, **overrides)
+
+
+test_settings.__test__ = False  # not a test, despite the name
+
+
+@pytest.fixture
+def db_url(tmp_path) -> str:
+    """URL of an empty SQLite file; the settings built for it are published."""
+    url = f"sqlite+aiosqlite:///{os.path.join(tmp_path, 'test.db')}"
+    publish({}, test_settings(url))
+    user_cache.clear()
+    return url
+
+
+async def fresh_db(url: str) -> None:
+    await init_db(url)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def running_bot(db_url: str, **overrides: Any) -> AsyncIterator[Callable[..., Awaitable[Any]]]:
+    """The real application (main.build_app) polling a FakeBotApi.
+
+    Yields `step(uid, text_or_callback_data, predicate=None, wait=True)`,
+    which sends one update and returns the bot's first answer to that chat
+    (or None right away with wait=False, for updates that get no answer).
+    """
+    from loadtest.__main__ import callback_update, text_update
+    from loadtest.fake_bot_api import ApiServer, FakeBotApi
+    from main import build_app
+
+    api = FakeBotApi()
+    server = ApiServer(api, port=free_port())
+    await server.start()
+    await init_db(db_url)
+    settings = test_settings(db_url, bot_api_url=server.base_url, stats_reconcile_interval=0, **overrides)
+    app = build_app("123456:test", base_url=server.base_url)
+    publish(app.bot_data, settings)
+    await app.initialize()
+    await app.post_init(app)
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    await app.start()
+
+    async def step(uid: int, data: str, predicate: Optional[Callable[[Any], bool]] = None, wait: bool = True) -> Any:
+        since = time.perf_counter()
+        api.push_update(text_update(api, uid, data) if data.startswith("/") else callback_update(api, uid, data))
+        if not wait:
+            return None
+        return await api.wait_for(uid, since, predicate or (lambda out: True), 10)
+
+    try:
+        yield step
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        await app.post_stop(app)
+        await app.shutdown()
+        await app.post_shutdown(app)
+        await server.stop()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+
+from db.crud import create_order, get_cached_user
+from db.database import new_session
+from db.models import Item, Order
+from loadtest.__main__ import has
+from tests.conftest import run, running_bot
+
+ADMIN_ID = 8_000_000
+CUSTOMER_ID = 1001
+INTRUDER_ID = 1002
+CODE = "123456"
+
+
+async def _seed_order() -> int:
+    async with new_session() as session:
+        item = (await session.execute(select(Item).order_by(Item.id).limit(1))).scalar_one()
+        user = await get_cached_user(session, CUSTOMER_ID)
+        await create_order(session, user.id, CODE, "درحال انجام", option_title=item.title)
+        await session.commit()
+        return item.id
+
+
+async def _status() -> str:
+    async with new_session() as session:
+        return (await session.execute(select(Order.status).where(Order.tracking_code == CODE))).scalar_one()
+
+
+def test_bulk_status_change_needs_an_admin(db_url):
+    async def main() -> None:
+        async with running_bot(db_url, admin_telegram_ids=frozenset({ADMIN_ID})) as step:
+            base = f"NEW:{await _seed_order()}:0"
+
+            await step(INTRUDER_ID, "/start", has("NAV:HELPER"))
+            await step(INTRUDER_ID, f"ORDERS_ADMIN:BULK_ALL:{base}", wait=False)
+            await step(INTRUDER_ID, f"ORDERS_ADMIN:BULK_SET:{base}:DONE", wait=False)
+            # Same chat, so answered only after both taps were handled
+            await step(INTRUDER_ID, "/start", has("NAV:HELPER"))
+            assert await _status() == "درحال انجام"
+
+            await step(ADMIN_ID, "/start", has("NAV:ADMIN_ORDERS"))
+            await step(ADMIN_ID, f"ORDERS_ADMIN:BULK_ALL:{base}", has(f"ORDERS_ADMIN:BULK_STATUS:{base}"))
+            await step(ADMIN_ID, f"ORDERS_ADMIN:BULK_SET:{base}:DONE", has(f"ORDERS_ADMIN:BULK_ALL:{base}"))
+            assert await _status() == "انجام شده"
+
+    run(main())
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect, text
+
+from db.database import close_db, init_db, new_session
+from db.migrations import LATEST_VERSION, current_version
+from db.models import Base
+from tests.conftest import run
+
+
+def _schema(sync_conn) -> dict:
+    insp = inspect(sync_conn)
+    return {
+        table: (
+            {c["name"] for c in insp.get_columns(table)},
+            {ix["name"] for ix in insp.get_indexes(table) if ix["name"] and not ix["name"].startswith("sqlite_")},
+        )
+        for table in insp.get_table_names()
+        if not table.startswith("search_index")
+    }
+
+
+def test_migrations_build_the_model_schema(db_url):
+    """A migrated database has every table, column and named index of db/models.py.
+
+    The steps use frozen table definitions, so this fails when a model
+    changes without a new migration step.
+    """
+
+    async def main() -> None:
+        await init_db(db_url)
+        async with new_session() as session:
+            engine = session.bind
+            migrated = await (await session.connection()).run_sync(_schema)
+        assert await current_version(engine) == LATEST_VERSION
+        for table in Base.metadata.sorted_tables:
+            columns, indexes = migrated[table.name]
+            assert {c.name for c in table.columns} <= columns, table.name
+            assert {ix.name for ix in table.indexes} <= indexes, table.name
+
+    run(main())
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER NOT NULL, username VARCHAR(64),
+    full_name VARCHAR(128), phone_number VARCHAR(32), role_id INTEGER NOT NULL, created_at DATETIME);
+CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, tracking_code VARCHAR(16) NOT NULL,
+    status VARCHAR(32) NOT NULL, category_key VARCHAR(32), option_title VARCHAR(128), created_at DATETIME);
+CREATE INDEX ix_orders_tracking_code ON orders (tracking_code);
+INSERT INTO users VALUES (1, 7, NULL, NULL, NULL, 2, '2024-01-01 10:00:00');
+INSERT INTO orders VALUES (1, 1, '111111', 'درحال انجام', 'c', 'a', '2024-01-01 10:00:00');
+INSERT INTO orders VALUES (2, 1, '111111', 'انجام شده', 'c', 'a', '2024-01-02 10:00:00');
+INSERT INTO orders VALUES (3, 1, '222222', 'انجام شده', 'c', NULL, '2024-01-02 11:00:00');
+"""
+
+
+def test_duplicate_legacy_codes_block_the_upgrade_until_fixed(db_url):
+    """Step 3 fails without recording its version, so the unique index is
+    added on the first start after the duplicates are fixed."""
+    path = db_url.split("///", 1)[1]
+    with sqlite3.connect(path) as legacy:
+        legacy.executescript(LEGACY_SCHEMA)
+
+    async def upgrade() -> tuple:
+        try:
+            await init_db(db_url)
+            async with new_session() as session:
+                conn = await session.connection()
+                unique = await conn.run_sync(lambda c: [
+                    ix["column_names"] for ix in inspect(c).get_indexes("orders") if ix["unique"]
+                ])
+                daily = (await session.execute(text(
+                    "SELECT status, item_title, day, count FROM order_stats_daily ORDER BY day, status"
+                ))).all()
+                return await current_version(session.bind), unique, daily
+        finally:
+            await close_db()
+
+    with pytest.raises(RuntimeError, match="111111"):
+        run(upgrade())
+    with sqlite3.connect(path) as legacy:
+        assert legacy.execute("SELECT version FROM schema_version").fetchone() == (2,)
+        legacy.execute("UPDATE orders SET tracking_code = '333333' WHERE id = 2")
+
+    version, unique, daily = run(upgrade())
+    assert version == LATEST_VERSION
+    assert ["tracking_code"] in unique
+    assert [tuple(r) for r in daily] == [
+        ("درحال انجام", "a", "2024-01-01", 1),
+        ("انجام شده", "", "2024-01-02", 1),
+        ("انجام شده", "a", "2024-01-02", 1),
+    ]
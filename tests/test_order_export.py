@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import order_export
+from db.database import init_db
+from tests.conftest import run
+
+
+class _SlowSink:
+    def __init__(self, path: str) -> None:
+        self.events: list[str] = []
+        self.writing = threading.Event()
+        _SlowSink.last = self
+
+    def write(self, rows) -> None:
+        self.writing.set()
+        time.sleep(0.2)
+        self.events.append("write")
+
+    def close(self) -> None:
+        self.events.append("close")
+
+
+def test_failed_chunk_fetch_closes_the_sink_after_the_pending_write(db_url, tmp_path, monkeypatch):
+    calls = []
+
+    async def chunk(session, after_id, limit, statuses, item_title):
+        calls.append(after_id)
+        if len(calls) == 2:
+            # Fail while the first chunk's write is still running
+            while not _SlowSink.last.writing.is_set():
+                await asyncio.sleep(0.01)
+            raise RuntimeError("db gone")
+        return [(i + 1, f"{i + 1:06d}") for i in range(limit)]
+
+    monkeypatch.setitem(order_export._SINKS, "CSV", _SlowSink)
+    monkeypatch.setattr(order_export, "get_order_export_chunk", chunk)
+
+    async def main() -> None:
+        await init_db(db_url)
+        with pytest.raises(RuntimeError, match="db gone"):
+            await order_export.write_export(str(tmp_path / "out.csv"), "CSV")
+
+    run(main())
+    assert _SlowSink.last.events == ["write", "close"]
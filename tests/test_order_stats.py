@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from sqlalchemy import func, select
+
+from db.crud import create_order, get_or_create_user_by_telegram, update_order_status_by_code, update_orders_status_by_codes
+from db.database import get_session, init_db, new_session
+from db.models import Order, OrderStatsDaily, UserOrderStats
+from db.stats import reconcile_order_stats
+from tests.conftest import run
+
+
+async def _rollups() -> tuple:
+    async with new_session() as session:
+        daily = (await session.execute(
+            select(OrderStatsDaily.status, OrderStatsDaily.item_title, OrderStatsDaily.day, OrderStatsDaily.count)
+            .where(OrderStatsDaily.count != 0)
+        )).all()
+        per_user = (await session.execute(
+            select(UserOrderStats.user_id, UserOrderStats.status, UserOrderStats.count).where(UserOrderStats.count != 0)
+        )).all()
+    return sorted(map(tuple, daily)), sorted(map(tuple, per_user))
+
+
+def test_incremental_rollups_match_a_rebuild(db_url):
+    """create_order and the status updates key the daily rollup by the
+    stored date(created_at), like the reconciliation does."""
+
+    async def main() -> None:
+        await init_db(db_url)
+        async with get_session() as session:
+            uids = [(await get_or_create_user_by_telegram(session, 100 + i, f"u{i}", f"n{i}")).id for i in range(3)]
+            for i in range(12):
+                await create_order(session, uids[i % 3], f"{200000 + i}", "درحال انجام", "c", f"item{i % 4}" if i % 5 else None)
+        async with get_session() as session:
+            await update_order_status_by_code(session, "200001", "انجام شده")
+            await update_orders_status_by_codes(session, [f"{200000 + i}" for i in range(0, 12, 2)], "رد شده")
+
+        incremental = await _rollups()
+        async with new_session() as session:
+            created = set((await session.execute(select(func.date(Order.created_at)))).scalars())
+            await reconcile_order_stats(session)
+            await session.commit()
+        assert incremental == await _rollups()
+        assert {str(day) for _s, _i, day, _n in incremental[0]} == created
+
+    run(main())
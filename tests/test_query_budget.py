@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+
+import metrics
+from loadtest.__main__ import _orderable_items, has
+from tests.conftest import run, running_bot
+
+# Most queries any single update of the journey may run
+QUERY_BUDGET = 8
+ADMIN_ID = 8_000_000
+
+
+def test_journey_stays_within_the_query_budget(db_url):
+    """Every update of the loadtest journey, order detail and status change
+    included, runs at most QUERY_BUDGET queries; a handler going over fails
+    its update instead of logging a warning."""
+
+    async def main() -> None:
+        cat, item = _orderable_items()[0]
+        metrics.BUDGET_EXCEEDED.clear()
+        async with running_bot(
+            db_url,
+            admin_telegram_ids=frozenset({ADMIN_ID}),
+            query_warn_threshold=QUERY_BUDGET,
+            query_budget_strict=True,
+        ) as raw_step:
+
+            async def step(*args):
+                try:
+                    return await raw_step(*args)
+                except asyncio.TimeoutError:
+                    # An update over budget fails without answering
+                    assert not metrics.BUDGET_EXCEEDED, dict(metrics.BUDGET_EXCEEDED)
+                    raise
+
+            await step(ADMIN_ID, "/start", has("NAV:ADMIN_ORDERS"))
+            for uid in (1001, 1002):
+                await step(uid, "/start", has("NAV:HELPER"))
+                await step(uid, "NAV:HELPER", has("HELP2:CAT:"))
+                await step(uid, f"HELP2:CAT:{cat}", has(f"HELP2:ITEM:{cat}:{item}"))
+                await step(uid, f"HELP2:ITEM:{cat}:{item}", has(f"HELP2:CONFIRM:{cat}:{item}"))
+                await step(uid, f"HELP2:CONFIRM:{cat}:{item}", has("NAV:ORDERS"))
+                await step(uid, "NAV:ORDERS", has("ORDERS:FILTER:ACTIVE"))
+                out = await step(uid, "ORDERS:FILTER:ACTIVE", has("ORDERS:CODE:"))
+                code = next(c for c in out.callbacks if c.startswith("ORDERS:CODE:")).rsplit(":", 1)[-1]
+                await step(uid, f"ORDERS:CODE:{code}", has("ORDERS:"))
+                await step(ADMIN_ID, f"ORDERS_ADMIN:STATUSMENU:{code}", has(f"ORDERS_ADMIN:SETSTATUS:{code}:"))
+                await step(
+                    ADMIN_ID, f"ORDERS_ADMIN:SETSTATUS:{code}:DONE",
+                    lambda o: o.method == "editMessageText" and f"ORDERS_ADMIN:STATUSMENU:{code}" in o.callbacks,
+                )
+                await step(ADMIN_ID, f"ORDERS_ADMIN:CODE:{code}", has(f"ORDERS_ADMIN:STATUSMENU:{code}"))
+        assert not metrics.BUDGET_EXCEEDED, dict(metrics.BUDGET_EXCEEDED)
+
+    run(main())
@@ -0,0 +1,172 @@
+"""
+EXPLAIN QUERY PLAN over the statements the crud helpers actually run.
+
+Each shape is executed against a freshly migrated database while a cursor
+listener records its SQL; every recorded SELECT/UPDATE is then explained,
+and the test fails on a full table scan or a temp B-tree sort.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, List, Tuple
+
+import pytest
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import crud
+from db.database import init_db, new_session
+from db.models import Order, User
+from db.search import search
+from tests.conftest import run
+
+
+DONE = "انجام شده"
+REJECTED = "رد شده"
+PENDING = "درحال انجام"
+
+# Plan lines that are intended: the catalog tables are read in full (and
+# cached), the user count header is a COUNT(*) cached for 30s, and full-text
+# hits are ranked by bm25, which has to sort the matches (the in-memory
+# schema is checked for the index first).
+_SEARCH = ("SCAN search_index VIRTUAL TABLE", "USE TEMP B-TREE FOR ORDER BY", "SCAN sqlite_master")
+ALLOWED = {
+    "get_categories": ("SCAN categories",),
+    "get_all_items": ("SCAN items",),
+    "count_users": ("SCAN users USING COVERING INDEX",),
+    "search": _SEARCH,
+    "search after": _SEARCH,
+    "search before": _SEARCH,
+}
+
+SHAPES: List[Tuple[str, Callable[[AsyncSession], Awaitable[Any]]]] = [
+    ("get_orders_by_status", lambda s: crud.get_orders_by_status(s, 1, PENDING)),
+    ("get_orders_by_statuses", lambda s: crud.get_orders_by_statuses(s, 1, [DONE, REJECTED])),
+    ("find_order", lambda s: crud.find_order(s, 1, "100001")),
+    ("get_categories", crud.get_categories),
+    ("get_items_by_category", lambda s: crud.get_items_by_category(s, 1)),
+    ("get_category_by_id", lambda s: crud.get_category_by_id(s, 1)),
+    ("get_all_orders_by_status", lambda s: crud.get_all_orders_by_status(s, PENDING)),
+    ("find_order_by_code", lambda s: crud.find_order_by_code(s, "100001")),
+    ("get_order_view_by_code", lambda s: crud.get_order_view_by_code(s, "100001")),
+    ("update_order_status_by_code", lambda s: crud.update_order_status_by_code(s, "100001", DONE)),
+    ("update_orders_status_by_codes", lambda s: crud.update_orders_status_by_codes(s, ["100002", "100003"], REJECTED)),
+    ("get_order_codes_by_statuses", lambda s: crud.get_order_codes_by_statuses(s, [DONE, REJECTED])),
+    ("get_order_codes_by_statuses item", lambda s: crud.get_order_codes_by_statuses(s, [DONE, REJECTED], "item")),
+    ("get_order_export_chunk", lambda s: crud.get_order_export_chunk(s, 0, 100)),
+    ("get_order_export_chunk statuses", lambda s: crud.get_order_export_chunk(s, 0, 100, [DONE, REJECTED], "item")),
+    ("count_orders_by_statuses_per_item", lambda s: crud.count_orders_by_statuses_per_item(s, [DONE, REJECTED])),
+    ("count_user_orders_by_status", lambda s: crud.count_user_orders_by_status(s, 1)),
+    ("get_orders_keyset_by_statuses", lambda s: crud.get_orders_keyset_by_statuses(s, [DONE, REJECTED], 10)),
+    ("get_orders_keyset_by_statuses after", lambda s: crud.get_orders_keyset_by_statuses(s, [DONE, REJECTED], 10, after_id=50)),
+    ("get_orders_keyset_by_statuses before", lambda s: crud.get_orders_keyset_by_statuses(s, [DONE], 10, before_id=5, item_title="item")),
+    ("get_all_items", crud.get_all_items),
+    ("get_users_by_ids", lambda s: crud.get_users_by_ids(s, [1, 2])),
+    ("count_users", crud.count_users),
+    ("get_users_keyset", lambda s: crud.get_users_keyset(s, 10)),
+    ("get_users_keyset after", lambda s: crud.get_users_keyset(s, 10, after_id=2)),
+    ("get_users_keyset before", lambda s: crud.get_users_keyset(s, 10, before_id=2)),
+    ("get_user_by_id", lambda s: crud.get_user_by_id(s, 1)),
+    ("get_or_create_user_by_telegram", lambda s: crud.get_or_create_user_by_telegram(s, 7, "u", "U")),
+    ("get_admin_telegram_ids", crud.get_admin_telegram_ids),
+    ("get_orders_by_ids", lambda s: crud.get_orders_by_ids(s, [1, 2])),
+    ("get_custom_requests_by_ids", lambda s: crud.get_custom_requests_by_ids(s, [1, 2])),
+    ("get_media_file_id", lambda s: crud.get_media_file_id(s, "ab")),
+    ("existing_tracking_codes", lambda s: crud.existing_tracking_codes(s, ["100001", "100002"])),
+    ("search", lambda s: search(s, "سفارش", 10)),
+    ("search after", lambda s: search(s, "سفارش", 10, after=(-1.5, 8))),
+    ("search before", lambda s: search(s, "سفارش", 10, before=(-1.5, 8))),
+]
+
+
+def _problems(name: str, statement: str, plan: List[str]) -> List[str]:
+    bad = []
+    for line in plan:
+        if line.startswith(ALLOWED.get(name, ())):
+            continue
+        if "TEMP B-TREE" in line:
+            bad.append(line)
+        elif line.startswith("SCAN ") and not ("USING" in line and " LIMIT " in statement):
+            bad.append(line)
+    return bad
+
+
+async def _seed() -> None:
+    async with new_session() as session:
+        await session.execute(insert(User), [{"telegram_id": 100 + i, "full_name": f"U{i}"} for i in range(3)])
+        await session.execute(insert(Order), [
+            {"user_id": 1, "tracking_code": str(100000 + n), "status": (PENDING, DONE, REJECTED)[n % 3],
+             "category_key": "C", "option_title": "item"}
+            for n in range(60)
+        ])
+        await session.commit()
+
+
+async def _explain(name: str, shape: Callable[[AsyncSession], Awaitable[Any]]) -> List[Tuple[str, List[str]]]:
+    async with new_session() as session:
+        engine = session.bind
+    captured: List[Tuple[str, Any]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        async with new_session() as session:
+            await shape(session)
+            await session.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    assert captured, f"{name} ran no SELECT/UPDATE"
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in captured:
+            rows = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append((statement, [row[3] for row in rows]))
+    return plans
+
+
+@pytest.mark.parametrize("name,shape", SHAPES, ids=[name for name, _ in SHAPES])
+def test_query_plan(db_url, name, shape):
+    async def main() -> List[str]:
+        await init_db(db_url)
+        await _seed()
+        failures = []
+        for statement, plan in await _explain(name, shape):
+            bad = _problems(name, statement, plan)
+            if bad:
+                failures.append(f"{' '.join(statement.split())}\n    " + "\n    ".join(plan))
+        return failures
+
+    failures = run(main())
+    assert not failures, f"{name}:\n" + "\n".join(failures)
+
+
+def test_union_rewrites_return_the_in_list_results(db_url):
+    """The per-status UNION ALL shapes return what the plain IN (...) queries did."""
+
+    async def main() -> None:
+        await init_db(db_url)
+        await _seed()
+        statuses = [DONE, REJECTED]
+        async with new_session() as session:
+            expected = list((await session.execute(
+                select(Order.id).where(Order.status.in_(statuses)).order_by(Order.id.desc())
+            )).scalars())
+            assert [o.id for o in await crud.get_orders_by_statuses(session, 1, statuses)] == expected
+
+            codes = await crud.get_order_codes_by_statuses(session, statuses, "item")
+            assert codes == [str(100000 + (i - 1)) for i in expected]
+
+            page, has_prev, has_next = await crud.get_orders_keyset_by_statuses(session, statuses, 10)
+            assert [o.id for o in page] == expected[:10] and not has_prev and has_next
+            page, has_prev, has_next = await crud.get_orders_keyset_by_statuses(session, statuses, 10, after_id=expected[9])
+            assert [o.id for o in page] == expected[10:20] and has_prev and has_next
+            page, has_prev, has_next = await crud.get_orders_keyset_by_statuses(session, statuses, 10, before_id=expected[10])
+            assert [o.id for o in page] == expected[:10] and not has_prev and has_next
+
+            chunk = await crud.get_order_export_chunk(session, expected[5], 5, statuses)
+            assert [row[0] for row in chunk] == sorted(i for i in expected if i > expected[5])[:5]
+
+    run(main())
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from sqlalchemy import insert
+
+import db.search
+from db.database import init_db, new_session
+from db.migrations import LATEST_VERSION, current_version
+from db.models import User
+from db.search import search
+from loadtest.__main__ import has
+from tests.conftest import run, running_bot
+
+ADMIN_ID = 8_000_000
+
+
+async def _seed_users(n: int) -> None:
+    async with new_session() as session:
+        await session.execute(insert(User), [
+            {"telegram_id": 100 + i, "full_name": f"کریمی {'ی' * (i % 4)} {i}", "role_id": 2} for i in range(n)
+        ])
+        await session.commit()
+
+
+def test_keyset_pages_walk_the_ranked_hits(db_url):
+    async def main() -> None:
+        await init_db(db_url)
+        await _seed_users(25)
+        async with new_session() as session:
+            everything, _, _ = await search(session, "کریمی", 100)
+            pages, after = [], None
+            while True:
+                hits, has_prev, has_next = await search(session, "کریمی", 10, after=after)
+                assert has_prev == (after is not None)
+                pages.append(hits)
+                if not has_next:
+                    break
+                after = (hits[-1].rank, hits[-1].rowid)
+            first = pages[1][0]
+            back, has_prev, has_next = await search(session, "کریمی", 10, before=(first.rank, first.rowid))
+        assert [h.rowid for page in pages for h in page] == [h.rowid for h in everything]
+        assert [len(p) for p in pages] == [10, 10, 5]
+        assert (back, has_prev, has_next) == (pages[0], False, True)
+
+    run(main())
+
+
+def test_sqlite_without_trigram_fts_skips_search(db_url, monkeypatch):
+    """No FTS5 trigram tokenizer: the migration still completes and /find
+    says search is unavailable."""
+    monkeypatch.setattr(db.search, "trigram_fts_supported", lambda conn: False)
+
+    async def main() -> None:
+        await init_db(db_url)
+        async with new_session() as session:
+            assert await current_version(session.bind) == LATEST_VERSION
+            assert await search(session, "کریمی", 10) is None
+        async with running_bot(db_url, admin_telegram_ids=frozenset({ADMIN_ID})) as step:
+            await step(ADMIN_ID, "/start", has("NAV:ADMIN_ORDERS"))
+            out = await step(ADMIN_ID, "/find کریمی", lambda o: o.method == "sendMessage")
+        assert out.text == "جستجو در این پایگاه داده در دسترس نیست."
+
+    run(main())
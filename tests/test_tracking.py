@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+from sqlalchemy import func, insert, select
+
+from db.database import init_db, new_session
+from db.models import Order, TrackingCodeSequence, User
+from db.tracking import CODE_MIN, DOMAIN, TrackingCodeAllocator, code_for, permute
+from tests.conftest import run
+
+
+STRESS_ORDERS = int(os.getenv("STRESS_ORDERS", "500000"))
+
+
+def test_permute_is_a_bijection_on_a_sample():
+    key = b"k" * 16
+    seen = {permute(n, key) for n in range(0, DOMAIN, 7)}
+    assert len(seen) == len(range(0, DOMAIN, 7))
+    assert all(0 <= v < DOMAIN for v in seen)
+
+
+def test_500k_orders_get_unique_codes(db_url):
+    """Several allocators (one per worker process) fill STRESS_ORDERS orders.
+
+    The orders are bulk-inserted so the unique index on tracking_code is the
+    final judge; a legacy order holding a code the permutation will produce
+    must be skipped rather than collide.
+    """
+
+    async def main() -> None:
+        await init_db(db_url)
+        async with new_session() as session:
+            await session.execute(insert(User), [{"telegram_id": 1, "full_name": "Stress", "role_id": 2}])
+            user_id = (await session.execute(select(User.id).where(User.telegram_id == 1))).scalar_one()
+            await session.commit()
+
+        # Pre-create the sequence row so the legacy code can be derived from its key
+        warmup = TrackingCodeAllocator(block_size=1)
+        first = await warmup.allocate()
+        async with new_session() as session:
+            key = (await session.execute(select(TrackingCodeSequence.key))).scalar_one()
+            legacy = code_for(1000, key.encode("utf-8"))
+            await session.execute(insert(Order), [
+                {"user_id": user_id, "tracking_code": first, "status": "legacy", "category_key": "T"},
+                {"user_id": user_id, "tracking_code": legacy, "status": "legacy", "category_key": "T"},
+            ])
+            await session.commit()
+
+        allocators = [TrackingCodeAllocator(block_size=4096) for _ in range(4)]
+        per_worker = STRESS_ORDERS // len(allocators)
+
+        async def worker(allocator: TrackingCodeAllocator) -> list[str]:
+            return [await allocator.allocate() for _ in range(per_worker)]
+
+        batches = await asyncio.gather(*(worker(a) for a in allocators))
+        codes = [c for batch in batches for c in batch]
+
+        assert legacy not in codes
+        assert len(set(codes)) == len(codes) == per_worker * len(allocators)
+        assert all(len(c) == 6 and CODE_MIN <= int(c) < CODE_MIN + DOMAIN for c in codes)
+
+        async with new_session() as session:
+            for start in range(0, len(codes), 20000):
+                await session.execute(insert(Order), [
+                    {"user_id": user_id, "tracking_code": c, "status": "stress", "category_key": "T"}
+                    for c in codes[start:start + 20000]
+                ])
+            await session.commit()
+            total = (await session.execute(select(func.count(func.distinct(Order.tracking_code))))).scalar_one()
+        assert total == len(codes) + 2
+
+    run(main())
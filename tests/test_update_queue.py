@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from telegram import Update
+
+from update_processor import PerChatUpdateProcessor, UpdateQueue
+
+
+def test_pending_updates_count_until_task_done():
+    async def main() -> None:
+        queue = UpdateQueue(maxsize=2)
+        queue.put_nowait("a")
+        queue.put_nowait("b")
+        # Taken off the queue (as PTB's fetcher does) but not processed yet
+        await queue.get()
+        await queue.get()
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait("c")
+
+        put = asyncio.create_task(queue.put("c"))
+        await asyncio.sleep(0)
+        assert not put.done()
+        queue.task_done()
+        await asyncio.wait_for(put, 1)
+        assert queue.pending == 2
+
+    asyncio.run(main())
+
+
+def test_one_busy_chat_cannot_queue_unbounded_tasks():
+    """Updates waiting on a chat lock still hold their place in the cap."""
+
+    async def main() -> None:
+        queue = UpdateQueue(maxsize=5)
+        processor = PerChatUpdateProcessor(2)
+        release = asyncio.Event()
+
+        async def handler() -> None:
+            await release.wait()
+
+        async def fetcher() -> None:
+            # What PTB's update fetcher does with concurrent updates
+            while True:
+                update = await queue.get()
+
+                async def wrapper(update: Update = update) -> None:
+                    try:
+                        await processor.process_update(update, handler())
+                    finally:
+                        queue.task_done()
+
+                asyncio.create_task(wrapper())
+
+        fetch = asyncio.create_task(fetcher())
+        updates = [
+            Update.de_json({"update_id": n, "message": {
+                "message_id": n, "date": 0, "chat": {"id": 1, "type": "private"},
+            }}, None)
+            for n in range(6)
+        ]
+        for update in updates[:5]:
+            await queue.put(update)
+        await asyncio.sleep(0.01)
+        assert queue.qsize() == 0
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(updates[5])
+        release.set()
+        await asyncio.wait_for(queue.join(), 1)
+        assert queue.pending == 0
+        fetch.cancel()
+
+    asyncio.run(main())
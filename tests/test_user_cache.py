@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from sqlalchemy import insert
+
+from db.cache import user_cache
+from db.database import init_db, new_session
+from db.models import User
+from loadtest.__main__ import has
+from loadtest.bench import count_queries
+from tests.conftest import run, running_bot
+
+
+def test_known_user_is_served_from_the_cache(db_url):
+    """After one lookup, /start and BACK:MAIN run no queries at all.
+
+    The lookup is a read-only unit of work, which is rolled back rather
+    than committed, so the cache must be filled without waiting for a commit.
+    """
+
+    async def main() -> None:
+        await init_db(db_url)
+        async with new_session() as session:
+            await session.execute(insert(User), [{"telegram_id": 4242, "full_name": "Known", "role_id": 2}])
+            await session.commit()
+        user_cache.clear()
+
+        async with running_bot(db_url) as step:
+            with count_queries() as first:
+                await step(4242, "/start", has("NAV:HELPER"))
+            assert first.count >= 1
+            assert user_cache.get(4242) is not None
+
+            with count_queries() as again:
+                await step(4242, "/start", has("NAV:HELPER"))
+            with count_queries() as back:
+                await step(4242, "BACK:MAIN", has("NAV:HELPER"))
+            assert (again.count, back.count) == (0, 0)
+
+    run(main())
+
+
+def test_new_user_is_cached_once_committed(db_url):
+    async def main() -> None:
+        async with running_bot(db_url) as step:
+            await step(4343, "/start", has("NAV:HELPER"))
+            assert user_cache.get(4343) is not None
+            with count_queries() as again:
+                await step(4343, "/start", has("NAV:HELPER"))
+            assert again.count == 0
+
+    run(main())
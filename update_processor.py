@@ -0,0 +1,115 @@
+"""
+Concurrent update processing with per-chat ordering.
+
+Updates from different chats run in parallel, up to `max_concurrent_updates`
+at a time; updates from the same chat (or user, when there is no chat) are
+serialized in arrival order, so a user's button presses and the
+ConversationHandler state they drive never race each other. Each update
+also runs inside its own database unit of work and is measured by
+metrics.track_update.
+
+With concurrent updates PTB's fetcher takes every update off the queue at
+once and starts a task for it, so a plain bounded queue never fills and
+tasks waiting for a chat lock or a worker slot pile up without limit.
+UpdateQueue bounds queued *and* unfinished updates instead: polling stops
+fetching and the webhook answers 503 once UPDATE_QUEUE_SIZE updates are
+pending anywhere.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from db.database import update_scope
+from metrics import track_update
+
+
+class UpdateQueue(asyncio.Queue):
+    """Application update queue whose maxsize counts updates until task_done().
+
+    PTB calls task_done() only after an update has been processed, so
+    `pending` covers updates queued, waiting for their chat lock or a
+    worker slot, and running. put() (the polling updater) waits while it is
+    at maxsize; put_nowait() (the webhook) raises QueueFull.
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self.pending = 0
+        self._room = asyncio.Event()
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self.pending
+
+    async def put(self, item: Any) -> None:
+        while self.full():
+            self._room.clear()
+            await self._room.wait()
+        self.put_nowait(item)
+
+    def put_nowait(self, item: Any) -> None:
+        super().put_nowait(item)
+        self.pending += 1
+
+    def task_done(self) -> None:
+        super().task_done()
+        self.pending -= 1
+        self._room.set()
+
+
+def _update_key(update: object) -> Optional[int]:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int) -> None:
+        super().__init__(max_concurrent_updates)
+        # chat id -> [lock, number of updates holding or waiting for it]
+        self._locks: Dict[int, List[Any]] = {}
+
+    @asynccontextmanager
+    async def _serialized(self, key: int) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:  # type: ignore[misc]
+        # Take the chat lock before a worker slot, so one chat's backlog waits
+        # on its own lock instead of occupying the whole pool.
+        key = _update_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        async with self._serialized(key):
+            await super().process_update(update, coroutine)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # One lazily opened DB session per update (db.database.update_scope),
+        # timed and labelled for /metrics
+        async with track_update(update), update_scope():
+            await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
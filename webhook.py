@@ -0,0 +1,181 @@
+"""
+Webhook entry point served by an embedded ASGI server (uvicorn).
+
+Telegram POSTs updates to `WEBHOOK_PATH`; each request is checked against
+the secret token, decoded (orjson when available), turned into an Update
+and put on the application's update queue. Once UPDATE_QUEUE_SIZE updates
+are pending (queued or still being processed, see update_processor.py)
+the request is answered with 503 so Telegram retries it later instead of
+the process buffering without limit.
+
+Recorded updates can be replayed locally, e.g.:
+
+    curl -X POST -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \\
+         -H "Content-Type: application/json" \\
+         --data @update.json http://127.0.0.1:8080/telegram
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from telegram import Update
+from telegram.ext import Application
+
+from settings import Settings
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is optional
+    import json
+
+    _loads = json.loads
+
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = b"x-telegram-bot-api-secret-token"
+# Telegram updates are small; anything bigger is not a real update
+MAX_BODY_BYTES = 1 << 20
+
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class WebhookApp:
+    """Minimal ASGI app: POST <path> accepts updates, GET /healthz for probes."""
+
+    def __init__(self, application: Application, settings: Settings) -> None:
+        self.application = application
+        self.settings = settings
+        self.path = settings.webhook_path
+        self._secret = settings.webhook_secret.encode("utf-8") if settings.webhook_secret else None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        if scope["path"] == "/healthz" and scope["method"] == "GET":
+            await _respond(send, 200, b"ok")
+            return
+        if scope["path"] != self.path:
+            await _respond(send, 404, b"not found")
+            return
+        if scope["method"] != "POST":
+            await _respond(send, 405, b"method not allowed")
+            return
+        if self._secret is not None:
+            given = dict(scope.get("headers") or ()).get(SECRET_HEADER, b"")
+            if not hmac.compare_digest(given, self._secret):
+                await _respond(send, 403, b"forbidden")
+                return
+        body = await _read_body(receive)
+        if body is None:
+            await _respond(send, 413, b"payload too large")
+            return
+        try:
+            update = Update.de_json(_loads(body), self.application.bot)
+        except Exception as e:
+            logger.debug("Rejected malformed update: %s", e)
+            await _respond(send, 400, b"bad request")
+            return
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning("Too many pending updates, asking Telegram to retry update %s", update.update_id)
+            await _respond(send, 503, b"busy")
+            return
+        await _respond(send, 200, b"ok")
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.exception("Webhook startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    await self.shutdown()
+                finally:
+                    await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self) -> None:
+        # Mirrors what run_polling/run_webhook do around the update fetcher
+        app = self.application
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        if self.settings.webhook_url:
+            await app.bot.set_webhook(
+                url=self.settings.webhook_url.rstrip("/") + self.path,
+                secret_token=self.settings.webhook_secret,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        await app.start()
+        logger.info("Webhook listening on %s:%s%s", self.settings.webhook_listen, self.settings.webhook_port, self.path)
+
+    async def shutdown(self) -> None:
+        app = self.application
+        if app.running:
+            await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+async def _read_body(receive: Receive) -> bytes | None:
+    chunks: list[bytes] = []
+    size = 0
+    more = True
+    while more:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        more = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def _respond(send: Send, status: int, body: bytes) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def run_webhook(application: Application, settings: Settings) -> None:
+    """Serve the webhook until interrupted (blocking, like run_polling)."""
+    try:
+        import uvicorn
+    except ImportError as e:
+        raise RuntimeError("BOT_MODE=webhook requires uvicorn (pip install uvicorn)") from e
+    if not settings.webhook_secret:
+        logger.warning("WEBHOOK_SECRET is not set; webhook requests are not authenticated")
+    config = uvicorn.Config(
+        WebhookApp(application, settings),
+        host=settings.webhook_listen,
+        port=settings.webhook_port,
+        lifespan="on",
+        log_level="warning",
+        access_log=False,
+    )
+    uvicorn.Server(config).run()